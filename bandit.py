@@ -0,0 +1,254 @@
+"""
+Adaptive target selection for launch attempts.
+Keeps success, near-miss and latency statistics per target (availability
+domain and shape) and picks the AD of each attempt by Thompson sampling, so
+the attempt budget drifts towards targets that had capacity recently instead
+of being spent evenly on dead ones. Statistics decay with a half-life, so the
+allocation follows shifting capacity.
+"""
+
+import random
+import threading
+import time
+
+from config import Config
+
+
+class TargetArm:
+    """Decayed Beta statistics and counters for one AD/shape target."""
+    
+    __slots__ = (
+        "availability_domain", "shape", "successes", "failures", "updated",
+        "attempts", "wins", "near_misses", "errors", "latency",
+    )
+    
+    def __init__(self, availability_domain: str, shape: str):
+        self.availability_domain = availability_domain
+        self.shape = shape
+        # Decayed reward mass; the arm's posterior is Beta(1 + successes, 1 + failures)
+        self.successes = 0.0
+        self.failures = 0.0
+        self.updated = time.monotonic()
+        # Plain counters for the dashboard
+        self.attempts = 0
+        self.wins = 0
+        self.near_misses = 0
+        self.errors = 0
+        self.latency = None  # smoothed seconds per attempt
+    
+    def decay(self, now: float, half_life: float):
+        """Fade old evidence towards the uniform prior."""
+        factor = 0.5 ** ((now - self.updated) / half_life)
+        self.successes *= factor
+        self.failures *= factor
+        self.updated = now
+    
+    def sample(self) -> float:
+        """Draw a capacity probability from the arm's posterior."""
+        return random.betavariate(1 + self.successes, 1 + self.failures)
+    
+    @property
+    def mean(self) -> float:
+        """Posterior mean capacity probability."""
+        return (1 + self.successes) / (2 + self.successes + self.failures)
+    
+    def to_dict(self, weight: float) -> dict:
+        """Serializable arm state for the dashboard."""
+        return {
+            "availability_domain": self.availability_domain,
+            "shape": self.shape,
+            "weight": round(weight, 3),
+            "mean": round(self.mean, 4),
+            "attempts": self.attempts,
+            "successes": self.wins,
+            "near_misses": self.near_misses,
+            "errors": self.errors,
+            "latency": round(self.latency, 2) if self.latency is not None else None,
+        }
+
+
+class TargetBandit:
+    """
+    Thompson sampling over the availability domains of each shape.
+    
+    Outcomes:
+    - success: the instance was created in the target
+    - near_miss: another shape succeeded in the same AD, so it has capacity
+      right now (credited to the AD's other shapes with NEAR_MISS_REWARD)
+    - miss: out of capacity
+    - error: any other failure; counted, but says nothing about capacity
+    """
+    
+    SUCCESS = "success"
+    MISS = "miss"
+    ERROR = "error"
+    
+    NEAR_MISS_REWARD = 0.5
+    LATENCY_SMOOTHING = 0.2
+    WEIGHT_SAMPLES = 500
+    
+    def __init__(self, name: str, half_life_minutes: float):
+        self.name = name
+        self.half_life = max(1.0, half_life_minutes * 60.0)
+        self.arms = {}
+        self._lock = threading.Lock()
+    
+    def choose(self, availability_domains: list, shape: str) -> str:
+        """
+        Pick the AD for the next attempt of a shape.
+        
+        Args:
+            availability_domains: Candidate ADs
+            shape: Shape label, e.g. "4/24GB"
+        
+        Returns:
+            The AD whose posterior sample is highest
+        """
+        with self._lock:
+            now = time.monotonic()
+            best, best_sample = None, -1.0
+            for availability_domain in availability_domains:
+                arm = self._arm(availability_domain, shape)
+                arm.decay(now, self.half_life)
+                sample = arm.sample()
+                if sample > best_sample:
+                    best, best_sample = availability_domain, sample
+            return best
+    
+    def record(self, availability_domain: str, shape: str, outcome: str, latency: float = None):
+        """Update a target with the outcome of an attempt."""
+        with self._lock:
+            now = time.monotonic()
+            arm = self._arm(availability_domain, shape)
+            arm.decay(now, self.half_life)
+            arm.attempts += 1
+            
+            if outcome == self.SUCCESS:
+                arm.successes += 1
+                arm.wins += 1
+                # Capacity in this AD is evidence for its other shapes too
+                for other in self.arms.values():
+                    if other is not arm and other.availability_domain == availability_domain:
+                        other.decay(now, self.half_life)
+                        other.successes += self.NEAR_MISS_REWARD
+                        other.near_misses += 1
+            elif outcome == self.MISS:
+                arm.failures += 1
+            else:
+                arm.errors += 1
+            
+            if latency is not None:
+                if arm.latency is None:
+                    arm.latency = latency
+                else:
+                    arm.latency += self.LATENCY_SMOOTHING * (latency - arm.latency)
+    
+    def weights(self) -> dict:
+        """
+        Current allocation: the probability that each target is picked for its shape.
+        
+        Returns:
+            dict of (availability_domain, shape) -> probability
+        """
+        with self._lock:
+            now = time.monotonic()
+            by_shape = {}
+            for arm in self.arms.values():
+                arm.decay(now, self.half_life)
+                by_shape.setdefault(arm.shape, []).append(arm)
+            
+            weights = {}
+            for shape, arms in by_shape.items():
+                wins = dict.fromkeys(arms, 0)
+                for _ in range(self.WEIGHT_SAMPLES):
+                    wins[max(arms, key=lambda arm: arm.sample())] += 1
+                for arm, count in wins.items():
+                    weights[(arm.availability_domain, shape)] = count / self.WEIGHT_SAMPLES
+            return weights
+    
+    def to_dict(self) -> dict:
+        """Serializable allocation for the dashboard and /api/status."""
+        weights = self.weights()
+        with self._lock:
+            arms = [arm.to_dict(weights.get(key, 0.0)) for key, arm in self.arms.items()]
+        return {
+            "name": self.name,
+            "half_life_minutes": round(self.half_life / 60.0, 1),
+            "arms": sorted(arms, key=lambda arm: (arm["shape"], -arm["weight"])),
+        }
+    
+    def export(self) -> list:
+        """Arm statistics for a handoff checkpoint (ages instead of monotonic times)."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "availability_domain": arm.availability_domain,
+                    "shape": arm.shape,
+                    "successes": arm.successes,
+                    "failures": arm.failures,
+                    "age": now - arm.updated,
+                    "attempts": arm.attempts,
+                    "wins": arm.wins,
+                    "near_misses": arm.near_misses,
+                    "errors": arm.errors,
+                    "latency": arm.latency,
+                }
+                for arm in self.arms.values()
+            ]
+    
+    def restore(self, arms: list):
+        """Load arm statistics exported by the previous process."""
+        with self._lock:
+            now = time.monotonic()
+            for saved in arms:
+                arm = self._arm(saved["availability_domain"], saved["shape"])
+                arm.successes = saved["successes"]
+                arm.failures = saved["failures"]
+                arm.updated = now - saved["age"]
+                arm.attempts = saved["attempts"]
+                arm.wins = saved["wins"]
+                arm.near_misses = saved["near_misses"]
+                arm.errors = saved["errors"]
+                arm.latency = saved["latency"]
+    
+    def _arm(self, availability_domain: str, shape: str) -> TargetArm:
+        """Return the arm of a target, creating it on first use (caller holds the lock)."""
+        key = (availability_domain, shape)
+        if key not in self.arms:
+            self.arms[key] = TargetArm(availability_domain, shape)
+        return self.arms[key]
+
+
+# Bandits are shared per account and region so their statistics survive a
+# client being recreated (e.g. after a watchdog restart)
+_bandits = {}
+_registry_lock = threading.Lock()
+
+
+def get_bandit(name: str, config: Config) -> TargetBandit:
+    """Return the shared bandit for an account and region, creating it on first use."""
+    with _registry_lock:
+        if name not in _bandits:
+            _bandits[name] = TargetBandit(name, config.bandit_half_life_minutes)
+        return _bandits[name]
+
+
+def bandit_states() -> dict:
+    """Allocation of every bandit, keyed by account/region."""
+    with _registry_lock:
+        bandits = list(_bandits.values())
+    return {bandit.name: bandit.to_dict() for bandit in bandits}
+
+
+def export_bandits() -> dict:
+    """Statistics of every bandit, keyed by account/region, for a handoff checkpoint."""
+    with _registry_lock:
+        bandits = list(_bandits.values())
+    return {bandit.name: bandit.export() for bandit in bandits}
+
+
+def import_bandits(state: dict, config: Config):
+    """Restore the bandits of a handoff checkpoint."""
+    for name, arms in state.items():
+        get_bandit(name, config).restore(arms)
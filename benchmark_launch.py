@@ -0,0 +1,118 @@
+"""
+Benchmark CPU time per launch attempt: SDK path vs. raw-HTTP fast path.
+
+Both paths send real signed LaunchInstance requests, but to a local stub
+server that answers every request like OCI does when it is out of capacity
+(500 InternalError "Out of host capacity."), so nothing is launched in your
+tenancy. Uses the credentials from .env for signing.
+
+Usage:
+    python benchmark_launch.py                  # 300 attempts per path
+    python benchmark_launch.py --attempts 1000
+"""
+
+import argparse
+import json
+import multiprocessing
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import Config
+from oci_client import OCIClient
+
+
+CAPACITY_ERROR = json.dumps({
+    "code": "InternalError",
+    "message": "Out of host capacity.",
+}).encode("utf-8")
+
+
+class CapacityStubHandler(BaseHTTPRequestHandler):
+    """Answer every launch request with an out-of-capacity error."""
+    
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1  # send headers and body in one segment
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        self.send_response(500)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(CAPACITY_ERROR)))
+        self.send_header("opc-request-id", "benchmark")
+        self.end_headers()
+        self.wfile.write(CAPACITY_ERROR)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port_queue):
+    """Run the stub server (in its own process, so its CPU time isn't measured)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CapacityStubHandler)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def build_client(config: Config, endpoint: str, fast: bool) -> OCIClient:
+    """OCIClient with the chosen launch path, pointed at the stub server."""
+    config.fast_launch_enabled = fast
+    config.hedge_enabled = False
+    config.provisioning_enabled = False
+    client = OCIClient(config)
+    client.compute_client.base_client.endpoint = f"{endpoint}/20160918"
+    if client.fast_launcher:
+        client.fast_launcher.use_endpoint(f"{endpoint}/20160918")
+    return client
+
+
+def measure(client: OCIClient, attempts: int) -> dict:
+    """Run attempts through create_instance() and return CPU and wall time per attempt."""
+    # Warm up connections and the fast path's body cache
+    for _ in range(10):
+        client.create_instance()
+    
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    for _ in range(attempts):
+        result = client.create_instance()
+        if not result["is_capacity_error"]:
+            raise RuntimeError(f"Unexpected result from stub: {result['message']}")
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+    
+    return {
+        "cpu_us": cpu / attempts * 1e6,
+        "wall_ms": wall / attempts * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CPU per launch attempt (SDK vs. fast path)")
+    parser.add_argument("--attempts", type=int, default=300, help="Attempts per path (default: 300)")
+    args = parser.parse_args()
+    
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(port_queue,), daemon=True)
+    server.start()
+    endpoint = f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+    
+    try:
+        config = Config()
+        results = {
+            "SDK": measure(build_client(config, endpoint, fast=False), args.attempts),
+            "Fast path": measure(build_client(config, endpoint, fast=True), args.attempts),
+        }
+    finally:
+        server.terminate()
+    
+    print(f"\n📊 Launch attempt cost over {args.attempts} out-of-capacity attempts\n")
+    print(f"   {'Path':<12}{'CPU / attempt':>16}{'Wall / attempt':>18}")
+    for name, result in results.items():
+        print(f"   {name:<12}{result['cpu_us']:>13.0f} µs{result['wall_ms']:>15.2f} ms")
+    
+    speedup = results["SDK"]["cpu_us"] / results["Fast path"]["cpu_us"]
+    print(f"\n   Fast path uses {speedup:.1f}x less CPU per attempt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Circuit breakers for OCI and Telegram calls.
+After repeated transient failures (timeouts, connection errors, throttling,
+5xx outages) a breaker opens and short-circuits calls, then lets a single
+probe through after a recovery period to check whether the endpoint is back.
+"""
+
+import threading
+import time
+
+import oci
+import requests
+
+from fast_launch import LaunchRejected
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose breaker is open."""
+    
+    def __init__(self, breaker: "CircuitBreaker"):
+        self.breaker = breaker
+        retry_in = max(0, int(breaker.opened_at + breaker.recovery_timeout - breaker.clock()))
+        super().__init__(f"Circuit open for {breaker.name} (next probe in {retry_in}s)")
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Check if an error means the endpoint is unhealthy rather than the request being wrong.
+    
+    Out-of-capacity responses are the normal case for launch attempts and
+    never count against the breaker, even though OCI reports them as 500s.
+    """
+    if isinstance(error, (oci.exceptions.ServiceError, LaunchRejected)):
+        if error.status == 429:
+            return True
+        if error.status >= 500:
+            return "capacity" not in str(error.message).lower()
+        return False
+    
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    
+    return isinstance(error, (
+        ConnectionError,
+        TimeoutError,
+        oci.exceptions.RequestException,
+        oci.exceptions.ConnectTimeout,
+        requests.exceptions.Timeout,
+        requests.exceptions.ConnectionError,
+    ))
+
+
+class CircuitBreaker:
+    """Closed → open after repeated transient failures → half-open probe → closed."""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 60.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock  # replaced by a virtual clock in simulator.py
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.short_circuited = 0
+        self.last_error = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    def call(self, func, *args, **kwargs):
+        """
+        Call func through the breaker.
+        
+        Raises:
+            CircuitOpenError: if the breaker is open (or a probe is already in flight)
+        """
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if is_transient_error(e):
+                self.record_failure(e)
+            else:
+                # The endpoint answered; the request itself was the problem
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+    
+    def _before_call(self):
+        """Let the call through, turn it into a probe, or short-circuit it."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+            
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            
+            self.short_circuited += 1
+            raise CircuitOpenError(self)
+    
+    def record_success(self):
+        """Close the breaker after a healthy response."""
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"✅ Circuit for {self.name} closed again", flush=True)
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+    
+    def record_failure(self, error: Exception):
+        """Count a transient failure and open the breaker past the threshold."""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = str(error)[:200]
+            self._probe_in_flight = False
+            
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                    print(f"⚠️ Circuit for {self.name} opened after {self.consecutive_failures} "
+                          f"transient failures: {self.last_error}", flush=True)
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+    
+    def to_dict(self) -> dict:
+        """Serializable breaker state for /api/status."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "last_error": self.last_error,
+        }
+
+
+# Breakers are shared per endpoint so every client talking to the same
+# service and region sees the same outage
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str, config) -> CircuitBreaker:
+    """Return the shared breaker for an endpoint, creating it on first use."""
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=config.breaker_failure_threshold,
+                recovery_timeout=config.breaker_recovery_seconds
+            )
+        return _breakers[name]
+
+
+def breaker_states() -> dict:
+    """State of every breaker, keyed by endpoint name."""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.to_dict() for breaker in breakers}
@@ -4,15 +4,53 @@ Loads all settings from environment variables.
 """
 
 import os
+import copy
+import json
+import socket
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# In LOW_MEMORY_MODE the OCI SDK only loads the service packages the app
+# imports explicitly; this has to be set before the first `import oci`
+if os.getenv("LOW_MEMORY_MODE", "false").lower() == "true":
+    os.environ.setdefault("OCI_PYTHON_SDK_NO_SERVICE_IMPORTS", "true")
+
 
 class Config:
     """Configuration class that loads settings from environment variables."""
     
+    # Keys every entry in OCI_REGION_PROFILES must define
+    REGION_PROFILE_KEYS = ["region", "subnet_ocid", "image_ocid", "availability_domain"]
+    
+    # Supported policies for stopping the launch pipelines
+    STOP_POLICIES = ["first_success", "quota"]
+    
+    # OCI_ACCOUNT_PROFILES keys mapped to the Config attribute they override
+    ACCOUNT_PROFILE_FIELDS = {
+        "user_ocid": "oci_user_ocid",
+        "tenancy_ocid": "oci_tenancy_ocid",
+        "fingerprint": "oci_fingerprint",
+        "private_key_path": "oci_private_key_path",
+        "private_key_content": "oci_private_key_content",
+        "region": "oci_region",
+        "compartment_ocid": "compartment_ocid",
+        "subnet_ocid": "subnet_ocid",
+        "image_ocid": "image_ocid",
+        "availability_domain": "availability_domain",
+        "instance_name": "instance_name",
+        "ocpus": "ocpus",
+        "memory_gb": "memory_gb",
+        "ssh_public_key": "ssh_public_key",
+        "telegram_bot_token": "telegram_bot_token",
+        "telegram_chat_id": "telegram_chat_id",
+        "rate_limit_per_minute": "rate_limit_per_minute",
+    }
+    
+    # Keys every entry in OCI_ACCOUNT_PROFILES must define
+    ACCOUNT_PROFILE_KEYS = ["name", "user_ocid", "tenancy_ocid", "fingerprint", "compartment_ocid"]
+    
     def __init__(self):
         # Oracle Cloud Credentials
         self.oci_user_ocid = self._get_required("OCI_USER_OCID")
@@ -27,11 +65,22 @@ class Config:
         if not self.oci_private_key_path and not self.oci_private_key_content:
              raise ValueError("Missing OCI private key. Set OCI_PRIVATE_KEY_PATH or OCI_PRIVATE_KEY_CONTENT.")
         
+        # Auto-Discovery Configuration
+        # When enabled, subnet, image and availability domain may be left unset
+        # and are discovered through the OCI APIs (see resolver.py).
+        self.auto_discover = os.getenv("OCI_AUTO_DISCOVER", "false").lower() == "true"
+        self.image_os = os.getenv("OCI_IMAGE_OS", "Canonical Ubuntu")
+        self.image_os_version = os.getenv("OCI_IMAGE_OS_VERSION")
+        self.discovery_cache_path = os.getenv("OCI_DISCOVERY_CACHE_PATH", ".oci_discovery_cache.json")
+        self.discovery_ttl_hours = float(os.getenv("OCI_DISCOVERY_TTL_HOURS", "24"))
+        
         # Instance Configuration
         self.compartment_ocid = self._get_required("OCI_COMPARTMENT_OCID")
-        self.subnet_ocid = self._get_required("OCI_SUBNET_OCID")
-        self.image_ocid = self._get_required("OCI_IMAGE_OCID")
-        self.availability_domain = self._get_required("OCI_AVAILABILITY_DOMAIN")
+        self.subnet_ocid = self._get_discoverable("OCI_SUBNET_OCID")
+        self.image_ocid = self._get_discoverable("OCI_IMAGE_OCID")
+        # OCI_AVAILABILITY_DOMAIN may list several ADs separated by commas; the
+        # first one is the primary launch target
+        self.set_availability_domains(self._get_discoverable("OCI_AVAILABILITY_DOMAIN"))
         self.instance_name = os.getenv("OCI_INSTANCE_NAME", "free-arm-instance")
         self.ocpus = int(os.getenv("OCI_OCPUS", "4"))
         self.memory_gb = int(os.getenv("OCI_MEMORY_GB", "24"))
@@ -40,9 +89,141 @@ class Config:
         # Telegram Configuration
         self.telegram_bot_token = self._get_required("TELEGRAM_BOT_TOKEN")
         self.telegram_chat_id = self._get_required("TELEGRAM_CHAT_ID")
+        self.telegram_api_url = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+        
+        # Further notification channels (each enabled by its target) and the
+        # outbox that retries undelivered success messages
+        self.notify_webhook_url = os.getenv("NOTIFY_WEBHOOK_URL", "")
+        self.notify_webhook_timeout = self._parse_timeout("NOTIFY_WEBHOOK_TIMEOUT", "5,15")
+        self.notify_smtp_host = os.getenv("NOTIFY_SMTP_HOST", "")
+        self.notify_smtp_port = int(os.getenv("NOTIFY_SMTP_PORT", "25"))
+        self.notify_smtp_username = os.getenv("NOTIFY_SMTP_USERNAME", "")
+        self.notify_smtp_password = os.getenv("NOTIFY_SMTP_PASSWORD", "")
+        self.notify_smtp_from = os.getenv("NOTIFY_SMTP_FROM", "oracle-auto-register@localhost")
+        self.notify_smtp_to = [address.strip() for address in os.getenv("NOTIFY_SMTP_TO", "").split(",") if address.strip()]
+        self.notify_smtp_timeout = float(os.getenv("NOTIFY_SMTP_TIMEOUT", "15"))
+        self.notify_file = os.getenv("NOTIFY_FILE", "")  # "-" for stdout
+        self.notify_outbox_path = os.getenv("NOTIFY_OUTBOX_PATH", "notification_outbox.ndjson")
+        self.notify_outbox_retry_seconds = float(os.getenv("NOTIFY_OUTBOX_RETRY_SECONDS", "60"))
         
         # Retry Configuration
         self.retry_interval = int(os.getenv("RETRY_INTERVAL_SECONDS", "60"))
+        
+        # Event journal (NDJSON, one line per engine event); empty disables it
+        self.journal_path = os.getenv("JOURNAL_PATH", "launch_journal.ndjson")
+        
+        # Coordination between redundant deployments (shared rate limit and
+        # claimed flag); disabled unless a backend URL is set
+        self.coordination_url = os.getenv("COORDINATION_URL", "")
+        self.coordination_node_id = os.getenv("COORDINATION_NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+        self.coordination_claim_ttl_hours = float(os.getenv("COORDINATION_CLAIM_TTL_HOURS", "24"))
+        
+        # Redeploy handoff: only the holder of the attempt lease (on the
+        # coordination backend) launches, and it passes the lease on at SIGTERM
+        self.handoff_enabled = os.getenv("HANDOFF_ENABLED", "false").lower() == "true"
+        self.handoff_lease_seconds = int(os.getenv("HANDOFF_LEASE_SECONDS", "15"))
+        
+        # Runtime Control API (web service); disabled unless a token is set
+        self.control_api_token = os.getenv("CONTROL_API_TOKEN")
+        
+        # Timeouts ("connect,read" seconds) per endpoint and circuit breakers
+        self.oci_compute_timeout = self._parse_timeout("OCI_COMPUTE_TIMEOUT", "5,60")
+        self.oci_network_timeout = self._parse_timeout("OCI_NETWORK_TIMEOUT", "5,30")
+        self.oci_identity_timeout = self._parse_timeout("OCI_IDENTITY_TIMEOUT", "5,30")
+        self.oci_limits_timeout = self._parse_timeout("OCI_LIMITS_TIMEOUT", "5,30")
+        self.telegram_timeout = self._parse_timeout("TELEGRAM_TIMEOUT", "5,15")
+        self.breaker_failure_threshold = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+        self.breaker_recovery_seconds = float(os.getenv("BREAKER_RECOVERY_SECONDS", "60"))
+        
+        # Watchdog Configuration (web service)
+        # Restart the background loop when an attempt or notification runs longer
+        # than WATCHDOG_STALL_SECONDS, or the loop thread dies
+        self.watchdog_enabled = os.getenv("WATCHDOG_ENABLED", "true").lower() == "true"
+        self.watchdog_stall_seconds = float(os.getenv("WATCHDOG_STALL_SECONDS", "300"))
+        self.watchdog_max_restarts = int(os.getenv("WATCHDOG_MAX_RESTARTS", "3"))
+        
+        # Reclaim Watch Configuration
+        # After a success, poll the instance and relaunch as soon as Oracle
+        # reclaims or terminates it (in every mode)
+        self.reclaim_watch_enabled = os.getenv("RECLAIM_WATCH_ENABLED", "false").lower() == "true"
+        self.reclaim_watch_interval = int(os.getenv("RECLAIM_WATCH_INTERVAL_SECONDS", "900"))
+        
+        # Inventory Configuration
+        # The web service lists the compartment's instances in the background
+        # for /api/instances and the dashboard; 0 disables it
+        self.inventory_refresh_seconds = float(os.getenv("INVENTORY_REFRESH_SECONDS", "300"))
+        
+        # Memory Configuration
+        # LOW_MEMORY_MODE trims the footprint for 512 MB hosts; /debug/memory
+        # reports RSS against MEMORY_BUDGET_MB (and top allocation sites when
+        # TRACEMALLOC_FRAMES > 0)
+        self.low_memory_mode = os.getenv("LOW_MEMORY_MODE", "false").lower() == "true"
+        self.memory_budget_mb = int(os.getenv("MEMORY_BUDGET_MB", "400"))
+        self.tracemalloc_frames = int(os.getenv("TRACEMALLOC_FRAMES", "0"))
+        
+        # Hedging Configuration
+        # Issue a second launch request to the next AD when the first one is
+        # slower than the learned HEDGE_PERCENTILE latency
+        self.hedge_enabled = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+        self.hedge_percentile = float(os.getenv("HEDGE_PERCENTILE", "95"))
+        self.hedge_min_delay = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "2"))
+        
+        # Target Bandit Configuration
+        # With several ADs in OCI_AVAILABILITY_DOMAIN, pick each attempt's AD by
+        # Thompson sampling over recent outcomes (decaying with the half-life)
+        self.bandit_enabled = os.getenv("BANDIT_ENABLED", "true").lower() == "true"
+        self.bandit_half_life_minutes = float(os.getenv("BANDIT_HALF_LIFE_MINUTES", "30"))
+        
+        # Fast Launch Configuration
+        # Send launch requests as pre-built, signed raw HTTP requests instead of
+        # through the SDK; SDK models are only built for a created instance
+        self.fast_launch_enabled = os.getenv("FAST_LAUNCH_ENABLED", "false").lower() == "true"
+        
+        # Quota Fill Configuration
+        # Keep launching shapes from the ladder until the free A1 quota is used up
+        self.fill_quota = os.getenv("FILL_QUOTA", "false").lower() == "true"
+        self.shape_ladder = self._parse_shape_ladder(os.getenv("SHAPE_LADDER", "4:24,2:12,1:6"))
+        
+        # Provisioning Configuration
+        # After a launch succeeds, wait for RUNNING, boot volume, public IP,
+        # optional block volume attach and SSH reachability
+        self.provisioning_enabled = os.getenv("PROVISIONING_ENABLED", "true").lower() == "true"
+        self.provision_timeout = float(os.getenv("PROVISION_TIMEOUT_SECONDS", "600"))
+        self.provision_ssh_timeout = float(os.getenv("PROVISION_SSH_TIMEOUT_SECONDS", "300"))
+        self.provision_block_volume_ocid = os.getenv("PROVISION_BLOCK_VOLUME_OCID") or None
+        
+        # Preflight Configuration
+        self.preflight_timeout = float(os.getenv("PREFLIGHT_TIMEOUT_SECONDS", "15"))
+        self.preflight_cache_path = os.getenv("PREFLIGHT_CACHE_PATH", ".preflight_cache.json")
+        self.preflight_cache_ttl_hours = float(os.getenv("PREFLIGHT_CACHE_TTL_HOURS", "12"))
+        
+        # Multi-Region Configuration
+        # OCI_REGION_PROFILES is a JSON list of region profiles; when unset the
+        # single region configured above is the only profile.
+        self.region_profiles = self._parse_region_profiles(os.getenv("OCI_REGION_PROFILES"))
+        self.stop_policy = os.getenv("STOP_POLICY", "first_success").lower()
+        self.quota_ocpus = int(os.getenv("A1_QUOTA_OCPUS", "4"))
+        self.quota_memory_gb = int(os.getenv("A1_QUOTA_MEMORY_GB", "24"))
+        
+        # Multi-Account Configuration
+        # The account configured above is the primary one; OCI_ACCOUNT_PROFILES
+        # adds more accounts driven by the same process.
+        self.account_name = os.getenv("OCI_ACCOUNT_NAME", "default")
+        # With COORDINATION_URL the limit defaults to one attempt per retry
+        # interval, shared by every deployment (below one per minute for
+        # intervals over 60s); without it, unlimited
+        rate_limit = os.getenv("ACCOUNT_RATE_LIMIT_PER_MINUTE", "")
+        if rate_limit:
+            self.rate_limit_per_minute = float(rate_limit)
+        elif self.coordination_url:
+            self.rate_limit_per_minute = 60.0 / max(self.retry_interval, 1)
+        else:
+            self.rate_limit_per_minute = 0
+        self.max_workers = int(os.getenv("MAX_WORKERS", "4"))
+        self.account_profiles = self._parse_account_profiles(os.getenv("OCI_ACCOUNT_PROFILES"))
+        
+        if self.stop_policy not in self.STOP_POLICIES:
+            raise ValueError(f"Invalid STOP_POLICY: {self.stop_policy} (expected one of {', '.join(self.STOP_POLICIES)})")
     
     def _get_required(self, key: str) -> str:
         """Get a required environment variable or raise an error."""
@@ -51,6 +232,180 @@ class Config:
             raise ValueError(f"Missing required environment variable: {key}")
         return value
     
+    def _parse_timeout(self, key: str, default: str) -> tuple:
+        """Parse a "connect,read" timeout variable (a single value is used for both)."""
+        raw = os.getenv(key, default)
+        try:
+            values = [float(part) for part in raw.split(",")]
+        except ValueError:
+            raise ValueError(f"Invalid {key}: {raw} (expected connect,read seconds)")
+        if len(values) == 1:
+            values = values * 2
+        if len(values) != 2 or min(values) <= 0:
+            raise ValueError(f"Invalid {key}: {raw} (expected connect,read seconds)")
+        return tuple(values)
+    
+    def _parse_shape_ladder(self, raw: str) -> list:
+        """Parse SHAPE_LADDER ("ocpus:memory_gb,...") into (ocpus, memory_gb) tuples, largest first."""
+        ladder = []
+        for step in raw.split(","):
+            step = step.strip()
+            if not step:
+                continue
+            try:
+                ocpus, memory_gb = (int(part) for part in step.split(":"))
+            except ValueError:
+                raise ValueError(f"Invalid SHAPE_LADDER step '{step}' (expected ocpus:memory_gb)")
+            if ocpus <= 0 or memory_gb <= 0:
+                raise ValueError(f"Invalid SHAPE_LADDER step '{step}' (values must be positive)")
+            ladder.append((ocpus, memory_gb))
+        
+        if not ladder:
+            raise ValueError("SHAPE_LADDER must contain at least one ocpus:memory_gb step")
+        return sorted(set(ladder), reverse=True)
+    
+    def set_availability_domains(self, value):
+        """Set the AD list from a comma-separated string or a list; the first AD is the primary."""
+        if isinstance(value, str):
+            value = [domain.strip() for domain in value.split(",") if domain.strip()]
+        self.availability_domains = list(value or [])
+        self.availability_domain = self.availability_domains[0] if self.availability_domains else None
+    
+    def _get_discoverable(self, key: str) -> str:
+        """Get a variable that is required unless auto-discovery is enabled."""
+        if self.auto_discover:
+            return os.getenv(key) or None
+        return self._get_required(key)
+    
+    def _parse_region_profiles(self, raw: str) -> list:
+        """Parse OCI_REGION_PROFILES, falling back to the single configured region."""
+        if not raw:
+            return [{
+                "name": self.oci_region,
+                "region": self.oci_region,
+                "subnet_ocid": self.subnet_ocid,
+                "image_ocid": self.image_ocid,
+                "availability_domain": ",".join(self.availability_domains) or None,
+            }]
+        
+        try:
+            profiles = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"OCI_REGION_PROFILES is not valid JSON: {e}")
+        
+        if not isinstance(profiles, list) or not profiles:
+            raise ValueError("OCI_REGION_PROFILES must be a non-empty JSON list")
+        
+        names = set()
+        for index, profile in enumerate(profiles):
+            if not isinstance(profile, dict):
+                raise ValueError(f"OCI_REGION_PROFILES entry #{index + 1} must be an object")
+            
+            required_keys = ["region"] if self.auto_discover else self.REGION_PROFILE_KEYS
+            missing = [key for key in required_keys if not profile.get(key)]
+            if missing:
+                raise ValueError(f"OCI_REGION_PROFILES entry #{index + 1} is missing: {', '.join(missing)}")
+            
+            # Give every profile a unique name for status reporting
+            name = profile.get("name") or profile["region"]
+            if name in names:
+                name = f"{name}#{index + 1}"
+            names.add(name)
+            profile["name"] = name
+        
+        return profiles
+    
+    def _parse_account_profiles(self, raw: str) -> list:
+        """Parse OCI_ACCOUNT_PROFILES into a list of extra account profiles."""
+        if not raw:
+            return []
+        
+        try:
+            profiles = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"OCI_ACCOUNT_PROFILES is not valid JSON: {e}")
+        
+        if not isinstance(profiles, list):
+            raise ValueError("OCI_ACCOUNT_PROFILES must be a JSON list")
+        
+        names = {self.account_name}
+        for index, profile in enumerate(profiles):
+            if not isinstance(profile, dict):
+                raise ValueError(f"OCI_ACCOUNT_PROFILES entry #{index + 1} must be an object")
+            
+            missing = [key for key in self.ACCOUNT_PROFILE_KEYS if not profile.get(key)]
+            if not profile.get("private_key_path") and not profile.get("private_key_content"):
+                missing.append("private_key_path or private_key_content")
+            if not profile.get("regions") and not self.auto_discover:
+                missing.extend(key for key in ["subnet_ocid", "image_ocid", "availability_domain"] if not profile.get(key))
+            if missing:
+                raise ValueError(f"OCI_ACCOUNT_PROFILES entry #{index + 1} is missing: {', '.join(missing)}")
+            
+            unknown = set(profile) - set(self.ACCOUNT_PROFILE_FIELDS) - {"name", "regions"}
+            if unknown:
+                raise ValueError(f"OCI_ACCOUNT_PROFILES entry #{index + 1} has unknown keys: {', '.join(sorted(unknown))}")
+            
+            if profile["name"] in names:
+                raise ValueError(f"Duplicate account name in OCI_ACCOUNT_PROFILES: {profile['name']}")
+            names.add(profile["name"])
+        
+        return profiles
+    
+    def for_account(self, profile: dict) -> "Config":
+        """Return a copy of this configuration for another account profile."""
+        account_config = copy.copy(self)
+        account_config.account_name = profile["name"]
+        
+        # A profile's key replaces the primary key entirely, whichever form it uses
+        account_config.oci_private_key_path = None
+        account_config.oci_private_key_content = None
+        
+        for key, attribute in self.ACCOUNT_PROFILE_FIELDS.items():
+            if key in profile:
+                value = profile[key]
+                if attribute in ("ocpus", "memory_gb"):
+                    value = int(value)
+                elif attribute == "rate_limit_per_minute":
+                    value = float(value)
+                setattr(account_config, attribute, value)
+        
+        account_config.set_availability_domains(account_config.availability_domain)
+        
+        regions = profile.get("regions")
+        account_config.region_profiles = account_config._parse_region_profiles(json.dumps(regions) if regions else None)
+        account_config.account_profiles = []
+        return account_config
+    
+    def accounts(self) -> list:
+        """Return one Config per account, primary account first."""
+        return [self] + [self.for_account(profile) for profile in self.account_profiles]
+    
+    def pipeline_configs(self) -> list:
+        """Return one Config per account and region pipeline."""
+        return [
+            account.for_region(profile)
+            for account in self.accounts()
+            for profile in account.region_profiles
+        ]
+    
+    @property
+    def is_multi_pipeline(self) -> bool:
+        """True when more than one account or region pipeline is configured."""
+        return bool(self.account_profiles) or len(self.region_profiles) > 1
+    
+    def for_region(self, profile: dict) -> "Config":
+        """Return a copy of this configuration targeting a single region profile."""
+        region_config = copy.copy(self)
+        region_config.oci_region = profile["region"]
+        region_config.subnet_ocid = profile.get("subnet_ocid")
+        region_config.image_ocid = profile.get("image_ocid")
+        region_config.set_availability_domains(profile.get("availability_domain"))
+        region_config.instance_name = profile.get("instance_name", self.instance_name)
+        region_config.ocpus = int(profile.get("ocpus", self.ocpus))
+        region_config.memory_gb = int(profile.get("memory_gb", self.memory_gb))
+        region_config.region_profiles = [profile]
+        return region_config
+    
     def get_oci_config(self) -> dict:
         """Return OCI configuration dictionary for SDK."""
         config = {
@@ -94,8 +449,23 @@ class Config:
                 ("Image OCID", self.image_ocid),
             ]
             
+            for account in self.accounts():
+                if account is not self:
+                    required_ocids.append((f"User OCID ({account.account_name})", account.oci_user_ocid))
+                    required_ocids.append((f"Tenancy OCID ({account.account_name})", account.oci_tenancy_ocid))
+                    required_ocids.append((f"Compartment OCID ({account.account_name})", account.compartment_ocid))
+                for profile in account.region_profiles:
+                    required_ocids.append((f"Subnet OCID ({account.account_name}/{profile['name']})", profile.get("subnet_ocid")))
+                    required_ocids.append((f"Image OCID ({account.account_name}/{profile['name']})", profile.get("image_ocid")))
+                if account.oci_private_key_path and not os.path.exists(account.oci_private_key_path):
+                    print(f"❌ Private key file not found for {account.account_name}: {account.oci_private_key_path}")
+                    return False
+            
             for name, ocid in required_ocids:
-                if not ocid.startswith("ocid1."):
+                if ocid is None and self.auto_discover:
+                    # Filled in later by the resource resolver
+                    continue
+                if not ocid or not ocid.startswith("ocid1."):
                     print(f"❌ Invalid {name} format: {ocid}")
                     return False
             
@@ -116,5 +486,10 @@ if __name__ == "__main__":
         print(f"💻 Instance: {config.instance_name}")
         print(f"🔧 OCPUs: {config.ocpus}, Memory: {config.memory_gb}GB")
         print(f"⏱️  Retry interval: {config.retry_interval}s")
+        if len(config.region_profiles) > 1:
+            print(f"🌏 Regions: {', '.join(p['name'] for p in config.region_profiles)}")
+            print(f"🛑 Stop policy: {config.stop_policy}")
+        if config.account_profiles:
+            print(f"👥 Accounts: {', '.join(account.account_name for account in config.accounts())}")
     except ValueError as e:
         print(f"❌ Configuration error: {e}")
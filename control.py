@@ -0,0 +1,176 @@
+"""
+Runtime control for the launch loops.
+Lets the web API pause, resume, retune and trigger attempts while the loop is
+running. Waits between attempts are event-driven, so a command takes effect
+within milliseconds instead of after the current sleep.
+"""
+
+import threading
+import time
+
+
+class LoopControl:
+    """Pause/resume, retune and wake-up signals shared by the launch loops."""
+    
+    # Settings that can be changed at runtime, mapped to their Config attribute
+    TUNABLE_FIELDS = {
+        "retry_interval": "retry_interval",
+        "ocpus": "ocpus",
+        "memory_gb": "memory_gb",
+    }
+    
+    def __init__(self):
+        self.paused = False
+        self.configs = []
+        self.commands = 0
+        self.last_command = None
+        self._attempt_now = False
+        self._stopped = False
+        self._listeners = []
+        self._cond = threading.Condition()
+    
+    def attach(self, config) -> bool:
+        """
+        Register a config whose tunable settings follow retune().
+        
+        Returns:
+            False if it was already attached (e.g. by the web service)
+        """
+        with self._cond:
+            if any(attached is config for attached in self.configs):
+                return False
+            self.configs.append(config)
+            return True
+    
+    def detach(self, config):
+        """Stop applying retune() to a config (e.g. of a stopped engine)."""
+        with self._cond:
+            self.configs = [attached for attached in self.configs if attached is not config]
+    
+    def add_listener(self, listener):
+        """Call listener(command) after every command (used by schedulers with their own wait)."""
+        with self._cond:
+            self._listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        """Stop notifying a listener (e.g. of a stopped scheduler)."""
+        with self._cond:
+            self._listeners = [registered for registered in self._listeners if registered != listener]
+    
+    def pause(self):
+        """Stop starting new attempts until resume()."""
+        self._command("pause", paused=True)
+    
+    def resume(self):
+        """Resume attempts after pause()."""
+        self._command("resume", paused=False)
+    
+    def attempt_now(self):
+        """Wake the loop for an immediate attempt (also while paused)."""
+        self._command("attempt_now", attempt_now=True)
+    
+    def stop(self):
+        """Wake the loop and make every further wait return immediately."""
+        self._command("stop", stopped=True)
+    
+    def retune(self, **settings) -> dict:
+        """
+        Change tunable settings on every attached config.
+        
+        Args:
+            retry_interval, ocpus, memory_gb: new positive integer values
+        
+        Returns:
+            dict of the settings that were applied
+        
+        Raises:
+            ValueError: on unknown settings or non-positive values
+        """
+        applied = {}
+        for key, value in settings.items():
+            if key not in self.TUNABLE_FIELDS:
+                raise ValueError(f"Unknown setting: {key}")
+            if value is None:
+                continue
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid value for {key}: {value}")
+            if value <= 0:
+                raise ValueError(f"{key} must be positive")
+            applied[key] = value
+        
+        with self._cond:
+            for config in self.configs:
+                for key, value in applied.items():
+                    setattr(config, self.TUNABLE_FIELDS[key], value)
+        
+        self._command("retune")
+        return applied
+    
+    def wake(self):
+        """Wake every waiter so it re-checks its stop event."""
+        with self._cond:
+            self._cond.notify_all()
+    
+    def consume_attempt_now(self) -> bool:
+        """Return True (once) if an immediate attempt was requested."""
+        with self._cond:
+            requested = self._attempt_now
+            self._attempt_now = False
+            return requested
+    
+    def wait(self, interval_fn, stop_event: threading.Event = None) -> str:
+        """
+        Wait until the next attempt is due.
+        
+        Args:
+            interval_fn: Returns the current retry interval; re-read after every
+                command so a retune applies to the wait already in progress
+            stop_event: Ends the wait when set (call wake() after setting it)
+        
+        Returns:
+            "due", "attempt_now" or "stop"
+        """
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                if self._stopped or (stop_event and stop_event.is_set()):
+                    return "stop"
+                if self._attempt_now:
+                    self._attempt_now = False
+                    return "attempt_now"
+                
+                if self.paused:
+                    self._cond.wait()
+                    continue
+                
+                remaining = started + interval_fn() - time.monotonic()
+                if remaining <= 0:
+                    return "due"
+                self._cond.wait(remaining)
+    
+    def to_dict(self) -> dict:
+        """Serializable control state for the API."""
+        return {
+            "paused": self.paused,
+            "commands": self.commands,
+            "last_command": self.last_command,
+        }
+    
+    def _command(self, name: str, paused: bool = None, attempt_now: bool = False, stopped: bool = False):
+        """Apply a command, wake every waiter and notify listeners."""
+        with self._cond:
+            if paused is not None:
+                self.paused = paused
+            if attempt_now:
+                self._attempt_now = True
+            if stopped:
+                self._stopped = True
+            self.commands += 1
+            self.last_command = name
+            listeners = list(self._listeners)
+            self._cond.notify_all()
+        
+        for listener in listeners:
+            listener(name)
@@ -0,0 +1,613 @@
+"""
+Coordination between redundant deployments running against the same tenancy.
+A shared backend holds one token bucket per tenancy, so the launch attempts of
+all deployments together stay within ACCOUNT_RATE_LIMIT_PER_MINUTE, and an
+"instance claimed" flag, so every deployment stops once one of them succeeds.
+It also holds the attempt lease and checkpoint of redeploy handoffs (handoff.py).
+
+Backends (COORDINATION_URL):
+- sqlite:///coordination.db          deployments on the same host
+- redis://[:password@]host:port/db   deployments on several hosts; works with
+                                     Redis or the stand-in coordination_server.py
+"""
+
+import json
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import unquote, urlparse
+
+from breakers import get_breaker
+from config import Config
+
+
+def get_timestamp() -> str:
+    """Get current timestamp for logging."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Token bucket for the Redis backend, run atomically on the server with the
+# server's clock; mirrors take_token() below (coordination_server.py runs it
+# through take_token() instead of Lua)
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local capacity = math.max(1, rate)
+local tokens = capacity
+if state[1] then
+    tokens = math.min(capacity, tonumber(state[1]) + math.max(0, now - tonumber(state[2])) * rate / 60)
+end
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) * 60 / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+""".strip()
+
+# Attempt lease for the Redis backend: take it if free, renew it if the caller
+# holds it, in one step; mirrors LocalBackend.hold()
+LEASE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and cjson.decode(current)['node_id'] ~= ARGV[2] then
+    return current
+end
+if current then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return current
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return ARGV[1]
+""".strip()
+
+# Compare-and-delete for the Redis backend: delete a claim, lease or checkpoint
+# only if the caller holds it, in one step; mirrors LocalBackend.release()
+RELEASE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and cjson.decode(current)['node_id'] == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""".strip()
+
+
+class CoordinationError(ConnectionError):
+    """The coordination backend is unreachable or failed (counts against its circuit breaker)."""
+
+
+class RespError(Exception):
+    """Error reply from a Redis protocol server."""
+
+
+def take_token(tokens: float, updated: float, now: float, rate_per_minute: float) -> tuple:
+    """
+    Refill a token bucket and try to take one token.
+    
+    Args:
+        tokens: Tokens left at the last update (None for a new bucket, which starts full)
+        updated: Time of the last update in seconds
+        now: Current time in seconds
+        rate_per_minute: Refill rate per minute (may be below 1), also the
+            bucket capacity (at least one token)
+    
+    Returns:
+        (tokens, wait): tokens left, and 0 if a token was taken, otherwise
+        seconds until one will be available
+    """
+    capacity = max(1.0, float(rate_per_minute))
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + max(0.0, now - updated) * rate_per_minute / 60.0)
+    
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) * 60.0 / rate_per_minute
+
+
+class LocalBackend:
+    """In-process backend, used while the shared backend is unavailable."""
+    
+    name = "local"
+    
+    def __init__(self):
+        self._buckets = {}
+        self._claims = {}
+        self._lock = threading.Lock()
+    
+    def reserve(self, bucket: str, rate_per_minute: float) -> float:
+        """Take a token from a bucket; returns 0 or seconds until one is available."""
+        with self._lock:
+            now = time.time()
+            tokens, updated = self._buckets.get(bucket, (None, now))
+            tokens, wait = take_token(tokens, updated, now, rate_per_minute)
+            self._buckets[bucket] = (tokens, now)
+            return wait
+    
+    def claim(self, key: str, value: dict, ttl: float) -> bool:
+        """Set a claim unless one exists; returns True if this call set it."""
+        with self._lock:
+            current = self._claims.get(key)
+            if current and current[1] > time.time():
+                return False
+            self._claims[key] = (value, time.time() + ttl)
+            return True
+    
+    def hold(self, key: str, value: dict, ttl: float) -> dict:
+        """
+        Set a key unless another node holds it, or extend it if value's node holds it.
+        
+        Returns:
+            The value now held (value itself, the renewed one or another node's)
+        """
+        with self._lock:
+            current = self._claims.get(key)
+            if current and current[1] > time.time():
+                if current[0].get("node_id") != value["node_id"]:
+                    return current[0]
+                value = current[0]
+            self._claims[key] = (value, time.time() + ttl)
+            return value
+    
+    def get_claim(self, key: str) -> dict:
+        """Return the current claim, or None."""
+        with self._lock:
+            current = self._claims.get(key)
+        if current and current[1] > time.time():
+            return current[0]
+        return None
+    
+    def put(self, key: str, value: dict, ttl: float):
+        """Set a key, replacing any current value."""
+        with self._lock:
+            self._claims[key] = (value, time.time() + ttl)
+    
+    def release(self, key: str, node_id: str) -> bool:
+        """Delete a claim if node_id holds it; returns True if it was deleted."""
+        with self._lock:
+            current = self._claims.get(key)
+            if current and current[0].get("node_id") == node_id:
+                del self._claims[key]
+                return True
+            return False
+
+
+class SQLiteBackend:
+    """Backend for deployments on one host, sharing a SQLite file (locked per transaction)."""
+    
+    name = "sqlite"
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS claims (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+        except sqlite3.Error as e:
+            raise CoordinationError(f"Cannot open coordination database {path}: {e}") from e
+    
+    def reserve(self, bucket: str, rate_per_minute: float) -> float:
+        """Take a token from a bucket; returns 0 or seconds until one is available."""
+        def update():
+            now = time.time()
+            row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (bucket,)).fetchone()
+            tokens, wait = take_token(row[0] if row else None, row[1] if row else now, now, rate_per_minute)
+            self._conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (bucket, tokens, now))
+            return wait
+        
+        return self._transaction(update)
+    
+    def claim(self, key: str, value: dict, ttl: float) -> bool:
+        """Set a claim unless one exists; returns True if this call set it."""
+        def insert():
+            now = time.time()
+            self._conn.execute("DELETE FROM claims WHERE key = ? AND expires <= ?", (key, now))
+            cursor = self._conn.execute("INSERT OR IGNORE INTO claims VALUES (?, ?, ?)",
+                                        (key, json.dumps(value), now + ttl))
+            return cursor.rowcount == 1
+        
+        return self._transaction(insert)
+    
+    def hold(self, key: str, value: dict, ttl: float) -> dict:
+        """
+        Set a key unless another node holds it, or extend it if value's node holds it.
+        
+        Returns:
+            The value now held (value itself, the renewed one or another node's)
+        """
+        def update():
+            now = time.time()
+            row = self._conn.execute("SELECT value FROM claims WHERE key = ? AND expires > ?", (key, now)).fetchone()
+            held = json.loads(row[0]) if row else value
+            if held.get("node_id") == value["node_id"]:
+                self._conn.execute("INSERT OR REPLACE INTO claims VALUES (?, ?, ?)", (key, json.dumps(held), now + ttl))
+            return held
+        
+        return self._transaction(update)
+    
+    def get_claim(self, key: str) -> dict:
+        """Return the current claim, or None."""
+        def select():
+            row = self._conn.execute("SELECT value FROM claims WHERE key = ? AND expires > ?",
+                                     (key, time.time())).fetchone()
+            return json.loads(row[0]) if row else None
+        
+        return self._transaction(select)
+    
+    def put(self, key: str, value: dict, ttl: float):
+        """Set a key, replacing any current value."""
+        def replace():
+            self._conn.execute("INSERT OR REPLACE INTO claims VALUES (?, ?, ?)",
+                               (key, json.dumps(value), time.time() + ttl))
+        
+        self._transaction(replace)
+    
+    def release(self, key: str, node_id: str) -> bool:
+        """Delete a claim if node_id holds it; returns True if it was deleted."""
+        def delete():
+            row = self._conn.execute("SELECT value FROM claims WHERE key = ?", (key,)).fetchone()
+            if not row or json.loads(row[0]).get("node_id") != node_id:
+                return False
+            self._conn.execute("DELETE FROM claims WHERE key = ?", (key,))
+            return True
+        
+        return self._transaction(delete)
+    
+    def _transaction(self, body):
+        """Run body in an immediate (write-locked) transaction."""
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    result = body()
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                self._conn.execute("COMMIT")
+                return result
+            except sqlite3.Error as e:
+                raise CoordinationError(f"SQLite coordination failed: {e}") from e
+
+
+class RedisBackend:
+    """Backend for deployments on several hosts, speaking the Redis protocol (RESP)."""
+    
+    name = "redis"
+    TIMEOUT = 5.0
+    
+    def __init__(self, host: str, port: int = 6379, password: str = None, username: str = None, db: int = 0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.username = username
+        self.db = db
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+    
+    def reserve(self, bucket: str, rate_per_minute: float) -> float:
+        """Take a token from a bucket; returns 0 or seconds until one is available."""
+        return float(self.command("EVAL", TOKEN_BUCKET_SCRIPT, 1, bucket, rate_per_minute))
+    
+    def claim(self, key: str, value: dict, ttl: float) -> bool:
+        """Set a claim unless one exists; returns True if this call set it."""
+        return self.command("SET", key, json.dumps(value), "NX", "EX", max(1, int(ttl))) == "OK"
+    
+    def hold(self, key: str, value: dict, ttl: float) -> dict:
+        """
+        Set a key unless another node holds it, or extend it if value's node holds it.
+        
+        Returns:
+            The value now held (value itself, the renewed one or another node's)
+        """
+        return json.loads(self.command("EVAL", LEASE_SCRIPT, 1, key, json.dumps(value), value["node_id"],
+                                       max(1, int(ttl))))
+    
+    def get_claim(self, key: str) -> dict:
+        """Return the current claim, or None."""
+        value = self.command("GET", key)
+        return json.loads(value) if value else None
+    
+    def put(self, key: str, value: dict, ttl: float):
+        """Set a key, replacing any current value."""
+        self.command("SET", key, json.dumps(value), "EX", max(1, int(ttl)))
+    
+    def release(self, key: str, node_id: str) -> bool:
+        """Delete a claim if node_id holds it; returns True if it was deleted."""
+        return self.command("EVAL", RELEASE_SCRIPT, 1, key, node_id) == 1
+    
+    def command(self, *args):
+        """Send one command and return its reply (reconnecting if needed)."""
+        with self._lock:
+            try:
+                if not self._sock:
+                    self._connect()
+                return self._call(args)
+            except OSError as e:
+                self._close()
+                raise CoordinationError(f"Redis coordination failed: {e}") from e
+    
+    def _connect(self):
+        """Open the connection, authenticate and select the database."""
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.TIMEOUT)
+        self._reader = self._sock.makefile("rb")
+        try:
+            if self.password:
+                self._call(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+            if self.db:
+                self._call(("SELECT", self.db))
+        except RespError:
+            # Don't keep an unauthenticated connection around
+            self._close()
+            raise
+    
+    def _close(self):
+        """Drop the connection; the next command reconnects."""
+        if self._sock:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+    
+    def _call(self, args):
+        """Write a command as a RESP array of bulk strings and read the reply."""
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+    
+    def _read_reply(self):
+        """Read one RESP reply."""
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionResetError("Coordination server closed the connection")
+        kind, payload = line[:1], line[1:-2]
+        
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise RespError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            return self._reader.read(length + 2)[:-2].decode("utf-8")
+        if kind == b"*":
+            length = int(payload)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise ConnectionResetError(f"Unexpected reply from coordination server: {line!r}")
+
+
+def create_backend(url: str):
+    """
+    Create the backend for a COORDINATION_URL.
+    
+    Raises:
+        ValueError: on an unsupported URL scheme
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        # sqlite:///relative.db or sqlite:////absolute/path.db
+        return SQLiteBackend(parsed.path[1:] if parsed.path.startswith("/") else parsed.path)
+    if parsed.scheme == "redis":
+        return RedisBackend(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            password=unquote(parsed.password) if parsed.password else None,
+            username=unquote(parsed.username) if parsed.username else None,
+            db=int(parsed.path.lstrip("/") or 0)
+        )
+    raise ValueError(f"Unsupported COORDINATION_URL scheme: {parsed.scheme or url}")
+
+
+class SharedRateLimiter:
+    """Token bucket shared by every deployment (same interface as orchestrator.RateLimiter)."""
+    
+    def __init__(self, coordinator: "Coordinator", bucket: str, rate_per_minute: float):
+        self.coordinator = coordinator
+        self.bucket = bucket
+        self.rate_per_minute = rate_per_minute
+    
+    def reserve(self) -> float:
+        """
+        Take a token if one is available.
+        
+        Returns:
+            0 if a token was taken, otherwise seconds until one will be available
+        """
+        if self.rate_per_minute <= 0:
+            return 0.0
+        return self.coordinator.reserve(self.bucket, self.rate_per_minute)
+    
+    def wait(self, stop_event: threading.Event) -> bool:
+        """
+        Block until a token is taken.
+        
+        Returns:
+            False if stop_event was set first
+        """
+        while True:
+            delay = self.reserve()
+            if delay <= 0:
+                return True
+            if stop_event.wait(delay):
+                return False
+
+
+class Coordinator:
+    """
+    Shared rate limits and claim flags on a coordination backend.
+    
+    Calls go through a circuit breaker; while the backend is unavailable this
+    deployment falls back to local limits and claims instead of stopping. The
+    attempt lease and checkpoints have no local fallback (every process would
+    hold its own lease): their calls raise CoordinationError instead.
+    """
+    
+    def __init__(self, backend, config: Config):
+        self.backend = backend
+        self.node_id = config.coordination_node_id
+        self.claim_ttl = config.coordination_claim_ttl_hours * 3600
+        self.breaker = get_breaker(f"coordination.{backend.name}", config)
+        self.local = LocalBackend()
+        self.degraded = False
+        self.stats = {
+            "backend": backend.name,
+            "node_id": self.node_id,
+            "reserved": 0,
+            "throttled": 0,
+            "fallbacks": 0,
+            "last_error": None,
+        }
+    
+    def limiter(self, config: Config) -> SharedRateLimiter:
+        """Launch rate limiter for the tenancy of config, shared by all deployments."""
+        return SharedRateLimiter(self, f"launch:{config.oci_tenancy_ocid}", config.rate_limit_per_minute)
+    
+    def reserve(self, bucket: str, rate_per_minute: float) -> float:
+        """Take a token from a shared bucket; returns 0 or seconds until one is available."""
+        wait = self._call("reserve", bucket, rate_per_minute)
+        self.stats["reserved" if wait <= 0 else "throttled"] += 1
+        return wait
+    
+    def claim(self, config: Config, instance: dict) -> bool:
+        """
+        Record that an instance was created for the tenancy of config.
+        
+        Returns:
+            True if this deployment's claim was first
+        """
+        value = {
+            "node_id": self.node_id,
+            "instance_id": instance["id"],
+            "name": instance.get("name"),
+            "region": instance.get("region"),
+            "claimed_at": get_timestamp(),
+        }
+        return self._call("claim", f"claimed:{config.oci_tenancy_ocid}", value, self.claim_ttl)
+    
+    def release(self, config: Config) -> bool:
+        """
+        Withdraw this deployment's claim for the tenancy of config (its
+        instance was reclaimed), so every deployment launches again.
+        
+        Returns:
+            True if a claim of this deployment was removed
+        """
+        return self._call("release", f"claimed:{config.oci_tenancy_ocid}", self.node_id)
+    
+    def hold_lease(self, config: Config, owner: str, ttl: float) -> dict:
+        """
+        Take or renew the attempt lease for the tenancy of config (HANDOFF_ENABLED).
+        
+        Args:
+            config: Configuration of the tenancy
+            owner: Lease owner (one per process)
+            ttl: Seconds until the lease expires unless renewed
+        
+        Returns:
+            The current lease (owner's own if it holds the lease now)
+        
+        Raises:
+            CoordinationError: The backend is unavailable (the lease is unknown)
+        """
+        lease = {"node_id": owner, "since": get_timestamp()}
+        return self._call_shared("hold", f"lease:{config.oci_tenancy_ocid}", lease, ttl)
+    
+    def release_lease(self, config: Config, owner: str) -> bool:
+        """Yield the attempt lease for the tenancy of config if owner holds it."""
+        return self._call_shared("release", f"lease:{config.oci_tenancy_ocid}", owner)
+    
+    def save_checkpoint(self, config: Config, checkpoint: dict, ttl: float):
+        """Store the handoff checkpoint for the tenancy of config."""
+        self._call_shared("put", f"checkpoint:{config.oci_tenancy_ocid}", checkpoint, ttl)
+    
+    def load_checkpoint(self, config: Config) -> dict:
+        """
+        Take the checkpoint handed over for the tenancy of config.
+        
+        The checkpoint is consumed, so a later cold start doesn't resume from it.
+        
+        Returns:
+            The checkpoint, or None unless the previous holder handed over
+        """
+        key = f"checkpoint:{config.oci_tenancy_ocid}"
+        checkpoint = self._call_shared("get_claim", key)
+        if not checkpoint:
+            return None
+        self._call_shared("release", key, checkpoint.get("node_id"))
+        return checkpoint if checkpoint.get("handed_over") else None
+    
+    def claimed_elsewhere(self, config: Config) -> dict:
+        """Return the claim of another deployment for the tenancy of config, or None."""
+        claim = self._call("get_claim", f"claimed:{config.oci_tenancy_ocid}")
+        if claim and claim.get("node_id") != self.node_id:
+            return claim
+        return None
+    
+    def to_dict(self) -> dict:
+        """Serializable coordination state for /api/status."""
+        return dict(self.stats, degraded=self.degraded)
+    
+    def _call(self, method: str, *args):
+        """Call the shared backend, falling back to the local one while it is unavailable."""
+        try:
+            result = self.breaker.call(getattr(self.backend, method), *args)
+        except Exception as e:
+            self.stats["fallbacks"] += 1
+            self.stats["last_error"] = str(e)[:200]
+            if not self.degraded:
+                self.degraded = True
+                print(f"[{get_timestamp()}] ⚠️ Coordination backend unavailable, using local limits: {e}", flush=True)
+            return getattr(self.local, method)(*args)
+        
+        if self.degraded:
+            self.degraded = False
+            print(f"[{get_timestamp()}] ✅ Coordination backend reachable again", flush=True)
+        return result
+    
+    def _call_shared(self, method: str, *args):
+        """Call the shared backend without a local fallback (lease and checkpoints)."""
+        try:
+            return self.breaker.call(getattr(self.backend, method), *args)
+        except Exception as e:
+            self.stats["last_error"] = str(e)[:200]
+            if isinstance(e, CoordinationError):
+                raise
+            raise CoordinationError(f"Coordination backend unavailable: {e}") from e
+
+
+# One coordinator per backend URL, shared by every pipeline in the process
+_coordinators = {}
+_registry_lock = threading.Lock()
+
+
+def get_coordinator(config: Config) -> Coordinator:
+    """Return the shared coordinator for COORDINATION_URL, or None if coordination is off."""
+    if not config.coordination_url:
+        return None
+    with _registry_lock:
+        if config.coordination_url not in _coordinators:
+            _coordinators[config.coordination_url] = Coordinator(create_backend(config.coordination_url), config)
+        return _coordinators[config.coordination_url]
+
+
+def coordination_states() -> dict:
+    """State of every coordinator, keyed by backend name (URLs may hold passwords)."""
+    with _registry_lock:
+        coordinators = list(_coordinators.values())
+    return {coordinator.backend.name: coordinator.to_dict() for coordinator in coordinators}
@@ -0,0 +1,240 @@
+"""
+Stand-in coordination server speaking the Redis protocol (RESP).
+Implements just the commands the coordination client sends - PING, AUTH,
+SELECT, GET, SET (NX/XX, EX/PX), DEL and EVAL of the token bucket, lease and
+release scripts - so redundant deployments on several hosts can share rate limits, the
+claimed flag and the handoff lease without running Redis. State is kept in memory.
+
+Usage:
+    python coordination_server.py                          # 127.0.0.1:6380
+    python coordination_server.py --host 0.0.0.0 --port 6380 --password secret
+
+Then point every deployment at it:
+    COORDINATION_URL=redis://:secret@coordination-host:6380/0
+"""
+
+import argparse
+import json
+import socketserver
+import threading
+import time
+from datetime import datetime
+
+from coordination import LEASE_SCRIPT, RELEASE_SCRIPT, TOKEN_BUCKET_SCRIPT, take_token
+
+
+def get_timestamp() -> str:
+    """Get current timestamp for logging."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class CommandError(Exception):
+    """Sent back to the client as a RESP error reply."""
+
+
+class Status(str):
+    """Simple string reply (+OK) rather than a bulk string."""
+
+
+class CoordinationStore:
+    """In-memory keys with expiry and token buckets, one lock for atomic commands."""
+    
+    def __init__(self):
+        self.values = {}  # key -> (value, expires_at or None)
+        self.buckets = {}  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+    
+    def execute(self, name: str, args: list):
+        """Run one command and return its reply."""
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if not handler:
+            raise CommandError(f"ERR unknown command '{name}'")
+        with self._lock:
+            return handler(args)
+    
+    def _get(self, key: str):
+        """Current value of a key, dropping it once expired."""
+        entry = self.values.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del self.values[key]
+            return None
+        return entry[0] if entry else None
+    
+    def _cmd_ping(self, args):
+        return args[0] if args else Status("PONG")
+    
+    def _cmd_select(self, args):
+        # A single keyspace; every database index shares it
+        return Status("OK")
+    
+    def _cmd_get(self, args):
+        if len(args) != 1:
+            raise CommandError("ERR wrong number of arguments for 'get' command")
+        return self._get(args[0])
+    
+    def _cmd_set(self, args):
+        if len(args) < 2:
+            raise CommandError("ERR wrong number of arguments for 'set' command")
+        key, value, options = args[0], args[1], [option.upper() for option in args[2:]]
+        
+        expires_at = None
+        if "EX" in options or "PX" in options:
+            unit = "EX" if "EX" in options else "PX"
+            try:
+                amount = int(options[options.index(unit) + 1])
+            except (IndexError, ValueError):
+                raise CommandError("ERR syntax error")
+            expires_at = time.time() + (amount if unit == "EX" else amount / 1000.0)
+        
+        exists = self._get(key) is not None
+        if ("NX" in options and exists) or ("XX" in options and not exists):
+            return None
+        self.values[key] = (value, expires_at)
+        return Status("OK")
+    
+    def _cmd_del(self, args):
+        deleted = 0
+        for key in args:
+            if self._get(key) is not None:
+                del self.values[key]
+                deleted += 1
+            if self.buckets.pop(key, None) is not None:
+                deleted += 1
+        return deleted
+    
+    def _cmd_eval(self, args):
+        if len(args) < 3 or args[1] != "1":
+            raise CommandError("ERR wrong number of arguments for 'eval' command")
+        script, _, key, *argv = args
+        if script.strip() == TOKEN_BUCKET_SCRIPT and len(argv) == 1:
+            return self._token_bucket(key, float(argv[0]))
+        if script.strip() == LEASE_SCRIPT and len(argv) == 3:
+            return self._lease(key, argv[0], argv[1], int(argv[2]))
+        if script.strip() == RELEASE_SCRIPT and len(argv) == 1:
+            return self._release(key, argv[0])
+        raise CommandError("NOSCRIPT This server only runs the coordination token bucket, lease and release scripts")
+    
+    def _token_bucket(self, key: str, rate: float) -> str:
+        """TOKEN_BUCKET_SCRIPT: take a token; returns the wait in seconds."""
+        now = time.time()
+        tokens, updated = self.buckets.get(key, (None, now))
+        tokens, wait = take_token(tokens, updated, now, rate)
+        self.buckets[key] = (tokens, now)
+        return repr(wait)
+    
+    def _lease(self, key: str, value: str, node_id: str, ttl: int) -> str:
+        """LEASE_SCRIPT: take the lease if free, renew it if node_id holds it; returns the lease held."""
+        current = self._get(key)
+        if current is not None:
+            if json.loads(current).get("node_id") != node_id:
+                return current
+            value = current
+        self.values[key] = (value, time.time() + ttl)
+        return value
+    
+    def _release(self, key: str, node_id: str) -> int:
+        """RELEASE_SCRIPT: delete the key if node_id holds it; returns the number of keys deleted."""
+        current = self._get(key)
+        if current is None or json.loads(current).get("node_id") != node_id:
+            return 0
+        del self.values[key]
+        return 1
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """One client connection: read commands, write replies."""
+    
+    def handle(self):
+        authenticated = not self.server.password
+        while True:
+            try:
+                args = self._read_command()
+            except (OSError, ValueError):
+                return
+            if args is None:
+                return
+            if not args:
+                continue
+            
+            name = args[0].upper()
+            try:
+                if name == "AUTH":
+                    # AUTH password, or AUTH username password
+                    if args[-1] != self.server.password:
+                        raise CommandError("WRONGPASS invalid username-password pair")
+                    authenticated = True
+                    reply = Status("OK")
+                elif name == "QUIT":
+                    self._write(Status("OK"))
+                    return
+                elif not authenticated:
+                    raise CommandError("NOAUTH Authentication required.")
+                else:
+                    reply = self.server.store.execute(name, args[1:])
+            except CommandError as e:
+                reply = e
+            self._write(reply)
+    
+    def _read_command(self) -> list:
+        """Read a RESP array of bulk strings (or an inline command); None at EOF."""
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.decode("utf-8").split()
+        
+        args = []
+        for _ in range(int(line[1:])):
+            header = self.rfile.readline()
+            if not header.startswith(b"$"):
+                raise ValueError("Expected a bulk string")
+            args.append(self.rfile.read(int(header[1:]) + 2)[:-2].decode("utf-8"))
+        return args
+    
+    def _write(self, reply):
+        """Encode a reply as RESP."""
+        if isinstance(reply, CommandError):
+            data = b"-%s\r\n" % str(reply).encode("utf-8")
+        elif isinstance(reply, Status):
+            data = b"+%s\r\n" % reply.encode("utf-8")
+        elif reply is None:
+            data = b"$-1\r\n"
+        elif isinstance(reply, int):
+            data = b":%d\r\n" % reply
+        else:
+            encoded = str(reply).encode("utf-8")
+            data = b"$%d\r\n%s\r\n" % (len(encoded), encoded)
+        self.wfile.write(data)
+
+
+class CoordinationServer(socketserver.ThreadingTCPServer):
+    """Threaded TCP server sharing one CoordinationStore."""
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, address: tuple, password: str = None):
+        self.store = CoordinationStore()
+        self.password = password
+        super().__init__(address, RespHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in Redis-protocol coordination server")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=6380, help="Port to listen on (default: 6380)")
+    parser.add_argument("--password", default=None, help="Require AUTH with this password")
+    args = parser.parse_args()
+    
+    server = CoordinationServer((args.host, args.port), password=args.password)
+    print(f"[{get_timestamp()}] 🤝 Coordination server listening on {args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n[{get_timestamp()}] Coordination server stopped", flush=True)
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
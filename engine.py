@@ -0,0 +1,719 @@
+"""
+Launch engine shared by the CLI and the web service.
+Runs the launch attempts (single target, quota fill or multi-pipeline) and
+publishes every outcome as an event. Observers - console, notifications, the
+journal, the web dashboard - each consume events from their own queue in
+their own thread, so a slow observer never delays the next attempt.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bandit import export_bandits, import_bandits
+from config import Config
+from control import LoopControl
+from coordination import get_coordinator
+from notifications import Notifier
+from oci_client import OCIClient
+from orchestrator import LaunchOrchestrator
+from provisioning import ProvisioningPipeline, ProvisioningStep
+from quota_fill import QuotaFiller
+
+
+def get_timestamp() -> str:
+    """Get current timestamp for logging."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class LaunchEvent:
+    """Something that happened in the engine, as published to observers."""
+    
+    __slots__ = ("type", "timestamp", "data")
+    
+    # Event types
+    STANDBY = "standby"                  # warmed up, waiting for the attempt lease of a redeploy
+    STARTED = "started"                  # engine started (mode, targets, settings)
+    ATTEMPT_STARTED = "attempt_started"  # single-target attempt about to run
+    ATTEMPT = "attempt"                  # attempt finished (success, capacity error or error)
+    SUCCESS = "success"                  # instance created
+    PROVISION_STEP = "provision_step"    # post-launch provisioning step started or completed
+    PROVISIONED = "provisioned"          # every provisioning step of an instance completed
+    CLAIMED = "claimed"                  # another deployment already created the instance
+    WATCHING = "watching"                # polling the created instance for reclaim
+    RECLAIMED = "reclaimed"              # the created instance was reclaimed; relaunching
+    FINISHED = "finished"                # engine stopped (created instances, totals)
+    
+    def __init__(self, event_type: str, **data):
+        self.type = event_type
+        self.timestamp = datetime.now()
+        self.data = data
+    
+    def to_dict(self) -> dict:
+        """Serializable form used by the journal."""
+        return dict(self.data, type=self.type, timestamp=self.timestamp.isoformat(timespec="milliseconds"))
+
+
+class Observer:
+    """Consumer of engine events; handle() runs in the observer's own thread."""
+    
+    name = "observer"
+    
+    def handle(self, event: LaunchEvent):
+        """Consume one event; subclasses override it for the event types they care about."""
+    
+    def close(self):
+        """Release resources after the last event."""
+
+
+class EventBus:
+    """Fan events out to observers through one queue and thread per observer."""
+    
+    _CLOSE = object()
+    
+    def __init__(self, observers: list):
+        self.observers = list(observers)
+        self._queues = []
+        self._threads = []
+        
+        for observer in self.observers:
+            events = queue.Queue()
+            thread = threading.Thread(
+                target=self._dispatch,
+                args=(observer, events),
+                name=f"observer-{observer.name}",
+                daemon=True
+            )
+            self._queues.append(events)
+            self._threads.append(thread)
+            thread.start()
+    
+    def publish(self, event: LaunchEvent):
+        """Queue an event for every observer (never blocks)."""
+        for events in self._queues:
+            events.put_nowait(event)
+    
+    def close(self, timeout: float = 30.0):
+        """Let every observer drain its queue, waiting at most timeout seconds in total."""
+        for events in self._queues:
+            events.put_nowait(self._CLOSE)
+        
+        deadline = time.monotonic() + timeout
+        for observer, thread in zip(self.observers, self._threads):
+            thread.join(max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                print(f"[{get_timestamp()}] ⚠️ Observer '{observer.name}' did not finish its queue in time", flush=True)
+    
+    def _dispatch(self, observer: Observer, events: queue.Queue):
+        """Observer thread body; an observer error never affects the others."""
+        while True:
+            event = events.get()
+            if event is self._CLOSE:
+                break
+            try:
+                observer.handle(event)
+            except Exception as e:
+                print(f"[{get_timestamp()}] ⚠️ Observer '{observer.name}' failed on {event.type}: {e}", flush=True)
+        
+        try:
+            observer.close()
+        except Exception as e:
+            print(f"[{get_timestamp()}] ⚠️ Observer '{observer.name}' failed to close: {e}", flush=True)
+
+
+class ConsoleObserver(Observer):
+    """Print the launch progress."""
+    
+    name = "console"
+    
+    def __init__(self, interactive: bool = False):
+        self.interactive = interactive
+    
+    def handle(self, event: LaunchEvent):
+        data = event.data
+        prefix = f"[{data['target']}] " if data.get("target") else ""
+        
+        if event.type == LaunchEvent.STARTED:
+            self._print_started(data)
+        
+        elif event.type == LaunchEvent.STANDBY:
+            print(f"[{get_timestamp()}] ⏸️ Warmed up; standing by until {data['holder']['node_id']} "
+                  "yields the attempt lease", flush=True)
+        
+        elif event.type == LaunchEvent.ATTEMPT_STARTED:
+            print(f"[{get_timestamp()}] {prefix}Attempt #{data['attempt']} - Trying to create instance...", flush=True)
+        
+        elif event.type == LaunchEvent.ATTEMPT:
+            if data["success"]:
+                instance = data["instance"]
+                print(f"\n🎉 {prefix}SUCCESS! Instance created on attempt #{data['attempt']}", flush=True)
+                print(f"   Instance ID: {instance['id']}", flush=True)
+                print(f"   Public IP: {instance['public_ip']}", flush=True)
+            elif data["is_capacity_error"]:
+                print(f"[{get_timestamp()}] {prefix}⏳ Out of capacity. Retrying in {data['retry_interval']}s...", flush=True)
+            else:
+                print(f"[{get_timestamp()}] {prefix}❌ Error: {data['message']}", flush=True)
+        
+        elif event.type == LaunchEvent.PROVISION_STEP:
+            step = data["step"]
+            if step["status"] != ProvisioningStep.RUNNING:
+                timing = f" ({step['duration']}s)" if step["duration"] is not None else ""
+                print(f"[{get_timestamp()}] {prefix}{ProvisioningStep.ICONS[step['status']]} "
+                      f"{data['instance_name']} · {step['label']}: {step['detail']}{timing}", flush=True)
+        
+        elif event.type == LaunchEvent.PROVISIONED:
+            outcome = "ready" if data["succeeded"] else "provisioned with failures"
+            print(f"[{get_timestamp()}] {prefix}🛠️ {data['instance_name']} {outcome} "
+                  f"after {data['provisioning']['duration']}s", flush=True)
+        
+        elif event.type == LaunchEvent.CLAIMED:
+            claim = data["claim"]
+            print(f"[{get_timestamp()}] {prefix}🤝 Instance already claimed by {claim['node_id']} "
+                  f"({claim['name'] or claim['instance_id']}), stopping", flush=True)
+        
+        elif event.type == LaunchEvent.WATCHING:
+            print(f"[{get_timestamp()}] {prefix}👀 Watching {data['instance'].get('name') or data['instance']['id']} "
+                  f"for reclaim every {data['interval']}s", flush=True)
+        
+        elif event.type == LaunchEvent.RECLAIMED:
+            hours = data["watched_seconds"] / 3600
+            print(f"[{get_timestamp()}] {prefix}♻️ {data['instance'].get('name') or data['instance']['id']} is "
+                  f"{data['state']} after {hours:.1f}h, relaunching", flush=True)
+        
+        elif event.type == LaunchEvent.FINISHED:
+            if data["instances"]:
+                print(f"\n✅ Created {len(data['instances'])} instance(s) after {data['total_attempts']} attempts", flush=True)
+            else:
+                print(f"\n⏹️ Launch engine stopped after {data['total_attempts']} attempts", flush=True)
+    
+    def _print_started(self, data: dict):
+        """Print the startup summary for the engine's mode."""
+        if data["mode"] == LaunchEngine.MULTI_PIPELINE:
+            print("\n🚀 Starting multi-pipeline auto-register loop...", flush=True)
+            print(f"   • Pipelines: {', '.join(data['targets'])}", flush=True)
+            print(f"   • Workers: {data['max_workers']}", flush=True)
+            print(f"   • Stop policy: {data['stop_policy']}", flush=True)
+        elif data["mode"] == LaunchEngine.QUOTA_FILL:
+            print("\n🚀 Starting quota fill loop...", flush=True)
+            print(f"   • Shape ladder: {', '.join(data['targets'])}", flush=True)
+        else:
+            print("\n🚀 Starting auto-register loop...", flush=True)
+            print(f"   • Target: VM.Standard.A1.Flex in {data['region']}", flush=True)
+        
+        print(f"   • Retry interval: {data['retry_interval']} seconds", flush=True)
+        if data["resumed"]:
+            resumed = data["resumed"]
+            print(f"   • Resumed from {resumed['node_id']} after {resumed['total_attempts']} attempts", flush=True)
+        if self.interactive:
+            print("   • Press Ctrl+C to stop\n", flush=True)
+
+
+class NotificationObserver(Observer):
+    """Send the startup, success and reclaim notifications (per account when several are configured)."""
+    
+    name = "notify"
+    
+    def __init__(self, config: Config, notifier: Notifier):
+        self.notifier = notifier
+        self.notifiers = {config.account_name: notifier}
+        for account_config in config.accounts():
+            if account_config.account_name not in self.notifiers:
+                self.notifiers[account_config.account_name] = Notifier(account_config)
+    
+    def handle(self, event: LaunchEvent):
+        if event.type == LaunchEvent.STARTED and event.data["announce"]:
+            # Every account's channels, but accounts sharing the same channels only once
+            announced = set()
+            for notifier in self.notifiers.values():
+                if notifier.destinations not in announced:
+                    announced.add(notifier.destinations)
+                    notifier.send_startup_message()
+        
+        elif event.type == LaunchEvent.SUCCESS:
+            notifier = self.notifiers.get(event.data["account"], self.notifier)
+            if not notifier.send_success_message(event.data["instance"]):
+                print(f"[{get_timestamp()}] ⚠️ Failed to send success notification", flush=True)
+        
+        elif event.type == LaunchEvent.PROVISION_STEP:
+            # Stream each completed step; skipped steps only matter on the dashboard
+            if event.data["step"]["status"] in (ProvisioningStep.DONE, ProvisioningStep.FAILED):
+                notifier = self.notifiers.get(event.data["account"], self.notifier)
+                notifier.send_provisioning_message(event.data["instance_name"], event.data["step"])
+        
+        elif event.type == LaunchEvent.RECLAIMED:
+            notifier = self.notifiers.get(event.data["account"], self.notifier)
+            if not notifier.send_reclaimed_message(event.data["instance"], event.data["state"]):
+                print(f"[{get_timestamp()}] ⚠️ Failed to send reclaim notification", flush=True)
+
+
+class JournalObserver(Observer):
+    """Append every event to an NDJSON journal (one JSON object per line)."""
+    
+    name = "journal"
+    
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+    
+    def handle(self, event: LaunchEvent):
+        self._file.write(json.dumps(event.to_dict(), default=str) + "\n")
+        self._file.flush()
+    
+    def close(self):
+        self._file.close()
+
+
+def default_observers(config: Config, notifier: Notifier, interactive: bool = False) -> list:
+    """Console, notification and (when JOURNAL_PATH is set) journal observers."""
+    observers = [ConsoleObserver(interactive=interactive), NotificationObserver(config, notifier)]
+    if config.journal_path:
+        try:
+            observers.append(JournalObserver(config.journal_path))
+        except OSError as e:
+            print(f"⚠️ Could not open journal {config.journal_path}: {e}", flush=True)
+    return observers
+
+
+class LaunchEngine:
+    """
+    Run launch attempts until an instance is created (or the quota is filled)
+    and publish every outcome to the observers.
+    
+    The mode follows the configuration:
+    - multi_pipeline: one pipeline per account and region (LaunchOrchestrator)
+    - quota_fill: shapes from SHAPE_LADDER until the free quota is used (QuotaFiller)
+    - single: one target, one attempt per retry interval
+    """
+    
+    SINGLE = "single"
+    QUOTA_FILL = "quota_fill"
+    MULTI_PIPELINE = "multi_pipeline"
+    
+    def __init__(self, config: Config, oci_client: OCIClient = None, observers: list = (),
+                 control: LoopControl = None, on_heartbeat=None, announce: bool = True, handoff=None):
+        """
+        Args:
+            config: Application configuration
+            oci_client: Client for single and quota-fill modes (created when omitted)
+            observers: Event consumers, each fed from its own queue and thread
+            control: Runtime control (pause, resume, retune, attempt-now)
+            on_heartbeat: Liveness callback for the watchdog
+            announce: Send the startup notification (False for a restarted worker)
+            handoff: Attempt lease of the process (HANDOFF_ENABLED); the engine
+                attempts only while it holds the lease
+        """
+        self.config = config
+        self.control = control or LoopControl()
+        self.on_heartbeat = on_heartbeat
+        self.announce = announce
+        self.handoff = handoff
+        self.resumed = None  # checkpoint of the process this one took over from
+        self.instances = []
+        self.total_attempts = 0
+        self.provisioning = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._finished = threading.Event()
+        self._attached = False  # config attached to the control by this engine
+        
+        # Post-launch provisioning runs beside the launch loop and the notifications
+        self._provisioning_executor = None
+        if config.provisioning_enabled:
+            self._provisioning_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="provision")
+        
+        # Shared rate limit and claimed flag across deployments (COORDINATION_URL)
+        self.coordinator = get_coordinator(config)
+        self.limiter = None
+        
+        if config.is_multi_pipeline:
+            self.mode = self.MULTI_PIPELINE
+            self.oci_client = None
+            self.runner = LaunchOrchestrator(
+                config, on_update=self._on_pipeline_update, control=self.control, on_heartbeat=on_heartbeat,
+                on_claimed=self._on_pipeline_claimed, on_watch=self._on_pipeline_watch,
+                on_reclaimed=self._on_pipeline_reclaimed
+            )
+        else:
+            self.oci_client = oci_client or OCIClient(config)
+            if config.fill_quota:
+                self.mode = self.QUOTA_FILL
+                self.runner = QuotaFiller(
+                    config, self.oci_client, on_update=self._on_quota_update,
+                    control=self.control, on_heartbeat=on_heartbeat,
+                    on_watch=self._on_quota_watch, on_reclaimed=self._on_quota_reclaimed
+                )
+            else:
+                self.mode = self.SINGLE
+                self.runner = None
+                self._attached = self.control.attach(config)
+                if self.coordinator:
+                    self.limiter = self.coordinator.limiter(config)
+        
+        # Observers start last, so a failed setup leaves no threads behind
+        self.bus = EventBus(observers)
+    
+    @property
+    def quota_state(self) -> dict:
+        """Live quota fill progress (quota_fill mode only)."""
+        return self.runner.state if self.mode == self.QUOTA_FILL else None
+    
+    @property
+    def region_states(self) -> dict:
+        """Live per-pipeline state (multi_pipeline mode only)."""
+        return self.runner.region_states if self.mode == self.MULTI_PIPELINE else None
+    
+    @property
+    def account_states(self) -> dict:
+        """Live per-account state (multi_pipeline mode only)."""
+        return self.runner.account_states if self.mode == self.MULTI_PIPELINE else None
+    
+    def run(self) -> bool:
+        """
+        Run until the job is done or stop() is called.
+        
+        Returns:
+            True if at least one instance was created
+        """
+        try:
+            # A redeployed process waits, warmed up, until the old one yields the lease
+            if self.handoff and not self._take_over():
+                return False
+            
+            self.bus.publish(LaunchEvent(LaunchEvent.STARTED, **self._describe()))
+            
+            if self.runner:
+                self.runner.run()
+            else:
+                self._run_single()
+            
+            # Let provisioning of the created instances finish (its steps have their own timeouts)
+            if self._provisioning_executor:
+                self._beat("provisioning", watched=False)
+                stopped = self._stop_event.is_set()
+                self._provisioning_executor.shutdown(wait=not stopped, cancel_futures=stopped)
+            
+            self.bus.publish(LaunchEvent(
+                LaunchEvent.FINISHED,
+                mode=self.mode,
+                instances=list(self.instances),
+                total_attempts=self.total_attempts,
+                stopped=self._stop_event.is_set(),
+            ))
+            return bool(self.instances)
+        finally:
+            if self.handoff:
+                self.handoff.release(self)
+            self._finished.set()
+    
+    def stop(self):
+        """Stop launching; the current attempt finishes first."""
+        self._stop_event.set()
+        self.control.wake()
+        if self.runner:
+            self.runner.stop()
+        for pipeline in list(self.provisioning):
+            pipeline.stop()
+        self._release_control()
+    
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Wait for run() to return.
+        
+        Returns:
+            False if it was still running after timeout
+        """
+        return self._finished.wait(timeout)
+    
+    def checkpoint(self) -> dict:
+        """State a process taking over from this one resumes from."""
+        return {
+            "total_attempts": self.total_attempts,
+            "bandits": export_bandits(),
+        }
+    
+    def close(self, timeout: float = 30.0):
+        """Wait for the observers to handle every queued event (e.g. the success notification)."""
+        self._release_control()
+        self.bus.close(timeout)
+    
+    def _release_control(self):
+        """Stop following runtime control commands (a replacement engine attaches its own)."""
+        if hasattr(self.runner, "release_control"):
+            self.runner.release_control()
+        if self._attached:
+            self.control.detach(self.config)
+            self._attached = False
+    
+    def _run_single(self):
+        """
+        One target, one attempt per retry interval, until an instance is created
+        (with RECLAIM_WATCH_ENABLED, again whenever that instance is reclaimed).
+        """
+        attempt = self.total_attempts
+        while not self._stop_event.is_set():
+            # Another deployment may already have created the instance
+            claim = self.coordinator.claimed_elsewhere(self.config) if self.coordinator else None
+            if claim:
+                self.bus.publish(LaunchEvent(LaunchEvent.CLAIMED, target=None, account=self.config.account_name,
+                                             claim=claim))
+                return
+            
+            # Wait for the shared rate limit, if any
+            if self.limiter:
+                self._beat("throttled", watched=False)
+                if not self.limiter.wait(self._stop_event):
+                    return
+            
+            attempt += 1
+            self.bus.publish(LaunchEvent(LaunchEvent.ATTEMPT_STARTED, target=None, attempt=attempt))
+            self._beat("attempt")
+            
+            try:
+                result = self.oci_client.create_instance()
+            except Exception as e:
+                print(f"[{get_timestamp()}] ❌ Exception in create_instance: {e}", flush=True)
+                print(traceback.format_exc(), flush=True)
+                result = {
+                    "success": False,
+                    "message": f"Exception: {e}",
+                    "instance": None,
+                    "is_capacity_error": False
+                }
+            
+            # A stopped engine (replaced worker) only reports a success from its in-flight attempt
+            if self._stop_event.is_set() and not result["success"]:
+                return
+            
+            self._record(result, self.oci_client, self.config, target=None, account=self.config.account_name,
+                         attempt=attempt, retry_interval=self.config.retry_interval)
+            if result["success"]:
+                if self.coordinator and not self.coordinator.claim(self.config, result["instance"]):
+                    print(f"[{get_timestamp()}] ⚠️ Another deployment claimed an instance at the same time", flush=True)
+                if not self.config.reclaim_watch_enabled or not self._watch(result["instance"]):
+                    return
+                # Reclaimed: relaunch at once with the warm client and prepared request
+                continue
+            
+            # Interruptible wait: pause, retune and attempt-now apply immediately. The
+            # shared rate limit, when set, paces the attempts instead of the retry interval
+            self._beat("waiting", watched=False, cycle=True)
+            if self.control.wait(self._retry_interval, self._stop_event) == "stop":
+                return
+    
+    def _retry_interval(self) -> float:
+        """Seconds to wait after a failed attempt (0 when the shared rate limit paces the loop)."""
+        if self.limiter and self.limiter.rate_per_minute > 0:
+            return 0
+        return self.config.retry_interval
+    
+    def _watch(self, instance: dict) -> bool:
+        """
+        Poll a created instance every RECLAIM_WATCH_INTERVAL_SECONDS.
+        
+        Returns:
+            True once the instance was reclaimed, False if the engine stopped
+        """
+        started = time.monotonic()
+        polls = 0
+        self.bus.publish(LaunchEvent(LaunchEvent.WATCHING, target=None, account=self.config.account_name,
+                                     instance=instance, interval=self.config.reclaim_watch_interval))
+        
+        while True:
+            self._beat("watching", watched=False)
+            if self.control.wait(lambda: self.config.reclaim_watch_interval, self._stop_event) == "stop":
+                return False
+            
+            self._beat("watch poll")
+            try:
+                state = self.oci_client.get_lifecycle_state(instance["id"])
+            except Exception as e:
+                print(f"[{get_timestamp()}] ⚠️ Could not poll {instance.get('name') or instance['id']}: {e}", flush=True)
+                continue
+            polls += 1
+            if state not in OCIClient.RECLAIMED_STATES:
+                continue
+            
+            self._forget(instance)
+            # Let every deployment launch again
+            if self.coordinator:
+                self.coordinator.release(self.config)
+            
+            self.bus.publish(LaunchEvent(
+                LaunchEvent.RECLAIMED,
+                target=None,
+                account=self.config.account_name,
+                instance=instance,
+                state=state,
+                polls=polls,
+                watched_seconds=round(time.monotonic() - started),
+            ))
+            return True
+    
+    def _forget(self, instance: dict):
+        """Drop a reclaimed instance and stop its provisioning."""
+        with self._lock:
+            self.instances = [created for created in self.instances if created["id"] != instance["id"]]
+        for pipeline in list(self.provisioning):
+            if pipeline.instance["id"] == instance["id"]:
+                pipeline.stop()
+    
+    def _take_over(self) -> bool:
+        """
+        Acquire the attempt lease and resume from the previous holder's checkpoint.
+        
+        Returns:
+            False if the engine was stopped while standing by
+        """
+        # Build the launch requests first, so the first attempt goes out as soon as the lease is ours
+        if self.oci_client:
+            self.oci_client.warm_up()
+        
+        def on_standby(lease: dict):
+            self.bus.publish(LaunchEvent(LaunchEvent.STANDBY, target=None, holder=lease))
+        
+        if not self.handoff.acquire(self, self._stop_event, on_standby=on_standby,
+                                    on_wait=lambda: self._beat("standby", watched=False)):
+            return False
+        
+        self.resumed = self.handoff.take_checkpoint()
+        if self.resumed:
+            self.total_attempts = self.resumed["total_attempts"]
+            import_bandits(self.resumed["bandits"], self.config)
+        return True
+    
+    def _on_pipeline_update(self, orchestrator: LaunchOrchestrator, pipeline, result: dict):
+        """Publish a finished multi-pipeline attempt."""
+        self._record(result, pipeline.oci_client, pipeline.config, target=pipeline.name, account=pipeline.account.name,
+                     attempt=pipeline.state["attempt"], retry_interval=pipeline.config.retry_interval)
+    
+    def _on_pipeline_claimed(self, orchestrator: LaunchOrchestrator, account, claim: dict):
+        """Publish that another deployment already created an account's instance."""
+        self.bus.publish(LaunchEvent(LaunchEvent.CLAIMED, target=account.name, account=account.name, claim=claim))
+    
+    def _on_pipeline_watch(self, orchestrator: LaunchOrchestrator, pipeline, instance: dict):
+        """Publish that a multi-pipeline instance is watched for reclaim."""
+        self.bus.publish(LaunchEvent(LaunchEvent.WATCHING, target=pipeline.name, account=pipeline.account.name,
+                                     instance=instance, interval=pipeline.config.reclaim_watch_interval))
+    
+    def _on_pipeline_reclaimed(self, orchestrator: LaunchOrchestrator, pipeline, instance: dict, state: str,
+                               watched_seconds: int):
+        """Publish that a multi-pipeline instance was reclaimed (its pipelines are relaunching)."""
+        self._forget(instance)
+        self.bus.publish(LaunchEvent(LaunchEvent.RECLAIMED, target=pipeline.name, account=pipeline.account.name,
+                                     instance=instance, state=state, watched_seconds=watched_seconds))
+    
+    def _on_quota_watch(self, filler: QuotaFiller, instance: dict):
+        """Publish that a quota-fill instance is watched for reclaim."""
+        self.bus.publish(LaunchEvent(LaunchEvent.WATCHING, target=f"{instance['ocpus']}/{instance['memory_gb']}GB",
+                                     account=self.config.account_name, instance=instance,
+                                     interval=self.config.reclaim_watch_interval))
+    
+    def _on_quota_reclaimed(self, filler: QuotaFiller, instance: dict, state: str, watched_seconds: int):
+        """Publish that a quota-fill instance was reclaimed (the fill resumes)."""
+        self._forget(instance)
+        self.bus.publish(LaunchEvent(LaunchEvent.RECLAIMED, target=f"{instance['ocpus']}/{instance['memory_gb']}GB",
+                                     account=self.config.account_name, instance=instance, state=state,
+                                     watched_seconds=watched_seconds))
+    
+    def _on_quota_update(self, filler: QuotaFiller, result: dict):
+        """Publish a finished quota-fill attempt."""
+        self._record(result, self.oci_client, self.config, target=result["shape"], account=self.config.account_name,
+                     attempt=filler.attempt, retry_interval=self.config.retry_interval)
+    
+    def _record(self, result: dict, oci_client: OCIClient, config: Config, **meta):
+        """Count an attempt, publish its outcome and start provisioning a created instance."""
+        with self._lock:
+            self.total_attempts += 1
+            total_attempts = self.total_attempts
+            if result["success"]:
+                self.instances.append(result["instance"])
+        
+        self.bus.publish(LaunchEvent(
+            LaunchEvent.ATTEMPT,
+            success=result["success"],
+            is_capacity_error=result["is_capacity_error"],
+            message=result["message"],
+            instance=result["instance"],
+            total_attempts=total_attempts,
+            **meta
+        ))
+        if result["success"]:
+            self.bus.publish(LaunchEvent(
+                LaunchEvent.SUCCESS,
+                instance=result["instance"],
+                total_attempts=total_attempts,
+                **meta
+            ))
+            if self._provisioning_executor:
+                self._provisioning_executor.submit(self._provision, result["instance"], oci_client, config, meta)
+    
+    def _provision(self, instance: dict, oci_client: OCIClient, config: Config, meta: dict):
+        """Run the post-launch provisioning steps and publish each one as it completes."""
+        event_meta = {
+            "target": meta["target"],
+            "account": meta["account"],
+            "instance_id": instance["id"],
+            "instance_name": instance.get("name") or instance["id"],
+        }
+        
+        def on_step(pipeline: ProvisioningPipeline, step: ProvisioningStep):
+            self.bus.publish(LaunchEvent(
+                LaunchEvent.PROVISION_STEP,
+                step=step.to_dict(),
+                provisioning=pipeline.to_dict(),
+                **event_meta
+            ))
+        
+        pipeline = ProvisioningPipeline(config, oci_client, instance, on_step=on_step)
+        self.provisioning.append(pipeline)
+        try:
+            succeeded = pipeline.run()
+        except Exception as e:
+            print(f"[{get_timestamp()}] ❌ Provisioning of {event_meta['instance_name']} crashed: {e}", flush=True)
+            print(traceback.format_exc(), flush=True)
+            return
+        
+        self.bus.publish(LaunchEvent(
+            LaunchEvent.PROVISIONED,
+            succeeded=succeeded,
+            provisioning=pipeline.to_dict(),
+            **event_meta
+        ))
+    
+    def _beat(self, phase: str, watched: bool = True, cycle: bool = False):
+        """Report liveness to the watchdog, if any."""
+        if self.on_heartbeat:
+            self.on_heartbeat(phase, watched=watched, cycle=cycle)
+    
+    def _describe(self) -> dict:
+        """Mode and settings for the STARTED event."""
+        if self.mode == self.MULTI_PIPELINE:
+            targets = list(self.runner.region_states)
+        elif self.mode == self.QUOTA_FILL:
+            targets = list(self.runner.state["ladder"])
+        else:
+            targets = [self.config.oci_region]
+        
+        return {
+            "mode": self.mode,
+            "targets": targets,
+            "region": self.config.oci_region,
+            "retry_interval": self.config.retry_interval,
+            "max_workers": self.config.max_workers,
+            "stop_policy": self.config.stop_policy,
+            # The process this one took over from already announced the run
+            "announce": self.announce and not self.resumed,
+            "resumed": self.resumed and {
+                "node_id": self.resumed["node_id"],
+                "saved_at": self.resumed["saved_at"],
+                "total_attempts": self.resumed["total_attempts"],
+            },
+        }
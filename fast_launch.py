@@ -0,0 +1,200 @@
+"""
+Raw-HTTP launch path for LaunchInstance.
+Nearly every attempt ends in an out-of-capacity error, so this path skips the
+SDK request pipeline: the request body and its content hash are built once per
+shape, the request is signed and sent over a pooled keep-alive session, and an
+error is classified from the HTTP status and the error code. The SDK Instance
+model is only deserialized when the launch succeeds.
+"""
+
+import base64
+import hashlib
+import json
+import threading
+
+import oci
+import oci.core
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+
+class LaunchRejected(Exception):
+    """Non-2xx answer to a raw launch request (status, code and message only)."""
+    
+    def __init__(self, status: int, code: str, message: str):
+        self.status = status
+        self.code = code
+        self.message = message
+        super().__init__(f"{status} {code}: {message}")
+
+
+class FastLauncher:
+    """Send pre-built, signed LaunchInstance requests over a pooled HTTP session."""
+    
+    RESOURCE_PATH = "/instances"
+    
+    def __init__(self, config: Config, compute_client: oci.core.ComputeClient):
+        """
+        Args:
+            config: Configuration (credentials and OCI_COMPUTE_TIMEOUT)
+            compute_client: SDK client whose endpoint and deserializer are reused
+        """
+        self.config = config
+        self.base_client = compute_client.base_client
+        self.timeout = config.oci_compute_timeout
+        
+        oci_config = config.get_oci_config()
+        self.signer = oci.signer.Signer(
+            tenancy=oci_config["tenancy"],
+            user=oci_config["user"],
+            fingerprint=oci_config["fingerprint"],
+            private_key_file_location=oci_config.get("key_file"),
+            private_key_content=oci_config.get("key_content")
+        )
+        
+        # Launches (and hedges) reuse the same keep-alive connections
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.url = None
+        # Resolve the endpoint template (dual-stack options, API version) as the SDK does per call
+        self.use_endpoint(self.base_client.handle_service_params_in_endpoint({}, {}, []))
+        
+        self.stats = {
+            "requests": 0,
+            "rejected": 0,
+            "bodies_built": 0,
+            "polls": 0,
+            "not_modified": 0,
+        }
+        self._bodies = {}
+        self._states = {}  # instance id -> (etag, lifecycle state) for conditional polls
+        self._lock = threading.Lock()
+    
+    def use_endpoint(self, endpoint: str):
+        """
+        Send launches to endpoint (the versioned Core Services API root).
+        
+        Proxy and CA bundle settings from the environment are resolved here once
+        rather than by requests on every attempt, which otherwise dominates the
+        CPU cost of a rejected launch.
+        """
+        self.url = endpoint + self.RESOURCE_PATH
+        self.session.trust_env = True
+        settings = self.session.merge_environment_settings(self.url, {}, None, None, None)
+        self.session.proxies = settings["proxies"]
+        self.session.verify = settings["verify"]
+        self.session.cert = settings["cert"]
+        self.session.trust_env = False
+    
+    def launch(self, launch_details: oci.core.models.LaunchInstanceDetails, retry_token: str = None):
+        """
+        Send one launch request.
+        
+        Args:
+            launch_details: Launch details (serialized once per distinct shape/AD/name)
+            retry_token: Optional opc-retry-token
+        
+        Returns:
+            oci.core.models.Instance of the created instance
+        
+        Raises:
+            LaunchRejected: on any non-2xx response
+        """
+        # Copy the prepared request and sign it (date and signature change per attempt)
+        request = self._prepared(launch_details).copy()
+        if retry_token:
+            request.headers["opc-retry-token"] = retry_token
+        self.signer(request)
+        
+        with self._lock:
+            self.stats["requests"] += 1
+        response = self.session.send(request, timeout=self.timeout)
+        
+        if response.ok:
+            return self.base_client.deserialize_response_data(response.content, "Instance")
+        
+        with self._lock:
+            self.stats["rejected"] += 1
+        raise self._rejection(response)
+    
+    def prepare(self, launch_details: oci.core.models.LaunchInstanceDetails):
+        """Serialize the launch request for these details ahead of the first attempt."""
+        self._prepared(launch_details)
+    
+    def lifecycle_state(self, instance_id: str) -> str:
+        """
+        Poll an instance's lifecycle state with a conditional GetInstance.
+        
+        Sends the ETag of the previous answer as If-None-Match; an unchanged
+        instance costs a 304 (or, if the service ignores the header, an
+        answer with the same ETag that is not parsed again).
+        
+        Raises:
+            LaunchRejected: on any other non-2xx response (404 once the instance is gone)
+        """
+        headers = {"accept": "application/json"}
+        cached = self._states.get(instance_id)
+        if cached:
+            headers["if-none-match"] = cached[0]
+        request = self.session.prepare_request(requests.Request("GET", f"{self.url}/{instance_id}", headers=headers))
+        self.signer(request)
+        
+        with self._lock:
+            self.stats["polls"] += 1
+        response = self.session.send(request, timeout=self.timeout)
+        
+        etag = response.headers.get("etag")
+        if cached and (response.status_code == 304 or (response.ok and etag == cached[0])):
+            with self._lock:
+                self.stats["not_modified"] += 1
+            return cached[1]
+        if not response.ok:
+            raise self._rejection(response)
+        
+        state = json.loads(response.content).get("lifecycleState")
+        if etag:
+            self._states[instance_id] = (etag, state)
+        return state
+    
+    def _prepared(self, launch_details: oci.core.models.LaunchInstanceDetails) -> requests.PreparedRequest:
+        """Return the cached, unsigned request for these launch details."""
+        key = (
+            self.url,
+            launch_details.availability_domain,
+            launch_details.shape_config.ocpus,
+            launch_details.shape_config.memory_in_gbs,
+            launch_details.display_name,
+            launch_details.source_details.image_id,
+            launch_details.create_vnic_details.subnet_id,
+        )
+        prepared = self._bodies.get(key)
+        if prepared:
+            return prepared
+        
+        body = json.dumps(self.base_client.sanitize_for_serialization(launch_details)).encode("utf-8")
+        headers = {
+            "accept": "application/json",
+            "content-type": "application/json",
+            "content-length": str(len(body)),
+            # Precomputed, so the signer does not hash the body on every attempt
+            "x-content-sha256": base64.b64encode(hashlib.sha256(body).digest()).decode("utf-8"),
+        }
+        prepared = self.session.prepare_request(requests.Request("POST", self.url, data=body, headers=headers))
+        with self._lock:
+            self._bodies[key] = prepared
+            self.stats["bodies_built"] += 1
+        return prepared
+    
+    @staticmethod
+    def _rejection(response: requests.Response) -> LaunchRejected:
+        """Build a LaunchRejected from the error body's code and message."""
+        code, message = "Unknown", response.reason
+        try:
+            error = json.loads(response.content)
+            code = error.get("code", code)
+            message = error.get("message", message)
+        except ValueError:
+            pass
+        return LaunchRejected(response.status_code, code, message)
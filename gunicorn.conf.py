@@ -33,3 +33,13 @@ def post_fork(server, worker):
     from web_app import start_background_worker
     print(f"[gunicorn] Worker {worker.pid} starting background worker...", flush=True)
     start_background_worker()
+
+
+def worker_exit(server, worker):
+    """
+    Called in the worker process when it exits (SIGTERM on a redeploy).
+    Hand the attempt lease over to the new deployment (HANDOFF_ENABLED) and
+    stop the background refreshes.
+    """
+    from web_app import shutdown
+    shutdown()
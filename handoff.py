@@ -0,0 +1,212 @@
+"""
+Zero-gap handoff between the old and the new process of a redeploy.
+Only the process holding the attempt lease (on the coordination backend)
+launches; it renews the lease in the background. A new process warms up
+completely - clients, preflight, launch requests - and then stands by while
+the old one keeps attempting. On SIGTERM the old process lets its in-flight
+attempt finish, saves a checkpoint (attempt count, AD statistics) and yields
+the lease; the new process takes it within a poll interval, resumes from the
+checkpoint and skips the startup notification. A process that starts without
+a handover (cold start, or after a holder that died) starts from scratch, and
+a holder that loses its lease - or can't renew it before it expires while
+the backend is unavailable - stops attempting. Nobody takes the lease while
+the backend is unavailable.
+"""
+
+import secrets
+import threading
+import time
+from datetime import datetime
+
+from config import Config
+from coordination import CoordinationError, get_coordinator
+
+
+def get_timestamp() -> str:
+    """Get current timestamp for logging."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Handoff:
+    """The attempt lease of one process, shared by its (watchdog-restarted) engines."""
+    
+    POLL_SECONDS = 0.5
+    DRAIN_SECONDS = 20.0  # in-flight attempt allowance at SIGTERM (gunicorn allows 30s)
+    CHECKPOINT_TTL = 24 * 3600
+    
+    def __init__(self, coordinator, config: Config):
+        self.coordinator = coordinator
+        self.config = config
+        # Unique per process, even when COORDINATION_NODE_ID is set
+        self.owner = f"{config.coordination_node_id}#{secrets.token_hex(3)}"
+        self.ttl = max(3, config.handoff_lease_seconds)
+        self.held = False
+        self.engine = None
+        self._checkpoint = None
+        self._renewing = None
+        self._handing_over = False  # set by hand_over(); only then is a checkpoint saved
+        self._lock = threading.Lock()
+    
+    def acquire(self, engine, stop_event: threading.Event, on_standby=None, on_wait=None) -> bool:
+        """
+        Block until this process holds the attempt lease, then attach engine.
+        
+        Args:
+            engine: The LaunchEngine that will attempt (and checkpoint on release)
+            stop_event: Stops waiting when set
+            on_standby: Called with the other process's lease when waiting starts
+            on_wait: Called on every poll while another process holds the lease
+        
+        Returns:
+            False if stop_event was set first
+        """
+        waited_since, predecessor, unavailable = None, None, False
+        while not self.held:
+            try:
+                lease = self.coordinator.hold_lease(self.config, self.owner, self.ttl)
+            except CoordinationError as e:
+                # Without the backend this process can't know who holds the lease
+                if not unavailable:
+                    print(f"[{get_timestamp()}] ⚠️ Can't take the attempt lease, waiting for the backend: {e}", flush=True)
+                unavailable = True
+                if on_wait:
+                    on_wait()
+                if stop_event.wait(self.POLL_SECONDS):
+                    return False
+                continue
+            
+            if lease and lease.get("node_id") == self.owner:
+                self._hold()
+                break
+            
+            if waited_since is None:
+                waited_since = time.monotonic()
+                if on_standby and lease:
+                    on_standby(lease)
+            predecessor = (lease or {}).get("node_id", predecessor)
+            if on_wait:
+                on_wait()
+            if stop_event.wait(self.POLL_SECONDS):
+                return False
+        
+        with self._lock:
+            self.engine = engine
+        if waited_since is not None:
+            print(f"[{get_timestamp()}] 🤝 Took over the attempt lease from {predecessor} "
+                  f"after {time.monotonic() - waited_since:.1f}s", flush=True)
+        return True
+    
+    def take_checkpoint(self) -> dict:
+        """Return the checkpoint to resume from, once per process (None if there is none)."""
+        with self._lock:
+            checkpoint, self._checkpoint = self._checkpoint, None
+        return checkpoint
+    
+    def release(self, engine) -> bool:
+        """
+        Save engine's checkpoint and yield the lease (once the engine stopped).
+        
+        A watchdog-replaced engine finishing late doesn't release the lease of
+        its successor. The checkpoint is only saved during hand_over().
+        
+        Returns:
+            True if the lease was yielded
+        """
+        with self._lock:
+            if not self.held or engine is not self.engine:
+                return False
+            self.held = False
+            self.engine = None
+            self._renewing.set()
+            handing_over = self._handing_over
+        
+        try:
+            if handing_over:
+                checkpoint = dict(engine.checkpoint(), node_id=self.owner, saved_at=get_timestamp(), handed_over=True)
+                self.coordinator.save_checkpoint(self.config, checkpoint, self.CHECKPOINT_TTL)
+            self.coordinator.release_lease(self.config, self.owner)
+        except CoordinationError as e:
+            # The lease expires on its own; the next holder starts from scratch
+            print(f"[{get_timestamp()}] ⚠️ Could not hand over the attempt lease: {e}", flush=True)
+            return False
+        print(f"[{get_timestamp()}] 🤝 Yielded the attempt lease after {engine.total_attempts} attempts", flush=True)
+        return True
+    
+    def hand_over(self):
+        """On SIGTERM: stop attempting, let the in-flight attempt finish and yield the lease."""
+        with self._lock:
+            engine = self.engine
+            if not engine:
+                return
+            self._handing_over = True
+        engine.stop()
+        if not engine.wait(self.DRAIN_SECONDS):
+            print(f"[{get_timestamp()}] ⚠️ Attempt still in flight after {self.DRAIN_SECONDS:.0f}s, "
+                  f"handing over anyway", flush=True)
+        # run() yields the lease when it returns; this covers an attempt still in flight
+        self.release(engine)
+    
+    def _hold(self):
+        """Start renewing a lease just taken and load the checkpoint of the previous holder."""
+        with self._lock:
+            if self.held:
+                return
+            self.held = True
+            first = self._renewing is None
+            self._renewing = threading.Event()
+            renewing = self._renewing
+        
+        # Only the first lease of the process resumes, and only from a handover
+        if first:
+            try:
+                self._checkpoint = self.coordinator.load_checkpoint(self.config)
+            except CoordinationError as e:
+                print(f"[{get_timestamp()}] ⚠️ Could not load the handoff checkpoint, starting from scratch: {e}", flush=True)
+        threading.Thread(target=self._renew, args=(renewing,), name="handoff-lease", daemon=True).start()
+    
+    def _renew(self, stopped: threading.Event):
+        """
+        Renew the lease every third of its TTL until it is released.
+        
+        Stands down when another process took the lease, or when the last
+        renewal before the lease could expire failed (the backend is
+        unavailable, so another process may take it once it expires).
+        """
+        renewed = time.monotonic()
+        while not stopped.wait(self.ttl / 3.0):
+            try:
+                lease = self.coordinator.hold_lease(self.config, self.owner, self.ttl)
+            except Exception as e:
+                if time.monotonic() - renewed < self.ttl * 2 / 3.0:
+                    print(f"[{get_timestamp()}] ⚠️ Could not renew the attempt lease, retrying: {e}", flush=True)
+                    continue
+                self._stand_down(stopped, f"Could not renew the attempt lease before it expires ({e})")
+                return
+            if lease.get("node_id") != self.owner:
+                # Renewal came too late; stand down so only the new holder attempts
+                self._stand_down(stopped, f"Attempt lease taken over by {lease['node_id']}")
+                return
+            renewed = time.monotonic()
+    
+    def _stand_down(self, stopped: threading.Event, reason: str):
+        """Give up a lease this process no longer holds for sure and stop its engine."""
+        with self._lock:
+            if self._renewing is not stopped:
+                return
+            self.held = False
+            engine, self.engine = self.engine, None
+            stopped.set()
+        print(f"[{get_timestamp()}] ⚠️ {reason}, stopping", flush=True)
+        if engine:
+            engine.stop()
+
+
+def get_handoff(config: Config) -> Handoff:
+    """Return the attempt lease for this process, or None unless HANDOFF_ENABLED is set."""
+    if not config.handoff_enabled:
+        return None
+    coordinator = get_coordinator(config)
+    if not coordinator:
+        print(f"[{get_timestamp()}] ⚠️ HANDOFF_ENABLED needs COORDINATION_URL; redeploys won't hand over", flush=True)
+        return None
+    return Handoff(coordinator, config)
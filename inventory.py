@@ -0,0 +1,273 @@
+"""
+Cached inventory of the compute instances in the compartment.
+
+A background thread lists the instances every INVENTORY_REFRESH_SECONDS and
+keeps their VNIC details - private and public IP - in a cache, so
+/api/instances and the dashboard never call OCI. Refreshes are incremental:
+the listing runs newest first and stops at the first page with instances it
+already knows, and VNICs are only looked up for instances that are new or
+changed state. Once an hour (and after a reclaim) everything is listed and
+looked up again, so a steady compartment costs one list call per refresh
+however many instances it holds.
+"""
+
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import oci
+
+A1_SHAPE = "VM.Standard.A1.Flex"
+
+
+def get_timestamp() -> str:
+    """Get current timestamp for logging."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Inventory:
+    """Instances of one account's compartment and region, refreshed in the background."""
+    
+    PAGE_SIZE = 100
+    FULL_SYNC_SECONDS = 3600  # look up every VNIC again after this long (secondary VNICs, reassigned IPs)
+    GONE_STATES = ("TERMINATING", "TERMINATED")
+    
+    def __init__(self, oci_client, refresh_seconds: float):
+        self.oci_client = oci_client
+        self.config = oci_client.config
+        self.refresh_seconds = refresh_seconds
+        self.instances = []
+        self.refreshed_at = None
+        self.duration_ms = None
+        self.error = None
+        self._listed = {}  # instance id -> listed instance, newest first
+        self._states = {}  # instance id -> lifecycle state at the last VNIC lookup
+        self._vnics = {}  # instance id -> primary VNIC details
+        self._full_sync_at = 0.0
+        self._full_sync_requested = False
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def start(self):
+        """Start the background refresh (the first refresh runs right away)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="inventory", daemon=True)
+                self._thread.start()
+    
+    def refresh_soon(self, full_sync: bool = False):
+        """
+        Refresh now instead of at the next interval (e.g. after an instance was created).
+        
+        Args:
+            full_sync: List every instance again, e.g. after an older one was reclaimed
+        """
+        if full_sync:
+            self._full_sync_requested = True
+        self._wake.set()
+    
+    def rebind(self, oci_client):
+        """Refresh through another client of the same account and region (e.g. a restarted worker's)."""
+        self.oci_client = oci_client
+    
+    def refresh(self):
+        """List the new instances and update the VNIC details of the changed ones."""
+        started = time.monotonic()
+        full_sync = self._full_sync_requested or time.monotonic() - self._full_sync_at > self.FULL_SYNC_SECONDS
+        self._full_sync_requested = False
+        instances = self._list_instances(full_sync)
+        
+        states = {instance.id: instance.lifecycle_state for instance in instances}
+        changed = [
+            instance_id for instance_id, state in states.items()
+            if full_sync or self._states.get(instance_id) != state or
+            (instance_id not in self._vnics and state not in self.GONE_STATES)
+        ]
+        if changed:
+            self._update_vnics(changed, states)
+        if full_sync:
+            self._full_sync_at = time.monotonic()
+        
+        # Forget instances that dropped out of the listing
+        self._listed = {instance.id: instance for instance in instances}
+        self._vnics = {instance_id: vnic for instance_id, vnic in self._vnics.items() if instance_id in states}
+        self._states = {instance_id: state for instance_id, state in self._states.items() if instance_id in states}
+        
+        snapshot = [self._describe(instance) for instance in instances]
+        snapshot.sort(key=lambda instance: instance["time_created"] or "", reverse=True)
+        with self._lock:
+            self.instances = snapshot
+            self.refreshed_at = datetime.now()
+            self.duration_ms = round((time.monotonic() - started) * 1000)
+            self.error = None
+        return len(changed)
+    
+    def to_dict(self, include_instances: bool = False) -> dict:
+        """Summary of the cached inventory (and the instances themselves if requested)."""
+        with self._lock:
+            instances = self.instances
+            refreshed_at, duration_ms, error = self.refreshed_at, self.duration_ms, self.error
+        
+        active = [instance for instance in instances if instance["state"] not in self.GONE_STATES]
+        a1 = [instance for instance in active if instance["shape"] == A1_SHAPE]
+        names = Counter(instance["name"] for instance in a1)
+        state = {
+            "account": self.config.account_name,
+            "region": self.config.oci_region,
+            "refreshed_at": refreshed_at.strftime("%Y-%m-%d %H:%M:%S") if refreshed_at else None,
+            "age_seconds": round((datetime.now() - refreshed_at).total_seconds()) if refreshed_at else None,
+            "refresh_ms": duration_ms,
+            "error": error,
+            "instances": len(active),
+            "by_state": dict(Counter(instance["state"] for instance in instances)),
+            "a1_instances": len(a1),
+            "a1_ocpus": sum(instance["ocpus"] or 0 for instance in a1),
+            "a1_memory_gb": sum(instance["memory_gb"] or 0 for instance in a1),
+            # Active A1 instances sharing a display name, typically left over from earlier runs
+            "duplicates": sorted(name for name, count in names.items() if count > 1),
+        }
+        if include_instances:
+            state["items"] = instances
+        return state
+    
+    def _list_instances(self, full_sync: bool) -> list:
+        """
+        List the instances newest first.
+        
+        Args:
+            full_sync: Page through every instance; otherwise stop at the first
+                page holding a known instance and keep the cached older ones
+        """
+        listed, page = [], None
+        while True:
+            response = self.oci_client.compute_breaker.call(
+                self.oci_client.compute_client.list_instances,
+                self.config.compartment_ocid,
+                sort_by="TIMECREATED",
+                sort_order="DESC",
+                limit=self.PAGE_SIZE,
+                page=page
+            )
+            listed.extend(response.data)
+            page = response.next_page
+            if not page or (not full_sync and any(instance.id in self._listed for instance in response.data)):
+                break
+        
+        if page:
+            fetched = {instance.id for instance in listed}
+            listed.extend(instance for instance_id, instance in self._listed.items() if instance_id not in fetched)
+        return listed
+    
+    def _update_vnics(self, instance_ids: list, states: dict):
+        """Look up the primary VNIC of the given instances."""
+        wanted = set(instance_ids)
+        attachments = self.oci_client.compute_breaker.call(
+            oci.pagination.list_call_get_all_results,
+            self.oci_client.compute_client.list_vnic_attachments,
+            self.config.compartment_ocid,
+            limit=self.PAGE_SIZE
+        ).data
+        
+        attached = {}
+        for attachment in attachments:
+            if attachment.instance_id in wanted and attachment.lifecycle_state == "ATTACHED":
+                attached.setdefault(attachment.instance_id, []).append(attachment.vnic_id)
+        
+        for instance_id in instance_ids:
+            vnic_ids = attached.get(instance_id)
+            if not vnic_ids:
+                # Still provisioning (looked up again next time) or already gone
+                self._vnics.pop(instance_id, None)
+                if states[instance_id] in self.GONE_STATES:
+                    self._states[instance_id] = states[instance_id]
+                continue
+            
+            vnic = self._primary_vnic(vnic_ids)
+            self._vnics[instance_id] = {
+                "private_ip": vnic.private_ip,
+                "public_ip": vnic.public_ip,
+                "subnet_id": vnic.subnet_id,
+            }
+            self._states[instance_id] = states[instance_id]
+    
+    def _primary_vnic(self, vnic_ids: list):
+        """Fetch the attached VNICs until the primary one turns up."""
+        network_client = self.oci_client.virtual_network_client
+        vnic = None
+        for vnic_id in vnic_ids:
+            vnic = self.oci_client.network_breaker.call(network_client.get_vnic, vnic_id).data
+            if vnic.is_primary:
+                break
+        return vnic
+    
+    def _describe(self, instance) -> dict:
+        """Cached, serializable form of one listed instance."""
+        shape_config = instance.shape_config
+        vnic = self._vnics.get(instance.id, {})
+        return {
+            "id": instance.id,
+            "name": instance.display_name,
+            "shape": instance.shape,
+            "ocpus": shape_config.ocpus if shape_config else None,
+            "memory_gb": shape_config.memory_in_gbs if shape_config else None,
+            "state": instance.lifecycle_state,
+            "availability_domain": instance.availability_domain,
+            "fault_domain": instance.fault_domain,
+            "time_created": instance.time_created.isoformat(timespec="seconds") if instance.time_created else None,
+            "private_ip": vnic.get("private_ip"),
+            "public_ip": vnic.get("public_ip"),
+            "subnet_id": vnic.get("subnet_id"),
+        }
+    
+    def _run(self):
+        """Background refresh loop; a failed refresh keeps serving the last inventory."""
+        while True:
+            try:
+                changed = self.refresh()
+                if changed:
+                    print(f"[{get_timestamp()}] 🗂️ Inventory refreshed: {len(self.instances)} instances, "
+                          f"{changed} looked up in {self.duration_ms} ms", flush=True)
+            except Exception as e:
+                with self._lock:
+                    self.error = getattr(e, "message", None) or str(e)
+                print(f"[{get_timestamp()}] ⚠️ Inventory refresh failed: {self.error}", flush=True)
+            
+            self._wake.wait(self.refresh_seconds)
+            self._wake.clear()
+
+
+# One inventory per account and region, shared by the (watchdog-restarted)
+# engines and the web endpoints
+_inventories = {}
+_registry_lock = threading.Lock()
+
+
+def get_inventory(oci_client) -> Inventory:
+    """
+    Return the running inventory of oci_client's account and region, starting it on first use.
+    
+    A running inventory switches to oci_client, so it follows the freshest client.
+    
+    Returns:
+        None when INVENTORY_REFRESH_SECONDS is 0
+    """
+    config = oci_client.config
+    if config.inventory_refresh_seconds <= 0:
+        return None
+    key = f"{config.account_name}/{config.oci_region}"
+    with _registry_lock:
+        if key not in _inventories:
+            _inventories[key] = Inventory(oci_client, config.inventory_refresh_seconds)
+        inventory = _inventories[key]
+    inventory.rebind(oci_client)
+    inventory.start()
+    return inventory
+
+
+def inventory_states(include_instances: bool = False) -> dict:
+    """Summary (and optionally the instances) of every inventory, keyed by account/region."""
+    with _registry_lock:
+        inventories = dict(_inventories)
+    return {key: inventory.to_dict(include_instances) for key, inventory in inventories.items()}
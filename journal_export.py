@@ -0,0 +1,256 @@
+"""
+Streaming export of the launch journal for offline analysis.
+
+Reads the NDJSON journal (JOURNAL_PATH) line by line and writes the attempt
+history - or every event type - as NDJSON or CSV, optionally gzip-compressed,
+within a time range. Nothing is materialized: events are filtered and encoded
+one at a time and written in chunks of about 64 KiB, so a history of millions
+of attempts exports in constant memory. The web service streams the same
+chunks from /api/export.
+
+Usage:
+    python journal_export.py --format csv --since 7d --output attempts.csv
+    python journal_export.py --since 2026-01-01 --until 2026-02-01 --output january.ndjson.gz
+    python journal_export.py --type all --format ndjson > events.ndjson
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import zlib
+from datetime import datetime, timedelta
+
+CHUNK_SIZE = 64 * 1024
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Flattened attempt fields; anything else an event carries goes to "details"
+COLUMNS = [
+    "timestamp", "type", "target", "account", "attempt", "total_attempts",
+    "success", "is_capacity_error", "retry_interval", "message",
+]
+
+RELATIVE_TIME = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+
+
+def parse_time(value: str) -> datetime:
+    """
+    Parse a --since/--until bound.
+    
+    Args:
+        value: ISO date or time ("2026-01-31", "2026-01-31T12:00:00+02:00") or
+            an age relative to now ("90s", "30m", "24h", "7d")
+    
+    Returns:
+        Naive local time, comparable with the journal timestamps
+    
+    Raises:
+        ValueError: if value is neither
+    """
+    value = value.strip()
+    match = RELATIVE_TIME.match(value)
+    if match:
+        return datetime.now() - timedelta(**{UNITS[match.group(2)]: float(match.group(1))})
+    
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid time {value!r}: expected an ISO date/time or an age like 30m, 24h or 7d")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def iter_events(paths: list, since: datetime = None, until: datetime = None, event_type: str = "attempt"):
+    """
+    Yield journal events one at a time, oldest file first.
+    
+    A line cut short by a crash (or still being written) is skipped.
+    
+    Args:
+        paths: NDJSON journal files
+        since: Only events at or after this time
+        until: Only events before this time
+        event_type: Only events of this LaunchEvent type; None for every event
+    """
+    # Journal timestamps are fixed-width ISO strings, so they compare as strings
+    since_key = since.isoformat(timespec="milliseconds") if since else None
+    until_key = until.isoformat(timespec="milliseconds") if until else None
+    # Cheap test before decoding; the journal writes json.dumps() default spacing
+    marker = f'"type": "{event_type}"' if event_type else None
+    
+    for path in paths:
+        with open(path, encoding="utf-8") as journal:
+            for line in journal:
+                if marker and marker not in line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(event, dict):
+                    continue
+                if event_type and event.get("type") != event_type:
+                    continue
+                
+                timestamp = str(event.get("timestamp", ""))
+                if since_key and timestamp < since_key:
+                    continue
+                if until_key and timestamp >= until_key:
+                    continue
+                yield event
+
+
+def ndjson_chunks(events):
+    """Encode events as NDJSON, yielding text chunks of about CHUNK_SIZE."""
+    buffer, size = [], 0
+    for event in events:
+        line = json.dumps(event, default=str) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def csv_chunks(events):
+    """Encode events as CSV with a header row, yielding text chunks of about CHUNK_SIZE."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS + ["details"])
+    
+    for event in events:
+        details = {key: value for key, value in event.items() if key not in COLUMNS}
+        writer.writerow([_cell(event.get(column)) for column in COLUMNS] +
+                        [json.dumps(details, default=str) if details else ""])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """Compress text chunks into one gzip stream, yielding bytes."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(paths: list, fmt: str = "ndjson", since: datetime = None, until: datetime = None,
+                  event_type: str = "attempt", compress: bool = False):
+    """
+    Stream a journal export.
+    
+    Args:
+        paths: NDJSON journal files
+        fmt: "ndjson" or "csv"
+        since: Only events at or after this time
+        until: Only events before this time
+        event_type: Only events of this type; None for every event
+        compress: gzip the output
+    
+    Returns:
+        Generator of str chunks, or of bytes chunks when compress is set
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r} (expected {' or '.join(FORMATS)})")
+    encode = csv_chunks if fmt == "csv" else ndjson_chunks
+    chunks = encode(iter_events(paths, since=since, until=until, event_type=event_type))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(fmt: str, compress: bool = False, event_type: str = "attempt") -> str:
+    """Download name of an export, e.g. attempts-20260131-120000.csv.gz."""
+    stem = f"{event_type}s" if event_type else "events"
+    return f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}{'.gz' if compress else ''}"
+
+
+def _cell(value):
+    """CSV cell of a journal value (nested values as JSON)."""
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _write(chunks, file, compress: bool) -> int:
+    """Write export chunks to a binary file; returns the number of bytes written."""
+    written = 0
+    for chunk in chunks:
+        data = chunk if compress else chunk.encode("utf-8")
+        file.write(data)
+        written += len(data)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the launch journal as NDJSON or CSV")
+    parser.add_argument("--journal", nargs="+", metavar="PATH",
+                        default=[os.getenv("JOURNAL_PATH") or "launch_journal.ndjson"],
+                        help="Launch journal(s) to export (default: JOURNAL_PATH or launch_journal.ndjson)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default=None,
+                        help="Output format (default: from the --output extension, else ndjson)")
+    parser.add_argument("--since", type=parse_time, default=None, help="Only events at or after this ISO time or age (e.g. 7d)")
+    parser.add_argument("--until", type=parse_time, default=None, help="Only events before this ISO time or age")
+    parser.add_argument("--type", default="attempt", help="Event type to export, or 'all' (default: attempt)")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output (implied by an --output ending in .gz)")
+    parser.add_argument("--output", "-o", default="-", help="Output file; '-' writes to stdout (default: -)")
+    args = parser.parse_args()
+    
+    output = args.output
+    compress = args.gzip or output.endswith(".gz")
+    fmt = args.format
+    if fmt is None:
+        fmt = "csv" if output.removesuffix(".gz").endswith(".csv") else "ndjson"
+    event_type = None if args.type == "all" else args.type
+    
+    missing = [path for path in args.journal if not os.path.exists(path)]
+    if missing:
+        print(f"❌ Journal not found: {', '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+    
+    chunks = export_chunks(args.journal, fmt, since=args.since, until=args.until,
+                           event_type=event_type, compress=compress)
+    started = datetime.now()
+    if output == "-":
+        try:
+            written = _write(chunks, sys.stdout.buffer, compress)
+            sys.stdout.buffer.flush()
+        except BrokenPipeError:
+            # The reader (e.g. head) closed the pipe; stop quietly
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(0)
+    elif os.path.exists(output) and not os.path.isfile(output):
+        # A device or pipe (e.g. /dev/null) can't be replaced
+        with open(output, "wb") as file:
+            written = _write(chunks, file, compress)
+    else:
+        # Write next to the target and move it into place, so a failed export leaves no partial file
+        partial = output + ".partial"
+        with open(partial, "wb") as file:
+            written = _write(chunks, file, compress)
+        os.replace(partial, output)
+    
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"✅ Exported {written / 1024 / 1024:.1f} MB of {fmt}{' (gzip)' if compress else ''} "
+          f"in {elapsed:.1f}s" + (f" to {output}" if output != "-" else ""), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
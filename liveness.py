@@ -0,0 +1,266 @@
+"""
+Liveness watchdog for the web service's background loop.
+The loop reports a heartbeat on every phase; when a watched phase (a launch
+attempt, a notification) runs past the stall threshold or the thread dies,
+the watchdog replaces the worker thread with a fresh one. When restarts
+don't help, /health reports the loss of liveness so the host restarts us.
+"""
+
+import threading
+import time
+import traceback
+from datetime import datetime
+
+
+def get_timestamp() -> str:
+    """Get current timestamp for logging."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Heartbeat:
+    """Last sign of life reported by the background loop."""
+    
+    def __init__(self):
+        self.phase = "starting"
+        self.updated = time.monotonic()
+        self.watched_since = None  # start of the oldest watched operation, None while idle
+        self.beats = 0
+        self.cycles = 0  # completed attempts since the current worker started
+        self._lock = threading.Lock()
+    
+    def beat(self, phase: str, watched: bool = True, since: float = None, cycle: bool = False):
+        """
+        Record progress of the loop.
+        
+        Args:
+            phase: What the loop is doing now (e.g. "attempt", "notify", "waiting")
+            watched: Whether the phase must finish within the stall threshold;
+                waits on the loop control can't hang and are not watched
+            since: time.monotonic() start of the oldest watched operation (defaults to now)
+            cycle: True when the beat marks a completed attempt
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.phase = phase
+            self.updated = now
+            self.watched_since = (since or now) if watched else None
+            self.beats += 1
+            if cycle:
+                self.cycles += 1
+    
+    def reset_cycles(self):
+        """Start counting completed attempts for a new worker."""
+        with self._lock:
+            self.cycles = 0
+    
+    def stalled_for(self) -> float:
+        """Seconds the current watched phase has been running (0 while idle)."""
+        with self._lock:
+            if self.watched_since is None:
+                return 0.0
+            return time.monotonic() - self.watched_since
+    
+    def to_dict(self) -> dict:
+        """Serializable heartbeat for /health and /api/status."""
+        with self._lock:
+            return {
+                "phase": self.phase,
+                "seconds_since_beat": round(time.monotonic() - self.updated, 1),
+                "watched": self.watched_since is not None,
+                "beats": self.beats,
+            }
+
+
+class Worker:
+    """One generation of the background loop thread."""
+    
+    def __init__(self, watchdog: "Watchdog", generation: int):
+        self.generation = generation
+        self.stop_event = threading.Event()
+        self.thread = None
+        self._watchdog = watchdog
+        self._on_stop = []
+    
+    @property
+    def stopped(self) -> bool:
+        """True once the worker was replaced or the loop finished."""
+        return self.stop_event.is_set()
+    
+    def beat(self, phase: str, watched: bool = True, since: float = None, cycle: bool = False):
+        """Report a heartbeat; beats from a replaced worker are ignored."""
+        if not self.stopped:
+            self._watchdog.heartbeat.beat(phase, watched=watched, since=since, cycle=cycle)
+    
+    def on_stop(self, callback):
+        """Call callback() when this worker is stopped (e.g. to wake a wait or stop a scheduler)."""
+        self._on_stop.append(callback)
+        if self.stopped:
+            callback()
+    
+    def finish(self):
+        """Mark the loop as done for good (instance created, quota filled)."""
+        self._watchdog.finish(self)
+    
+    def stop(self):
+        """Ask the worker's loop to exit at the next opportunity."""
+        if self.stopped:
+            return
+        self.stop_event.set()
+        for callback in self._on_stop:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[{get_timestamp()}] ⚠️ Worker stop callback failed: {e}", flush=True)
+
+
+class Watchdog:
+    """
+    Run the background loop in a worker thread and replace it when it stalls or dies.
+    
+    The target is called as target(worker) in a new daemon thread and must build
+    its own clients, so a restarted worker never reuses a hung connection. A hung
+    thread can't be killed; it is abandoned and its beats are ignored.
+    """
+    
+    def __init__(self, target, stall_seconds: float, max_restarts: int, enabled: bool = True, on_restart=None):
+        self.target = target
+        self.stall_seconds = stall_seconds
+        self.max_restarts = max_restarts
+        self.enabled = enabled
+        self.on_restart = on_restart
+        self.heartbeat = Heartbeat()
+        self.worker = None
+        self.generation = 0
+        self.restarts = 0
+        self.consecutive_restarts = 0
+        self.finished = False
+        self.gave_up = False
+        self.last_restart_reason = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start the first worker and the monitor thread."""
+        self._spawn()
+        if self.enabled:
+            threading.Thread(target=self._monitor, name="watchdog", daemon=True).start()
+    
+    def stop(self):
+        """Stop monitoring and stop the current worker."""
+        self._stop_event.set()
+        if self.worker:
+            self.worker.stop()
+    
+    def finish(self, worker: Worker):
+        """Stop monitoring after the loop completed its job."""
+        with self._lock:
+            if worker is not self.worker:
+                # A replaced worker finished its in-flight attempt; its result
+                # still counts, so the current worker must stop as well
+                print(f"[{get_timestamp()}] ℹ️ Replaced worker #{worker.generation} completed the job", flush=True)
+            self.finished = True
+            current = self.worker
+        
+        worker.stop()
+        current.stop()
+        self._stop_event.set()
+    
+    def liveness_problem(self) -> str:
+        """Why the loop is not live, or None while it is."""
+        if not self.enabled or self.finished or not self.worker:
+            return None
+        if self.gave_up:
+            return f"Gave up after {self.consecutive_restarts} consecutive restarts ({self.last_restart_reason})"
+        
+        thread = self.worker.thread
+        if thread and not thread.is_alive():
+            return "Background worker thread is not running"
+        
+        stalled = self.heartbeat.stalled_for()
+        if stalled > self.stall_seconds:
+            return f"Phase '{self.heartbeat.phase}' stalled for {int(stalled)}s"
+        return None
+    
+    @property
+    def healthy(self) -> bool:
+        """False when liveness is lost (for /health)."""
+        return self.liveness_problem() is None
+    
+    def to_dict(self) -> dict:
+        """Serializable watchdog state for /health and /api/status."""
+        return {
+            "enabled": self.enabled,
+            "healthy": self.healthy,
+            "problem": self.liveness_problem(),
+            "generation": self.generation,
+            "restarts": self.restarts,
+            "last_restart_reason": self.last_restart_reason,
+            "heartbeat": self.heartbeat.to_dict(),
+        }
+    
+    def _spawn(self):
+        """Start a new worker generation."""
+        with self._lock:
+            self.generation += 1
+            worker = Worker(self, self.generation)
+            self.worker = worker
+        
+        self.heartbeat.reset_cycles()
+        self.heartbeat.beat("starting")
+        worker.thread = threading.Thread(
+            target=self._run_worker,
+            args=(worker,),
+            name=f"background-worker-{worker.generation}",
+            daemon=True
+        )
+        worker.thread.start()
+    
+    def _run_worker(self, worker: Worker):
+        """Thread body; the target handles its own errors, this is a last resort."""
+        try:
+            self.target(worker)
+        except Exception as e:
+            print(f"[{get_timestamp()}] ❌ Background worker #{worker.generation} crashed: {e}", flush=True)
+            print(traceback.format_exc(), flush=True)
+    
+    def _monitor(self):
+        """Check liveness periodically and restart the worker when it is lost."""
+        check_interval = max(1.0, min(30.0, self.stall_seconds / 4))
+        
+        while not self._stop_event.wait(check_interval):
+            # A completed attempt since the last restart proves the new worker is healthy
+            if self.heartbeat.cycles > 0:
+                self.consecutive_restarts = 0
+                self.gave_up = False
+            
+            if self.gave_up:
+                continue
+            
+            problem = self.liveness_problem()
+            if problem is None:
+                continue
+            
+            if self.consecutive_restarts >= self.max_restarts:
+                self.gave_up = True
+                print(f"[{get_timestamp()}] ❌ Watchdog: {problem}; giving up after "
+                      f"{self.consecutive_restarts} restarts, reporting unhealthy", flush=True)
+                continue
+            
+            self._restart(problem)
+    
+    def _restart(self, reason: str):
+        """Abandon the current worker and start a fresh one."""
+        self.restarts += 1
+        self.consecutive_restarts += 1
+        self.last_restart_reason = reason
+        print(f"[{get_timestamp()}] 🐕 Watchdog: {reason}; restarting background worker "
+              f"(restart #{self.restarts})", flush=True)
+        
+        self.worker.stop()
+        self._spawn()
+        
+        if self.on_restart:
+            try:
+                self.on_restart(reason)
+            except Exception as e:
+                print(f"[{get_timestamp()}] ⚠️ Watchdog restart callback failed: {e}", flush=True)
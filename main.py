@@ -2,22 +2,27 @@
 Oracle Cloud VM.Standard.A1.Flex Auto-Register Application
 
 Continuously attempts to create a free tier ARM instance until successful,
-then sends a Telegram notification.
+then sends a notification (Telegram and any other configured channels).
 
 Usage:
     python main.py              # Run normally
     python main.py --dry-run    # Validate config without creating instance
-    python main.py --test-telegram  # Send a test Telegram message
+    python main.py --test-telegram  # Send a test message through every notification channel
 """
 
+import signal
 import sys
-import time
 import argparse
 from datetime import datetime
 
 from config import Config
+from engine import LaunchEngine, default_observers
+from handoff import get_handoff
+from memory import after_startup
+from notifications import Notifier
 from oci_client import OCIClient
-from telegram_notifier import TelegramNotifier
+from preflight import PreflightEngine
+from resolver import ResourceResolver, resolve_config, stop_resolvers
 
 
 def get_timestamp() -> str:
@@ -36,20 +41,29 @@ def print_banner():
     print(banner)
 
 
-def dry_run(config: Config, oci_client: OCIClient, notifier: TelegramNotifier):
+def dry_run(config: Config, oci_client: OCIClient, notifier: Notifier):
     """Validate configuration without creating an instance."""
     print("\n🔍 Running in DRY-RUN mode (no instance will be created)\n")
     
-    # Validate configuration
-    print("Validating configuration...")
-    if not config.validate():
-        print("❌ Configuration validation failed")
-        return False
+    # Run the preflight checks for every pipeline (just one unless several
+    # accounts or regions are configured)
+    if config.is_multi_pipeline:
+        targets = []
+        for pipeline_config in config.pipeline_configs():
+            if pipeline_config.auto_discover:
+                ResourceResolver(pipeline_config).apply()
+            targets.append((pipeline_config, OCIClient(pipeline_config)))
+    else:
+        targets = [(config, oci_client)]
+    
+    passed = True
+    for target_config, target_client in targets:
+        report = PreflightEngine(target_config, target_client).run(use_cache=False)
+        report.print_report(f"Preflight report for {target_config.account_name}/{target_config.oci_region}")
+        passed = passed and report.passed
     
-    # Validate OCI credentials
-    print("\nValidating OCI credentials...")
-    if not oci_client.validate_credentials():
-        print("❌ OCI credential validation failed")
+    if not passed:
+        print("\n❌ Preflight validation failed")
         return False
     
     print("\n✅ All validations passed! Ready to run.")
@@ -61,14 +75,21 @@ def dry_run(config: Config, oci_client: OCIClient, notifier: TelegramNotifier):
     print(f"   • OCPUs: {config.ocpus}")
     print(f"   • Memory: {config.memory_gb} GB")
     print(f"   • Retry Interval: {config.retry_interval} seconds")
+    if config.fill_quota:
+        print(f"   • Quota Fill: {', '.join(f'{o}/{m}GB' for o, m in config.shape_ladder)}")
+    if len(config.region_profiles) > 1:
+        print(f"   • Regions: {', '.join(p['name'] for p in config.region_profiles)}")
+        print(f"   • Stop Policy: {config.stop_policy}")
+    if config.account_profiles:
+        print(f"   • Accounts: {', '.join(account.account_name for account in config.accounts())}")
     
     return True
 
 
-def test_telegram(notifier: TelegramNotifier):
-    """Send a test Telegram notification."""
-    print("\n📱 Sending test Telegram notification...")
-    success = notifier.send_message("🧪 Test notification from Oracle Cloud Auto-Register!\n\nIf you see this message, your Telegram configuration is correct.")
+def test_telegram(notifier: Notifier):
+    """Send a test notification through every configured channel."""
+    print(f"\n📱 Sending test notification via {', '.join(channel.name for channel in notifier.channels)}...")
+    success = notifier.send_message("🧪 Test notification from Oracle Cloud Auto-Register!\n\nIf you see this message, your notification configuration is correct.")
     
     if success:
         print("✅ Test notification sent successfully!")
@@ -78,47 +99,23 @@ def test_telegram(notifier: TelegramNotifier):
     return success
 
 
-def run_main_loop(config: Config, oci_client: OCIClient, notifier: TelegramNotifier):
-    """Main application loop - continuously attempt to create instance."""
-    print(f"\n🚀 Starting auto-register loop...")
-    print(f"   • Target: VM.Standard.A1.Flex in {config.oci_region}")
-    print(f"   • Retry interval: {config.retry_interval} seconds")
-    print(f"   • Press Ctrl+C to stop\n")
+def run_engine(config: Config, oci_client: OCIClient, notifier: Notifier) -> bool:
+    """Run the launch engine until an instance is created (or the free quota is filled)."""
+    engine = LaunchEngine(config, oci_client, observers=default_observers(config, notifier, interactive=True),
+                          handoff=get_handoff(config))
     
-    # Send startup notification
-    notifier.send_startup_message()
+    # SIGTERM (redeploy): finish the in-flight attempt; run() then yields the attempt lease
+    signal.signal(signal.SIGTERM, lambda signum, frame: engine.stop())
     
-    attempt = 0
-    
-    while True:
-        attempt += 1
-        print(f"[{get_timestamp()}] Attempt #{attempt} - Trying to create instance...")
-        
-        result = oci_client.create_instance()
-        
-        if result["success"]:
-            # SUCCESS! Instance created
-            print(f"\n🎉 SUCCESS! Instance created on attempt #{attempt}")
-            print(f"   Instance ID: {result['instance']['id']}")
-            print(f"   Public IP: {result['instance']['public_ip']}")
-            
-            # Send Telegram notification
-            notifier.send_success_message(result["instance"])
-            
-            print("\n✅ Telegram notification sent. Exiting...")
-            return True
-        
-        elif result["is_capacity_error"]:
-            # Expected capacity error - keep trying
-            print(f"[{get_timestamp()}] ⏳ Out of capacity. Retrying in {config.retry_interval}s...")
-        
-        else:
-            # Other error - log but continue
-            print(f"[{get_timestamp()}] ❌ Error: {result['message']}")
-            print(f"[{get_timestamp()}] ⏳ Will retry in {config.retry_interval}s...")
-        
-        # Wait before next attempt
-        time.sleep(config.retry_interval)
+    try:
+        return engine.run()
+    except KeyboardInterrupt:
+        engine.stop()
+        raise
+    finally:
+        # Let the observers finish, so the success notification is sent before exiting
+        engine.close()
+        stop_resolvers()
 
 
 def main():
@@ -134,7 +131,7 @@ def main():
     parser.add_argument(
         "--test-telegram",
         action="store_true",
-        help="Send a test Telegram notification"
+        help="Send a test notification through every configured channel"
     )
     args = parser.parse_args()
     
@@ -145,9 +142,14 @@ def main():
         print("Loading configuration...")
         config = Config()
         
+        # Discover image, subnet and AD if they were left unset (multi-pipeline
+        # setups resolve each pipeline separately)
+        if not config.is_multi_pipeline:
+            resolve_config(config)
+        
         # Initialize clients
         oci_client = OCIClient(config)
-        notifier = TelegramNotifier(config)
+        notifier = Notifier(config)
         
         if args.dry_run:
             success = dry_run(config, oci_client, notifier)
@@ -157,8 +159,9 @@ def main():
             success = test_telegram(notifier)
             sys.exit(0 if success else 1)
         
-        # Run main loop
-        run_main_loop(config, oci_client, notifier)
+        # Run the launch engine (single target, quota fill or multi-pipeline)
+        after_startup(config)
+        run_engine(config, oci_client, notifier)
         
     except KeyboardInterrupt:
         print("\n\n⚠️ Interrupted by user. Exiting...")
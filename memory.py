@@ -0,0 +1,138 @@
+"""
+Memory usage reporting and low-memory mode for small hosts.
+Reports resident memory against MEMORY_BUDGET_MB and, when TRACEMALLOC_FRAMES
+is set, the top allocation sites. In LOW_MEMORY_MODE the app keeps only the
+OCI SDK service packages it imports explicitly, creates rarely used clients
+on demand, and hands memory freed after startup validation back to the OS.
+"""
+
+import ctypes
+import ctypes.util
+import gc
+import resource
+import sys
+import threading
+import tracemalloc
+from datetime import datetime
+
+from config import Config
+
+
+def get_timestamp() -> str:
+    """Get current timestamp for logging."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def rss_mb() -> float:
+    """
+    Current resident set size in MB.
+    
+    Falls back to the peak RSS where /proc is not available (macOS).
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def start_tracing(config: Config):
+    """Start tracemalloc when TRACEMALLOC_FRAMES is set (it costs memory and CPU itself)."""
+    if config.tracemalloc_frames > 0 and not tracemalloc.is_tracing():
+        tracemalloc.start(config.tracemalloc_frames)
+        print(f"[{get_timestamp()}] 🧠 Tracing allocations ({config.tracemalloc_frames} frames)", flush=True)
+
+
+def release_memory() -> bool:
+    """
+    Collect garbage and return freed heap pages to the OS.
+    
+    Startup (preflight, discovery, credential checks) leaves a lot of freed
+    memory in the allocator that would otherwise stay resident.
+    
+    Returns:
+        True if the allocator released memory (glibc only)
+    """
+    gc.collect()
+    library = ctypes.util.find_library("c")
+    if not library:
+        return False
+    try:
+        malloc_trim = ctypes.CDLL(library).malloc_trim
+    except (OSError, AttributeError):
+        return False
+    return bool(malloc_trim(0))
+
+
+def after_startup(config: Config):
+    """Drop the clients left over from validation, release startup memory in LOW_MEMORY_MODE and log RSS."""
+    before = rss_mb()
+    if config.low_memory_mode:
+        release_memory()
+    else:
+        # The SDK clients of discovery, preflight and the credential check sit
+        # in reference cycles; drop them now rather than at some later gc pass
+        gc.collect()
+    
+    rss = rss_mb()
+    icon = "🧠" if rss <= config.memory_budget_mb else "⚠️"
+    freed = f", {before - rss:.1f} MB released" if config.low_memory_mode else ""
+    print(f"[{get_timestamp()}] {icon} RSS after startup: {rss:.1f} MB (budget {config.memory_budget_mb} MB{freed})", flush=True)
+
+
+def memory_report(config: Config, limit: int = 10) -> dict:
+    """
+    Memory usage for /debug/memory.
+    
+    Args:
+        config: Configuration (budget and mode)
+        limit: Number of top allocation sites to include
+    
+    Returns:
+        dict with RSS, budget, loaded SDK modules, gc state and, while
+        tracemalloc is tracing, the top allocation sites by size
+    """
+    rss = rss_mb()
+    report = {
+        "rss_mb": round(rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "budget_mb": config.memory_budget_mb,
+        "within_budget": rss <= config.memory_budget_mb,
+        "low_memory_mode": config.low_memory_mode,
+        "oci_modules": sum(1 for name in sys.modules if name == "oci" or name.startswith("oci.")),
+        "threads": threading.active_count(),
+        "gc": {
+            "counts": gc.get_count(),
+            "objects": len(gc.get_objects()),
+        },
+        "tracemalloc": None,
+    }
+    
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        )).statistics("lineno")
+        report["tracemalloc"] = {
+            "current_mb": round(current / (1024.0 * 1024.0), 1),
+            "peak_mb": round(peak / (1024.0 * 1024.0), 1),
+            "top": [
+                {
+                    "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_kb": round(stat.size / 1024.0, 1),
+                    "count": stat.count,
+                }
+                for stat in statistics[:limit]
+            ],
+        }
+    return report
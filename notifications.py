@@ -0,0 +1,494 @@
+"""
+Notification fan-out over several channels.
+Every message goes to all configured channels at once - Telegram, a generic
+webhook (NOTIFY_WEBHOOK_URL), SMTP (NOTIFY_SMTP_HOST) and stdout or a file
+(NOTIFY_FILE) - each bounded by its own timeout, so a slow or failing channel
+neither delays nor loses the others. Success and reclaim messages a channel
+could not deliver go to a durable outbox (NOTIFY_OUTBOX_PATH) and are retried
+in the background until delivered, also after a restart. Delivery counts and
+latencies per channel are reported on /api/status.
+"""
+
+import html
+import json
+import os
+import re
+import smtplib
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from email.message import EmailMessage
+
+import requests
+
+from breakers import get_breaker
+from config import Config
+from telegram_notifier import TelegramNotifier
+
+
+def get_timestamp() -> str:
+    """Get current timestamp for logging."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def html_to_text(message: str) -> str:
+    """Plain-text version of an HTML (Telegram) message for the other channels."""
+    return html.unescape(re.sub(r"<[^>]+>", "", message)).strip()
+
+
+class WebhookChannel:
+    """POST each message as JSON ({"text": plain text, "html": original}) to a URL."""
+    
+    name = "webhook"
+    
+    def __init__(self, config: Config):
+        self.url = config.notify_webhook_url
+        self.timeout = config.notify_webhook_timeout
+        self.breaker = get_breaker("webhook", config)
+        self.destination = self.url
+    
+    def deliver(self, message: str):
+        """Send a message; raises if it was not accepted."""
+        response = self.breaker.call(self._post, {"text": html_to_text(message), "html": message})
+        if not response.ok:
+            raise requests.exceptions.HTTPError(f"Webhook error: {response.status_code} - {response.text[:200]}",
+                                                response=response)
+    
+    def _post(self, payload: dict) -> requests.Response:
+        """POST the payload, raising on server-side failures so the breaker counts them."""
+        response = requests.post(self.url, json=payload, timeout=self.timeout)
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+        return response
+
+
+class SmtpChannel:
+    """Mail each message through an SMTP server (e.g. the host's local MTA)."""
+    
+    name = "smtp"
+    
+    def __init__(self, config: Config):
+        self.host = config.notify_smtp_host
+        self.port = config.notify_smtp_port
+        self.username = config.notify_smtp_username
+        self.password = config.notify_smtp_password
+        self.sender = config.notify_smtp_from
+        self.recipients = config.notify_smtp_to
+        self.timeout = config.notify_smtp_timeout
+        self.breaker = get_breaker("smtp", config)
+        self.destination = (self.host, self.port, tuple(self.recipients))
+    
+    def deliver(self, message: str):
+        """Send a message; raises if the server did not accept it."""
+        text = html_to_text(message)
+        mail = EmailMessage()
+        mail["Subject"] = text.splitlines()[0] if text else "Oracle Cloud Auto-Register"
+        mail["From"] = self.sender
+        mail["To"] = ", ".join(self.recipients)
+        mail.set_content(text)
+        self.breaker.call(self._send, mail)
+    
+    def _send(self, mail: EmailMessage):
+        """One SMTP session per message (STARTTLS and login when a username is set)."""
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.username:
+                smtp.starttls()
+                smtp.login(self.username, self.password)
+            smtp.send_message(mail)
+
+
+class FileChannel:
+    """Write each message to stdout ("-") or append it to a file."""
+    
+    timeout = 5.0
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.name = "stdout" if path == "-" else "file"
+        self.destination = path
+        self._lock = threading.Lock()
+    
+    def deliver(self, message: str):
+        """Write a message as one timestamped block."""
+        text = f"[{get_timestamp()}] {html_to_text(message)}\n"
+        with self._lock:
+            if self.path == "-":
+                sys.stdout.write(text)
+                sys.stdout.flush()
+                return
+            with open(self.path, "a", encoding="utf-8") as output:
+                output.write(text)
+
+
+def create_channels(config: Config) -> list:
+    """Telegram plus every channel configured in the environment."""
+    channels = [TelegramNotifier(config)]
+    if config.notify_webhook_url:
+        channels.append(WebhookChannel(config))
+    if config.notify_smtp_host and config.notify_smtp_to:
+        channels.append(SmtpChannel(config))
+    if config.notify_file:
+        channels.append(FileChannel(config.notify_file))
+    return channels
+
+
+class ChannelStats:
+    """Delivery counts and latencies of one channel."""
+    
+    LATENCY_WINDOW = 100
+    
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.redelivered = 0
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.last_error = None
+        self.last_sent = None
+        self._lock = threading.Lock()
+    
+    def record(self, latency: float, error: Exception = None, redelivery: bool = False):
+        """Count one delivery attempt."""
+        with self._lock:
+            if error is not None:
+                self.failed += 1
+                self.last_error = str(error)[:200]
+                return
+            self.sent += 1
+            if redelivery:
+                self.redelivered += 1
+            self.latencies.append(latency)
+            self.last_sent = get_timestamp()
+    
+    def to_dict(self, pending: int) -> dict:
+        """Serializable metrics for /api/status."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            last = self.latencies[-1] if self.latencies else None
+        
+        def percentile(fraction: float):
+            if not latencies:
+                return None
+            return round(latencies[int(round((len(latencies) - 1) * fraction))] * 1000)
+        
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "redelivered": self.redelivered,
+            "pending": pending,
+            "latency_last_ms": round(last * 1000) if last is not None else None,
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95),
+            "last_error": self.last_error,
+            "last_sent": self.last_sent,
+        }
+
+
+class Outbox:
+    """
+    Durable queue of messages a channel did not deliver, retried in the background.
+    
+    Entries live in an NDJSON file (rewritten on every change) so a restart
+    picks them up again; an empty path keeps them in memory only.
+    """
+    
+    MAX_AGE = 24 * 3600  # undelivered messages older than this are dropped
+    
+    def __init__(self, path: str, retry_seconds: float):
+        self.path = path
+        self.retry_seconds = retry_seconds
+        self.entries = self._load()
+        self.senders = {}  # account -> Notifier delivering its entries
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def attach(self, account: str, notifier: "Notifier"):
+        """Let notifier redeliver the account's entries (the latest notifier wins)."""
+        with self._lock:
+            self.senders[account] = notifier
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="notify-outbox", daemon=True)
+                self._thread.start()
+    
+    def add(self, account: str, channel: str, message: str):
+        """Queue a message for redelivery through one channel."""
+        with self._lock:
+            self.entries.append({
+                "id": uuid.uuid4().hex,
+                "account": account,
+                "channel": channel,
+                "message": message,
+                "created": time.time(),
+                "attempts": 1,
+            })
+            self._save()
+    
+    def pending(self, account: str, channel: str) -> int:
+        """Number of queued messages for one channel."""
+        with self._lock:
+            return sum(1 for entry in self.entries if entry["account"] == account and entry["channel"] == channel)
+    
+    def retry(self):
+        """Try every queued message once."""
+        with self._lock:
+            entries = list(self.entries)
+        
+        for entry in entries:
+            notifier = self.senders.get(entry["account"])
+            if not notifier:
+                continue
+            
+            if time.time() - entry["created"] > self.MAX_AGE:
+                delivered = False
+                print(f"[{get_timestamp()}] ⚠️ Dropping {entry['channel']} notification undelivered "
+                      f"after {entry['attempts']} attempts", flush=True)
+            else:
+                delivered = notifier.redeliver(entry["channel"], entry["message"])
+            
+            with self._lock:
+                if delivered or time.time() - entry["created"] > self.MAX_AGE:
+                    self.entries = [queued for queued in self.entries if queued["id"] != entry["id"]]
+                else:
+                    entry["attempts"] += 1
+                self._save()
+    
+    def _run(self):
+        """Background retry loop."""
+        while True:
+            time.sleep(self.retry_seconds)
+            try:
+                self.retry()
+            except Exception as e:
+                print(f"[{get_timestamp()}] ⚠️ Notification outbox retry failed: {e}", flush=True)
+    
+    def _load(self) -> list:
+        """Read the entries left by a previous run."""
+        if not self.path or not os.path.exists(self.path):
+            return []
+        entries = []
+        try:
+            with open(self.path, encoding="utf-8") as queued:
+                for line in queued:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError as e:
+            print(f"⚠️ Could not read notification outbox {self.path}: {e}", flush=True)
+        if entries:
+            print(f"[{get_timestamp()}] 📮 {len(entries)} undelivered notification(s) in the outbox", flush=True)
+        return entries
+    
+    def _save(self):
+        """Rewrite the outbox file atomically (caller holds the lock)."""
+        if not self.path:
+            return
+        try:
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as queued:
+                for entry in self.entries:
+                    queued.write(json.dumps(entry) + "\n")
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print(f"[{get_timestamp()}] ⚠️ Could not write notification outbox {self.path}: {e}", flush=True)
+
+
+class Notifier:
+    """
+    Send notifications through every configured channel concurrently.
+    
+    Success and reclaim messages are durable: channels that fail them get
+    them redelivered from the outbox.
+    """
+    
+    def __init__(self, config: Config = None):
+        if config is None:
+            config = Config()
+        self.account = config.account_name
+        self.channels = create_channels(config)
+        # Wait for the slowest channel's own timeout, then report what arrived
+        self.deadline = max(sum(channel.timeout) if isinstance(channel.timeout, tuple) else channel.timeout
+                            for channel in self.channels) + 1.0
+        self._executor = ThreadPoolExecutor(max_workers=len(self.channels), thread_name_prefix="notify")
+        self.outbox = get_outbox(config)
+        self.outbox.attach(self.account, self)
+    
+    @property
+    def destinations(self) -> frozenset:
+        """Where this notifier's messages end up (accounts may share channels)."""
+        return frozenset((channel.name, channel.destination) for channel in self.channels)
+    
+    def send_message(self, message: str, durable: bool = False) -> bool:
+        """
+        Send a message through every channel at once.
+        
+        Args:
+            message: The message text (Telegram HTML; other channels get plain text)
+            durable: Queue it in the outbox for channels that fail
+        
+        Returns:
+            True if at least one channel delivered it
+        """
+        futures = [self._executor.submit(self._deliver, channel, message, durable) for channel in self.channels]
+        done, _ = wait(futures, timeout=self.deadline)
+        return any(future.result() for future in done)
+    
+    def redeliver(self, channel_name: str, message: str) -> bool:
+        """Retry an outbox message through one channel (dropped if the channel is gone)."""
+        for channel in self.channels:
+            if channel.name == channel_name:
+                return self._deliver(channel, message, durable=False, redelivery=True)
+        return True
+    
+    def _deliver(self, channel, message: str, durable: bool, redelivery: bool = False) -> bool:
+        """Deliver through one channel, recording the outcome."""
+        stats = get_channel_stats(self.account, channel.name)
+        started = time.monotonic()
+        try:
+            channel.deliver(message)
+        except Exception as e:
+            stats.record(time.monotonic() - started, error=e)
+            print(f"[{get_timestamp()}] ❌ {channel.name} notification failed: {e}", flush=True)
+            if durable:
+                self.outbox.add(self.account, channel.name, message)
+                print(f"[{get_timestamp()}] 📮 Queued for redelivery through {channel.name}", flush=True)
+            return False
+        
+        latency = time.monotonic() - started
+        stats.record(latency, redelivery=redelivery)
+        print(f"[{get_timestamp()}] ✅ {channel.name} notification {'redelivered' if redelivery else 'sent'} "
+              f"({latency * 1000:.0f} ms)", flush=True)
+        return True
+    
+    def send_success_message(self, instance_details: dict) -> bool:
+        """
+        Send a success notification with instance details.
+        
+        Args:
+            instance_details: Dictionary containing instance information
+        """
+        message = f"""
+🎉 <b>Oracle Cloud Instance Created Successfully!</b>
+
+<b>Instance Details:</b>
+• <b>Name:</b> {instance_details.get('name', 'N/A')}
+• <b>Shape:</b> {instance_details.get('shape', 'N/A')}
+• <b>Region:</b> {instance_details.get('region', 'N/A')}
+• <b>Availability Domain:</b> {instance_details.get('availability_domain', 'N/A')}
+• <b>Public IP:</b> {instance_details.get('public_ip', 'Not yet assigned')}
+• <b>State:</b> {instance_details.get('lifecycle_state', 'N/A')}
+
+<b>Instance ID:</b>
+<code>{instance_details.get('id', 'N/A')}</code>
+
+🚀 Your free ARM instance is now running!
+        """.strip()
+        
+        return self.send_message(message, durable=True)
+    
+    def send_error_message(self, error_message: str) -> bool:
+        """
+        Send an error notification (for critical errors only).
+        
+        Args:
+            error_message: The error description
+        """
+        message = f"""
+⚠️ <b>Oracle Cloud Auto-Register Error</b>
+
+<b>Error:</b> {error_message}
+
+The script will continue retrying...
+        """.strip()
+        
+        return self.send_message(message)
+    
+    def send_provisioning_message(self, instance_name: str, step: dict) -> bool:
+        """
+        Send the outcome of one post-launch provisioning step.
+        
+        Args:
+            instance_name: Name of the provisioned instance
+            step: Step dict with label, status, detail and duration
+        """
+        icon = "✅" if step["status"] == "done" else "❌"
+        message = f"""
+{icon} <b>{step['label']}</b> · {instance_name}
+
+{step['detail']}
+<i>Took {step['duration']}s</i>
+        """.strip()
+        
+        return self.send_message(message)
+    
+    def send_reclaimed_message(self, instance_details: dict, state: str) -> bool:
+        """
+        Send a notification that a created instance was reclaimed or terminated.
+        
+        Args:
+            instance_details: Dictionary containing instance information
+            state: Lifecycle state that was observed
+        """
+        message = f"""
+♻️ <b>Oracle Cloud Instance Reclaimed</b>
+
+<b>{instance_details.get('name', 'N/A')}</b> is {state}.
+
+<b>Instance ID:</b>
+<code>{instance_details.get('id', 'N/A')}</code>
+
+Relaunching now - you will be notified when a new instance is created.
+        """.strip()
+        
+        return self.send_message(message, durable=True)
+    
+    def send_startup_message(self) -> bool:
+        """Send a notification that the script has started."""
+        message = """
+🚀 <b>Oracle Cloud Auto-Register Started</b>
+
+The script is now running and will attempt to create your VM.Standard.A1.Flex instance.
+
+You will be notified when the instance is created successfully!
+        """.strip()
+        
+        return self.send_message(message)
+
+
+# Outboxes (per file) and channel metrics (per account and channel) are shared
+# by every notifier, so they survive a notifier being recreated (e.g. after a
+# watchdog restart)
+_outboxes = {}
+_stats = {}
+_registry_lock = threading.Lock()
+
+
+def get_outbox(config: Config) -> Outbox:
+    """Return the shared outbox for NOTIFY_OUTBOX_PATH, creating it on first use."""
+    with _registry_lock:
+        if config.notify_outbox_path not in _outboxes:
+            _outboxes[config.notify_outbox_path] = Outbox(config.notify_outbox_path, config.notify_outbox_retry_seconds)
+        return _outboxes[config.notify_outbox_path]
+
+
+def get_channel_stats(account: str, channel: str) -> ChannelStats:
+    """Return the shared metrics of a channel, creating them on first use."""
+    with _registry_lock:
+        if (account, channel) not in _stats:
+            _stats[(account, channel)] = ChannelStats()
+        return _stats[(account, channel)]
+
+
+def notification_states() -> dict:
+    """Delivery metrics of every channel with its outbox backlog, keyed by account."""
+    with _registry_lock:
+        stats = list(_stats.items())
+        outboxes = list(_outboxes.values())
+    states = {}
+    for (account, channel), channel_stats in stats:
+        pending = sum(outbox.pending(account, channel) for outbox in outboxes)
+        states.setdefault(account, {})[channel] = channel_stats.to_dict(pending)
+    return states
@@ -3,13 +3,64 @@ Oracle Cloud Infrastructure Client for VM creation.
 Handles instance creation with proper error handling for capacity issues.
 """
 
+import copy
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import oci
+import oci.core
+import oci.identity
+from bandit import TargetBandit, get_bandit
+from breakers import CircuitOpenError, get_breaker
 from config import Config
+from fast_launch import FastLauncher, LaunchRejected
+
+
+class LatencyTracker:
+    """Rolling window of launch call latencies used to pick the hedge delay."""
+    
+    WINDOW = 200
+    WARMUP_SAMPLES = 20
+    
+    # Hedge delay used until enough samples have been collected
+    DEFAULT_DELAY = 10.0
+    
+    def __init__(self, percentile: float, min_delay: float):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.samples = deque(maxlen=self.WINDOW)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float):
+        """Add a completed call's latency."""
+        with self._lock:
+            self.samples.append(seconds)
+    
+    def value(self, percentile: float) -> float:
+        """Return the given latency percentile, or None without samples."""
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, int(round(percentile / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+    
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary request before hedging."""
+        if len(self.samples) < self.WARMUP_SAMPLES:
+            return max(self.min_delay, self.DEFAULT_DELAY)
+        return max(self.min_delay, self.value(self.percentile))
 
 
 class OCIClient:
     """Oracle Cloud Infrastructure client wrapper."""
     
+    # Lifecycle states of an instance that is gone (or about to be)
+    RECLAIMED_STATES = ["TERMINATING", "TERMINATED", "NOT_FOUND"]
+    
     # Known error messages for out of capacity
     CAPACITY_ERROR_MESSAGES = [
         "Out of host capacity",
@@ -21,13 +72,83 @@ class OCIClient:
     
     def __init__(self, config: Config):
         self.config = config
-        self.compute_client = oci.core.ComputeClient(config.get_oci_config())
-        self.virtual_network_client = oci.core.VirtualNetworkClient(config.get_oci_config())
+        self.compute_client = oci.core.ComputeClient(config.get_oci_config(), timeout=config.oci_compute_timeout)
+        # The network client is only needed once an instance exists; in
+        # LOW_MEMORY_MODE it is created on first use
+        self._virtual_network_client = None
+        if not config.low_memory_mode:
+            self._virtual_network_client = self._create_network_client()
+        # Only quota fill and its preflight check read limits; created on first use
+        self._limits_client = None
+        
+        # Circuit breakers, shared with every client of the same account and
+        # endpoint; one account's throttling or outage never opens another's
+        endpoint = f"{config.account_name}/{config.oci_region}"
+        self.compute_breaker = get_breaker(f"oci.compute/{endpoint}", config)
+        self.network_breaker = get_breaker(f"oci.network/{endpoint}", config)
+        self.identity_breaker = get_breaker(f"oci.identity/{endpoint}", config)
+        self.limits_breaker = get_breaker(f"oci.limits/{endpoint}", config)
+        
+        # Request hedging state and metrics
+        self.latency = LatencyTracker(config.hedge_percentile, config.hedge_min_delay)
+        self.hedge_stats = {
+            "enabled": config.hedge_enabled,
+            "launches": 0,
+            "hedges_fired": 0,
+            "hedges_won": 0,
+            "hedge_delay": None,
+            "latency_p50": None,
+            "latency_p95": None,
+        }
+        # Updated from the hedge threads and the caller
+        self._stats_lock = threading.Lock()
+        self._hedge_executor = None
+        if config.hedge_enabled:
+            self._hedge_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="launch-hedge")
+            # Terminates instances created by losing hedge requests, off the launch workers
+            self._cleanup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hedge-cleanup")
+            if len(config.availability_domains) < 2:
+                print("⚠️ HEDGE_ENABLED needs several ADs in OCI_AVAILABILITY_DOMAIN; launches won't be hedged", flush=True)
+        
+        # Adaptive AD selection when several ADs are configured (BANDIT_ENABLED)
+        self.bandit = None
+        if config.bandit_enabled and len(config.availability_domains) > 1:
+            self.bandit = get_bandit(f"{config.account_name}/{config.oci_region}", config)
+        
+        # Raw-HTTP launch path (FAST_LAUNCH_ENABLED)
+        self.fast_launcher = FastLauncher(config, self.compute_client) if config.fast_launch_enabled else None
+    
+    @property
+    def virtual_network_client(self) -> oci.core.VirtualNetworkClient:
+        """VirtualNetworkClient, created on first use in LOW_MEMORY_MODE."""
+        if self._virtual_network_client is None:
+            self._virtual_network_client = self._create_network_client()
+        return self._virtual_network_client
     
-    def create_instance(self) -> dict:
+    def _create_network_client(self) -> oci.core.VirtualNetworkClient:
+        """Create the SDK network client (public IP lookup, provisioning)."""
+        return oci.core.VirtualNetworkClient(self.config.get_oci_config(), timeout=self.config.oci_network_timeout)
+    
+    @property
+    def limits_client(self):
+        """LimitsClient, created (and its SDK module imported) on first use."""
+        if self._limits_client is None:
+            import oci.limits
+            self._limits_client = oci.limits.LimitsClient(self.config.get_oci_config(), timeout=self.config.oci_limits_timeout)
+        return self._limits_client
+    
+    def create_instance(self, ocpus: int = None, memory_gb: int = None, display_name: str = None,
+                        availability_domain: str = None) -> dict:
         """
         Attempt to create a VM.Standard.A1.Flex instance.
         
+        Args:
+            ocpus: OCPUs for this instance (defaults to OCI_OCPUS)
+            memory_gb: Memory in GB for this instance (defaults to OCI_MEMORY_GB)
+            display_name: Instance name (defaults to OCI_INSTANCE_NAME)
+            availability_domain: AD to launch in (defaults to the AD bandit's
+                choice, or the primary AD)
+        
         Returns:
             dict with keys:
             - success: bool
@@ -35,49 +156,25 @@ class OCIClient:
             - instance: instance details if successful
             - is_capacity_error: bool (True if failed due to capacity)
         """
+        shape = f"{ocpus or self.config.ocpus}/{memory_gb or self.config.memory_gb}GB"
+        if self.bandit and not availability_domain:
+            availability_domain = self.bandit.choose(self.config.availability_domains, shape)
+        started = time.monotonic()
+        
         try:
-            # Shape configuration for flexible ARM instance
-            shape_config = oci.core.models.LaunchInstanceShapeConfigDetails(
-                ocpus=float(self.config.ocpus),
-                memory_in_gbs=float(self.config.memory_gb)
-            )
-            
-            # Source details (boot volume from image)
-            source_details = oci.core.models.InstanceSourceViaImageDetails(
-                source_type="image",
-                image_id=self.config.image_ocid,
-                boot_volume_size_in_gbs=50  # 50GB boot volume (free tier limit)
-            )
-            
-            # VNIC (network interface) details
-            create_vnic_details = oci.core.models.CreateVnicDetails(
-                subnet_id=self.config.subnet_ocid,
-                assign_public_ip=True
-            )
-            
-            # SSH key metadata
-            metadata = {
-                "ssh_authorized_keys": self.config.ssh_public_key
-            }
+            launch_details = self.build_launch_details(ocpus, memory_gb, display_name, availability_domain)
             
-            # Launch instance details
-            launch_details = oci.core.models.LaunchInstanceDetails(
-                compartment_id=self.config.compartment_ocid,
-                availability_domain=self.config.availability_domain,
-                shape="VM.Standard.A1.Flex",
-                shape_config=shape_config,
-                source_details=source_details,
-                create_vnic_details=create_vnic_details,
-                display_name=self.config.instance_name,
-                metadata=metadata
-            )
-            
-            # Attempt to launch the instance
-            response = self.compute_client.launch_instance(launch_details)
-            instance = response.data
+            # Attempt to launch the instance (hedged when enabled)
+            instance = self._launch(launch_details, shape)
+            # A hedge may have created it in another AD
+            self._record_target(instance.availability_domain, shape, TargetBandit.SUCCESS, started)
             
-            # Get public IP (may take a moment to be assigned)
-            public_ip = self._get_public_ip(instance.id)
+            # Get public IP (may take a moment to be assigned); the provisioning
+            # pipeline resolves it in the background when enabled
+            if self.config.provisioning_enabled:
+                public_ip = "Pending"
+            else:
+                public_ip = self._get_public_ip(instance.id)
             
             return {
                 "success": True,
@@ -90,12 +187,33 @@ class OCIClient:
                     "availability_domain": instance.availability_domain,
                     "public_ip": public_ip,
                     "lifecycle_state": instance.lifecycle_state,
+                    "ocpus": ocpus or self.config.ocpus,
+                    "memory_gb": memory_gb or self.config.memory_gb,
                 },
                 "is_capacity_error": False
             }
-            
+        
+        except CircuitOpenError as e:
+            self._record_target(availability_domain, shape, TargetBandit.ERROR, started)
+            return {
+                "success": False,
+                "message": str(e),
+                "instance": None,
+                "is_capacity_error": False
+            }
+        except LaunchRejected as e:
+            # Raw launch path: classify from the error code and message only
+            is_capacity = self._is_capacity_error(f"{e.code} {e.message}")
+            self._record_target(availability_domain, shape, TargetBandit.MISS if is_capacity else TargetBandit.ERROR, started)
+            return {
+                "success": False,
+                "message": str(e.message),
+                "instance": None,
+                "is_capacity_error": is_capacity
+            }
         except oci.exceptions.ServiceError as e:
             is_capacity = self._is_capacity_error(str(e))
+            self._record_target(availability_domain, shape, TargetBandit.MISS if is_capacity else TargetBandit.ERROR, started)
             return {
                 "success": False,
                 "message": str(e.message),
@@ -103,6 +221,7 @@ class OCIClient:
                 "is_capacity_error": is_capacity
             }
         except Exception as e:
+            self._record_target(availability_domain, shape, TargetBandit.ERROR, started)
             return {
                 "success": False,
                 "message": str(e),
@@ -110,11 +229,222 @@ class OCIClient:
                 "is_capacity_error": False
             }
     
+    def _record_target(self, availability_domain: str, shape: str, outcome: str, started: float):
+        """Feed an attempt's outcome to the AD bandit, if any."""
+        if self.bandit and availability_domain:
+            self.bandit.record(availability_domain, shape, outcome, latency=time.monotonic() - started)
+    
+    def warm_up(self):
+        """
+        Build the launch request of every configured AD ahead of the first
+        attempt (a process taking over from a redeploy attempts at once).
+        """
+        for availability_domain in self.config.availability_domains:
+            launch_details = self.build_launch_details(availability_domain=availability_domain)
+            if self.fast_launcher:
+                self.fast_launcher.prepare(launch_details)
+    
+    def build_launch_details(self, ocpus: int = None, memory_gb: int = None, display_name: str = None,
+                             availability_domain: str = None) -> oci.core.models.LaunchInstanceDetails:
+        """Build the LaunchInstanceDetails for a VM.Standard.A1.Flex instance."""
+        # Shape configuration for flexible ARM instance
+        shape_config = oci.core.models.LaunchInstanceShapeConfigDetails(
+            ocpus=float(ocpus or self.config.ocpus),
+            memory_in_gbs=float(memory_gb or self.config.memory_gb)
+        )
+        
+        # Source details (boot volume from image)
+        source_details = oci.core.models.InstanceSourceViaImageDetails(
+            source_type="image",
+            image_id=self.config.image_ocid,
+            boot_volume_size_in_gbs=50  # 50GB boot volume (free tier limit)
+        )
+        
+        # VNIC (network interface) details
+        create_vnic_details = oci.core.models.CreateVnicDetails(
+            subnet_id=self.config.subnet_ocid,
+            assign_public_ip=True
+        )
+        
+        # SSH key metadata
+        metadata = {
+            "ssh_authorized_keys": self.config.ssh_public_key
+        }
+        
+        # Launch instance details
+        return oci.core.models.LaunchInstanceDetails(
+            compartment_id=self.config.compartment_ocid,
+            availability_domain=availability_domain or self.config.availability_domain,
+            shape="VM.Standard.A1.Flex",
+            shape_config=shape_config,
+            source_details=source_details,
+            create_vnic_details=create_vnic_details,
+            display_name=display_name or self.config.instance_name,
+            metadata=metadata
+        )
+    
+    def _launch(self, launch_details: oci.core.models.LaunchInstanceDetails, shape: str):
+        """Send the launch request, hedging it when HEDGE_ENABLED is set."""
+        self._count("launches")
+        if not self._hedge_executor:
+            return self._timed_launch(launch_details, None)
+        return self._hedged_launch(launch_details, shape)
+    
+    def _timed_launch(self, launch_details: oci.core.models.LaunchInstanceDetails, retry_token: str):
+        """Call launch_instance and record its latency (errors included)."""
+        kwargs = {"opc_retry_token": retry_token} if retry_token else {}
+        started = time.monotonic()
+        try:
+            if self.fast_launcher:
+                return self.compute_breaker.call(self.fast_launcher.launch, launch_details, retry_token)
+            return self.compute_breaker.call(self.compute_client.launch_instance, launch_details, **kwargs).data
+        finally:
+            self.latency.record(time.monotonic() - started)
+            with self._stats_lock:
+                self.hedge_stats["latency_p50"] = self.latency.value(50)
+                self.hedge_stats["latency_p95"] = self.latency.value(95)
+    
+    def _count(self, key: str):
+        """Increment a hedging counter."""
+        with self._stats_lock:
+            self.hedge_stats[key] += 1
+    
+    def _hedged_launch(self, launch_details: oci.core.models.LaunchInstanceDetails, shape: str):
+        """
+        Launch with a hedge: if the first request hasn't answered within the learned
+        latency percentile, send a second one to the next AD and use whichever
+        answers first.
+        
+        A hedge to the same AD would carry the same opc-retry-token and only be
+        deduplicated (or rejected) by OCI, so hedges always go to another AD with
+        their own token, and an instance created by the losing request is
+        terminated once that request answers. The losing AD's error (or, for a
+        primary overtaken by the hedge, its slowness) is fed to the AD bandit;
+        the caller records the winner. With a single AD, launches aren't hedged.
+        """
+        alternate_ad = self._alternate_availability_domain(launch_details.availability_domain)
+        if not alternate_ad:
+            return self._timed_launch(launch_details, None)
+        
+        started = time.monotonic()
+        delay = self.latency.hedge_delay()
+        with self._stats_lock:
+            self.hedge_stats["hedge_delay"] = round(delay, 3)
+        
+        primary = self._hedge_executor.submit(self._timed_launch, launch_details, uuid.uuid4().hex)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        
+        hedge_details = copy.copy(launch_details)
+        hedge_details.availability_domain = alternate_ad
+        self._count("hedges_fired")
+        hedge = self._hedge_executor.submit(self._timed_launch, hedge_details, uuid.uuid4().hex)
+        
+        pending = {primary, hedge}
+        errors = {}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    instance = future.result()
+                except Exception as e:
+                    errors[future] = e
+                    continue
+                
+                if future is hedge:
+                    self._count("hedges_won")
+                other, other_details = (primary, launch_details) if future is hedge else (hedge, hedge_details)
+                if other in errors:
+                    self._record_target(other_details.availability_domain, shape,
+                                        self._failure_outcome(errors[other]), started)
+                elif other is primary:
+                    # Still waiting on the primary AD after the hedge answered
+                    self._record_target(other_details.availability_domain, shape, TargetBandit.MISS, started)
+                for loser in pending:
+                    loser.add_done_callback(self._discard_duplicate)
+                return instance
+        
+        # Both failed; report the primary's error (the caller records it)
+        self._record_target(alternate_ad, shape, self._failure_outcome(errors[hedge]), started)
+        raise errors[primary]
+    
+    def _alternate_availability_domain(self, availability_domain: str) -> str:
+        """Next configured AD after the given one (None with a single AD)."""
+        domains = self.config.availability_domains
+        if len(domains) < 2:
+            return None
+        if availability_domain not in domains:
+            return domains[0]
+        return domains[(domains.index(availability_domain) + 1) % len(domains)]
+    
+    def _failure_outcome(self, error: Exception) -> str:
+        """Bandit outcome of a failed launch request (capacity miss or error)."""
+        if isinstance(error, LaunchRejected):
+            return TargetBandit.MISS if self._is_capacity_error(f"{error.code} {error.message}") else TargetBandit.ERROR
+        if isinstance(error, oci.exceptions.ServiceError):
+            return TargetBandit.MISS if self._is_capacity_error(str(error)) else TargetBandit.ERROR
+        return TargetBandit.ERROR
+    
+    def _discard_duplicate(self, future):
+        """
+        Done callback of the losing request of a hedge: hand an instance it
+        created to the cleanup thread, so neither a hung request nor the
+        termination holds up a launch worker.
+        """
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._cleanup_executor.submit(self._terminate_duplicate, future.result())
+    
+    def _terminate_duplicate(self, instance):
+        """Terminate the instance created by the losing request of a hedge."""
+        print(f"⚠️ Terminating duplicate instance from losing hedge request: {instance.id}", flush=True)
+        try:
+            self.compute_breaker.call(self.compute_client.terminate_instance, instance.id, preserve_boot_volume=False)
+        except Exception as e:
+            print(f"❌ Failed to terminate duplicate instance {instance.id}: {e}", flush=True)
+    
     def _is_capacity_error(self, error_message: str) -> bool:
         """Check if the error is related to capacity issues."""
         error_lower = error_message.lower()
         return any(msg.lower() in error_lower for msg in self.CAPACITY_ERROR_MESSAGES)
     
+    def get_lifecycle_state(self, instance_id: str) -> str:
+        """
+        Current lifecycle state of an instance, for the reclaim watch.
+        
+        Uses a conditional request on the fast launch path, which also keeps
+        its connection and prepared launch request warm for a relaunch.
+        
+        Returns:
+            The lifecycle state, or "NOT_FOUND" once the instance is gone
+        """
+        try:
+            if self.fast_launcher:
+                return self.compute_breaker.call(self.fast_launcher.lifecycle_state, instance_id)
+            return self.compute_breaker.call(self.compute_client.get_instance, instance_id).data.lifecycle_state
+        except (oci.exceptions.ServiceError, LaunchRejected) as e:
+            if e.status == 404:
+                return "NOT_FOUND"
+            raise
+    
+    def wait_until_reclaimed(self, instance_id: str, stop_event: threading.Event) -> str:
+        """
+        Poll an instance every RECLAIM_WATCH_INTERVAL_SECONDS until it is reclaimed.
+        
+        Returns:
+            The reclaimed state, or None if stop_event was set first
+        """
+        while not stop_event.wait(self.config.reclaim_watch_interval):
+            try:
+                state = self.get_lifecycle_state(instance_id)
+            except Exception as e:
+                print(f"⚠️ Could not poll {instance_id}: {e}", flush=True)
+                continue
+            if state in self.RECLAIMED_STATES:
+                return state
+        return None
+    
     def _get_public_ip(self, instance_id: str) -> str:
         """Get the public IP address of an instance."""
         try:
@@ -123,13 +453,15 @@ class OCIClient:
             time.sleep(5)
             
             # List VNIC attachments for the instance
-            vnic_attachments = self.compute_client.list_vnic_attachments(
+            vnic_attachments = self.compute_breaker.call(
+                self.compute_client.list_vnic_attachments,
                 compartment_id=self.config.compartment_ocid,
                 instance_id=instance_id
             ).data
             
             if vnic_attachments:
-                vnic = self.virtual_network_client.get_vnic(
+                vnic = self.network_breaker.call(
+                    self.virtual_network_client.get_vnic,
                     vnic_attachments[0].vnic_id
                 ).data
                 return vnic.public_ip or "Not yet assigned"
@@ -138,12 +470,77 @@ class OCIClient:
         except Exception:
             return "Unable to retrieve"
     
+    def get_a1_availability(self, availability_domains: list = None) -> dict:
+        """
+        Query the limits service for remaining VM.Standard.A1.Flex capacity.
+        
+        Args:
+            availability_domains: ADs to query (defaults to every configured AD)
+        
+        Returns:
+            dict with keys:
+            - ocpus: OCPUs still available under the tenancy limit in the AD
+              with the most room (an instance only needs room in its own AD)
+            - memory_gb: memory (GB) still available there
+            - used_ocpus: OCPUs already in use, summed over the ADs
+            - used_memory_gb: memory (GB) already in use, summed over the ADs
+            - availability_domains: AD name -> {"ocpus", "memory_gb"} still
+              available in that AD
+        """
+        per_domain = {
+            availability_domain: self._a1_availability(availability_domain)
+            for availability_domain in availability_domains or self.config.availability_domains
+        }
+        best = max(per_domain.values(), key=lambda domain: (domain["ocpus"], domain["memory_gb"]))
+        return {
+            "ocpus": best["ocpus"],
+            "memory_gb": best["memory_gb"],
+            "used_ocpus": sum(domain["used_ocpus"] for domain in per_domain.values()),
+            "used_memory_gb": sum(domain["used_memory_gb"] for domain in per_domain.values()),
+            "availability_domains": {
+                name: {"ocpus": domain["ocpus"], "memory_gb": domain["memory_gb"]}
+                for name, domain in per_domain.items()
+            },
+        }
+    
+    def _a1_availability(self, availability_domain: str) -> dict:
+        """A1 availability and usage in one AD."""
+        limits_client = self.limits_client
+        cores = self.limits_breaker.call(
+            limits_client.get_resource_availability,
+            service_name="compute",
+            limit_name="standard-a1-core-count",
+            compartment_id=self.config.oci_tenancy_ocid,
+            availability_domain=availability_domain
+        ).data
+        memory = self.limits_breaker.call(
+            limits_client.get_resource_availability,
+            service_name="compute",
+            limit_name="standard-a1-memory-count",
+            compartment_id=self.config.oci_tenancy_ocid,
+            availability_domain=availability_domain
+        ).data
+        
+        return {
+            "ocpus": self._limit_value(cores.fractional_availability, cores.available),
+            "memory_gb": self._limit_value(memory.fractional_availability, memory.available),
+            "used_ocpus": self._limit_value(cores.fractional_usage, cores.used),
+            "used_memory_gb": self._limit_value(memory.fractional_usage, memory.used),
+        }
+    
+    @staticmethod
+    def _limit_value(fractional, whole) -> int:
+        """Prefer the fractional limit value (A1 OCPUs can be fractional) over the rounded one."""
+        if fractional is not None:
+            return int(fractional)
+        return int(whole or 0)
+    
     def validate_credentials(self) -> bool:
         """Validate OCI credentials by making a simple API call."""
         try:
             # Try to list availability domains (simple read operation)
-            identity_client = oci.identity.IdentityClient(self.config.get_oci_config())
-            identity_client.list_availability_domains(self.config.oci_tenancy_ocid)
+            identity_client = oci.identity.IdentityClient(self.config.get_oci_config(), timeout=self.config.oci_identity_timeout)
+            self.identity_breaker.call(identity_client.list_availability_domains, self.config.oci_tenancy_ocid)
             print("✅ OCI credentials validated successfully")
             return True
         except oci.exceptions.ServiceError as e:
@@ -0,0 +1,528 @@
+"""
+Multi-region, multi-account orchestration for the auto-register loop.
+Runs one launch pipeline per account and region profile inside a single
+process, sharing one scheduler and one bounded worker pool.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import Config
+from control import LoopControl
+from coordination import get_coordinator, take_token
+from oci_client import OCIClient
+from resolver import resolve_config
+
+
+def get_timestamp() -> str:
+    """Get current timestamp for logging."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class RateLimiter:
+    """Token bucket limiting launch attempts per minute (0 disables the limit)."""
+    
+    def __init__(self, rate_per_minute: float, clock=time.monotonic):
+        self.rate_per_minute = rate_per_minute
+        self.clock = clock  # replaced by a virtual clock in simulator.py
+        self.tokens = max(1.0, float(rate_per_minute))  # starts full
+        self.updated = clock()
+        self._lock = threading.Lock()
+    
+    def reserve(self) -> float:
+        """
+        Take a token if one is available.
+        
+        Returns:
+            0 if a token was taken, otherwise seconds until one will be available
+        """
+        if self.rate_per_minute <= 0:
+            return 0.0
+        
+        with self._lock:
+            now = self.clock()
+            self.tokens, wait = take_token(self.tokens, self.updated, now, self.rate_per_minute)
+            self.updated = now
+            return wait
+
+
+class AccountGroup:
+    """Pipelines, rate limit and failure tracking for one account."""
+    
+    # Consecutive non-capacity errors before the account backs off
+    FAILURE_THRESHOLD = 3
+    MAX_BACKOFF_SECONDS = 1800
+    
+    def __init__(self, config: Config, clock=time.monotonic):
+        self.name = config.account_name
+        self.config = config
+        self.clock = clock  # replaced by a virtual clock in simulator.py
+        # With a coordination backend the rate limit is shared by every deployment
+        self.coordinator = get_coordinator(config)
+        if self.coordinator:
+            self.limiter = self.coordinator.limiter(config)
+        else:
+            self.limiter = RateLimiter(config.rate_limit_per_minute, clock=clock)
+        self.pipelines = []
+        self.claimed_ocpus = 0
+        self.claimed_memory_gb = 0
+        self.consecutive_failures = 0
+        self.backoff_until = 0.0
+        self.state = {
+            "name": self.name,
+            "status": "running",  # running, backoff, success, claimed, stopped, error
+            "claimed_ocpus": 0,
+            "claimed_memory_gb": 0,
+            "consecutive_failures": 0,
+            "error_message": None,
+            "claimed_by": None,  # claim of another deployment (COORDINATION_URL)
+        }
+    
+    @property
+    def retired(self) -> bool:
+        """True when none of the account's pipelines are still scheduled."""
+        return all(pipeline.retired for pipeline in self.pipelines)
+    
+    def reserve(self) -> float:
+        """
+        Take the account's turn for an attempt if its backoff and rate limit allow one.
+        
+        Returns:
+            0 if the attempt may start now, otherwise seconds to wait first
+        """
+        wait = self.backoff_until - self.clock()
+        if wait > 0:
+            return wait
+        return self.limiter.reserve()
+    
+    def record_attempt(self, result: dict):
+        """Apply the outcome of an attempt (a create_instance result) to the failure tracking."""
+        if result["success"] or result["is_capacity_error"]:
+            self.record_recovery()
+        else:
+            self.record_failure()
+    
+    def record_failure(self):
+        """Count a non-capacity failure and back off the whole account if it keeps failing."""
+        self.consecutive_failures += 1
+        self.state["consecutive_failures"] = self.consecutive_failures
+        
+        if self.consecutive_failures >= self.FAILURE_THRESHOLD:
+            exponent = min(self.consecutive_failures - self.FAILURE_THRESHOLD, 16)
+            delay = min(max(self.config.retry_interval, 1) * (2 ** exponent), self.MAX_BACKOFF_SECONDS)
+            self.backoff_until = self.clock() + delay
+            self.state["status"] = "backoff"
+            print(f"[{get_timestamp()}] [{self.name}] ⚠️ {self.consecutive_failures} consecutive errors, backing off {delay}s", flush=True)
+    
+    def record_recovery(self):
+        """Reset failure tracking after an attempt reached the launch API normally."""
+        self.consecutive_failures = 0
+        self.backoff_until = 0.0
+        self.state["consecutive_failures"] = 0
+        if self.state["status"] == "backoff":
+            self.state["status"] = "running"
+
+
+class RegionPipeline:
+    """Launch pipeline for a single account and region profile."""
+    
+    def __init__(self, config: Config, account: AccountGroup, name: str):
+        self.config = config
+        self.account = account
+        self.name = name
+        self.oci_client = OCIClient(config)
+        self.retired = False
+        self.finished_at = time.monotonic()
+        self.state = {
+            "name": self.name,
+            "account": account.name,
+            "region": config.oci_region,
+            "availability_domain": config.availability_domain,
+            "ocpus": config.ocpus,
+            "memory_gb": config.memory_gb,
+            "status": "running",  # running, success, stopped
+            "attempt": 0,
+            "last_attempt_time": None,
+            "last_result": None,
+            "instance_info": None,
+            "hedging": self.oci_client.hedge_stats,
+        }
+    
+    def attempt(self) -> dict:
+        """Run a single launch attempt and record the outcome in the pipeline state."""
+        self.state["attempt"] += 1
+        self.state["last_attempt_time"] = get_timestamp()
+        
+        print(f"[{get_timestamp()}] [{self.name}] Attempt #{self.state['attempt']} - Trying to create instance...", flush=True)
+        
+        try:
+            result = self.oci_client.create_instance()
+        except Exception as e:
+            print(f"[{get_timestamp()}] [{self.name}] ❌ Exception in create_instance: {e}", flush=True)
+            print(traceback.format_exc(), flush=True)
+            result = {
+                "success": False,
+                "message": f"Exception: {e}",
+                "instance": None,
+                "is_capacity_error": False
+            }
+        
+        # Outcomes are logged by the engine's observers
+        if result["success"]:
+            self.state["instance_info"] = result["instance"]
+            self.state["last_result"] = "✅ Instance created successfully!"
+        elif result["is_capacity_error"]:
+            self.state["last_result"] = f"⏳ Out of capacity. Retrying in {self.config.retry_interval}s..."
+        else:
+            self.state["last_result"] = f"❌ {result['message']}"
+        
+        return result
+    
+    def retire(self, status: str):
+        """Stop scheduling this pipeline."""
+        self.retired = True
+        self.state["status"] = status
+
+
+class LaunchOrchestrator:
+    """
+    Drive every account and region pipeline concurrently from one process.
+    
+    A single scheduler thread keeps a heap of due times and hands attempts to a
+    shared, bounded worker pool. Each account has its own rate limit, failure
+    backoff and stop policy, so one broken account never stalls the others:
+    - first_success: stop an account's pipelines as soon as one of them succeeds
+    - quota: keep launching until the account's claimed A1 OCPUs or memory reach the quota
+    
+    An optional LoopControl pauses, resumes, retunes or wakes the scheduler at
+    runtime; on_heartbeat reports liveness to the watchdog, watching the oldest
+    attempt in flight. With a coordination backend and first_success, an account
+    also stops once another deployment has claimed its instance (on_claimed).
+    With RECLAIM_WATCH_ENABLED every created instance is watched (on_watch), and a
+    reclaimed one puts its account's pipelines back to work (on_reclaimed).
+    """
+    
+    def __init__(self, config: Config, on_update=None, control: LoopControl = None, on_heartbeat=None,
+                 on_claimed=None, on_watch=None, on_reclaimed=None):
+        self.config = config
+        self.on_update = on_update
+        self.on_claimed = on_claimed
+        self.on_watch = on_watch
+        self.on_reclaimed = on_reclaimed
+        self.control = control
+        self.on_heartbeat = on_heartbeat
+        self.accounts = []
+        self.pipelines = []
+        self.instances = []
+        
+        multi_account = bool(config.account_profiles)
+        for account_config in config.accounts():
+            account = AccountGroup(account_config)
+            self.accounts.append(account)
+            
+            for profile in account_config.region_profiles:
+                name = f"{account.name}/{profile['name']}" if multi_account else profile["name"]
+                try:
+                    pipeline_config = account_config.for_region(profile)
+                    resolve_config(pipeline_config)
+                    pipeline = RegionPipeline(pipeline_config, account, name)
+                except Exception as e:
+                    # A broken account (bad key, bad region) must not stop the others
+                    account.state["status"] = "error"
+                    account.state["error_message"] = str(e)
+                    print(f"[{get_timestamp()}] [{name}] ❌ Failed to initialize pipeline: {e}", flush=True)
+                    continue
+                account.pipelines.append(pipeline)
+                self.pipelines.append(pipeline)
+        
+        if not self.pipelines:
+            raise ValueError("No launch pipeline could be initialized")
+        
+        self._stop_event = threading.Event()
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._forced = set()  # pipelines due for a requested attempt while paused
+        self._in_flight = {}  # pipeline -> time.monotonic() its attempt started
+        self._watching = set()  # ids of the created instances being watched for reclaim
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, min(config.max_workers, len(self.pipelines))),
+            thread_name_prefix="launch-pipeline"
+        )
+        
+        # Released by release_control(), so a watchdog-replaced orchestrator stops following commands
+        self._attached = []
+        if control:
+            self._attached = [pipeline.config for pipeline in self.pipelines if control.attach(pipeline.config)]
+            control.add_listener(self._on_control)
+    
+    @property
+    def region_states(self) -> dict:
+        """Live per-pipeline state dictionaries keyed by pipeline name."""
+        return {pipeline.name: pipeline.state for pipeline in self.pipelines}
+    
+    @property
+    def account_states(self) -> dict:
+        """Live per-account state dictionaries keyed by account name."""
+        return {account.name: account.state for account in self.accounts}
+    
+    @property
+    def total_attempts(self) -> int:
+        """Total attempts across all pipelines."""
+        return sum(pipeline.state["attempt"] for pipeline in self.pipelines)
+    
+    def run(self) -> bool:
+        """
+        Run all pipelines until every account's stop policy is satisfied or stop() is called.
+        
+        Returns:
+            True if at least one instance was created
+        """
+        # Stagger the first attempts so the pipelines share the API budget evenly
+        stagger = self.config.retry_interval / len(self.pipelines)
+        now = time.monotonic()
+        with self._cond:
+            for index, pipeline in enumerate(self.pipelines):
+                self._schedule(pipeline, now + index * stagger)
+        
+        try:
+            while not self._stop_event.is_set():
+                with self._cond:
+                    if self.control and self.control.paused and not self._forced:
+                        # Paused; resume() or attempt_now() notifies the condition
+                        self._cond.wait()
+                        continue
+                    
+                    if not self._heap:
+                        if all(pipeline.retired for pipeline in self.pipelines) and not self._watching:
+                            break
+                        # Every pipeline is mid-attempt or watching; wait for one to reschedule
+                        self._cond.wait()
+                        continue
+                    
+                    due, _, pipeline = self._heap[0]
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+                    heapq.heappop(self._heap)
+                    
+                    if pipeline.retired:
+                        self._forced.discard(pipeline)
+                        continue
+                    
+                    # Respect the account's backoff and rate limit before using a worker
+                    wait = pipeline.account.reserve()
+                    if wait > 0:
+                        self._schedule(pipeline, time.monotonic() + wait)
+                        continue
+                    self._forced.discard(pipeline)
+                    self._in_flight[pipeline] = time.monotonic()
+                    self._beat()
+                
+                future = self._executor.submit(pipeline.attempt)
+                future.add_done_callback(lambda f, p=pipeline: self._on_attempt_done(p, f))
+        finally:
+            self._executor.shutdown(wait=True)
+        
+        return bool(self.instances)
+    
+    def stop(self):
+        """Stop scheduling new attempts."""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+    
+    def release_control(self):
+        """Detach the pipeline configs and the command listener from the runtime control."""
+        if not self.control:
+            return
+        for config in self._attached:
+            self.control.detach(config)
+        self._attached = []
+        self.control.remove_listener(self._on_control)
+    
+    def _beat(self, cycle: bool = False):
+        """Report liveness to the watchdog (caller holds the condition)."""
+        if not self.on_heartbeat:
+            return
+        if self._in_flight:
+            self.on_heartbeat(f"{len(self._in_flight)} attempts in flight",
+                              since=min(self._in_flight.values()), cycle=cycle)
+        else:
+            self.on_heartbeat("waiting", watched=False, cycle=cycle)
+    
+    def _on_control(self, command: str):
+        """Re-plan the queued attempts after a runtime control command."""
+        with self._cond:
+            now = time.monotonic()
+            if command == "attempt_now":
+                self.control.consume_attempt_now()
+                queued = [entry[2] for entry in self._heap if not entry[2].retired]
+                self._heap = []
+                for pipeline in queued:
+                    self._schedule(pipeline, now)
+                self._forced = set(queued)
+            elif command == "retune":
+                for pipeline in self.pipelines:
+                    pipeline.state["ocpus"] = pipeline.config.ocpus
+                    pipeline.state["memory_gb"] = pipeline.config.memory_gb
+                queued = [entry[2] for entry in self._heap if not entry[2].retired]
+                self._heap = []
+                for pipeline in queued:
+                    due = max(pipeline.finished_at + pipeline.config.retry_interval, pipeline.account.backoff_until)
+                    self._schedule(pipeline, due)
+            elif command == "stop":
+                self._stop_event.set()
+            self._cond.notify_all()
+    
+    def _schedule(self, pipeline: RegionPipeline, due: float):
+        """Queue the next attempt of a pipeline (caller holds the condition)."""
+        heapq.heappush(self._heap, (due, next(self._seq), pipeline))
+        self._cond.notify_all()
+    
+    def _on_attempt_done(self, pipeline: RegionPipeline, future):
+        """Apply the account's policies to a finished attempt and reschedule the pipeline."""
+        result = future.result()
+        account = pipeline.account
+        
+        account.record_attempt(result)
+        if result["success"]:
+            self._record_success(pipeline, result["instance"])
+        
+        # Share the outcome with the other deployments
+        claim = None
+        if account.coordinator and self.config.stop_policy == "first_success":
+            if result["success"]:
+                account.coordinator.claim(pipeline.config, result["instance"])
+            elif account.state["status"] != "claimed":
+                claim = account.coordinator.claimed_elsewhere(pipeline.config)
+                if claim:
+                    self._retire_claimed(account, claim)
+        
+        with self._cond:
+            pipeline.finished_at = time.monotonic()
+            self._in_flight.pop(pipeline, None)
+            self._beat(cycle=True)
+            if not pipeline.retired and not self._stop_event.is_set():
+                self._schedule(pipeline, time.monotonic() + pipeline.config.retry_interval)
+            self._cond.notify_all()
+        
+        if self.on_update:
+            self.on_update(self, pipeline, result)
+        if result["success"] and self.config.reclaim_watch_enabled:
+            threading.Thread(target=self._watch, args=(pipeline, result["instance"]), name="reclaim-watch",
+                             daemon=True).start()
+        if claim and self.on_claimed:
+            self.on_claimed(self, account, claim)
+    
+    def _retire_claimed(self, account: AccountGroup, claim: dict):
+        """Stop an account whose instance another deployment already created."""
+        with self._cond:
+            for pipeline in account.pipelines:
+                if not pipeline.retired:
+                    pipeline.retire("stopped")
+            account.state["status"] = "claimed"
+            account.state["claimed_by"] = claim
+            if all(pipeline.retired for pipeline in self.pipelines):
+                self._stop_event.set()
+            self._cond.notify_all()
+    
+    def _record_success(self, pipeline: RegionPipeline, instance: dict):
+        """Track a created instance and decide which of the account's pipelines keep running."""
+        account = pipeline.account
+        
+        with self._cond:
+            self.instances.append(instance)
+            # The instance records the shape it was launched with, even if retuned since
+            account.claimed_ocpus += instance["ocpus"]
+            account.claimed_memory_gb += instance["memory_gb"]
+            account.state["claimed_ocpus"] = account.claimed_ocpus
+            account.state["claimed_memory_gb"] = account.claimed_memory_gb
+            
+            if self.config.stop_policy == "first_success":
+                pipeline.retire("success")
+                for other in account.pipelines:
+                    if not other.retired:
+                        other.retire("stopped")
+            else:
+                pipeline.state["status"] = "success"
+                remaining_ocpus = self.config.quota_ocpus - account.claimed_ocpus
+                remaining_memory = self.config.quota_memory_gb - account.claimed_memory_gb
+                
+                # Retire every pipeline whose shape no longer fits the remaining quota
+                for other in account.pipelines:
+                    if other.retired:
+                        continue
+                    if other.config.ocpus > remaining_ocpus or other.config.memory_gb > remaining_memory:
+                        other.retire("success" if other.state["instance_info"] else "stopped")
+            
+            if account.retired:
+                account.state["status"] = "success"
+            
+            if self.config.reclaim_watch_enabled:
+                self._watching.add(instance["id"])  # watched once the success is published
+            elif all(other.retired for other in self.pipelines):
+                self._stop_event.set()
+            
+            self._cond.notify_all()
+    
+    def _watch(self, pipeline: RegionPipeline, instance: dict):
+        """Poll a created instance and relaunch its account once it is reclaimed."""
+        started = time.monotonic()
+        if self.on_watch:
+            self.on_watch(self, pipeline, instance)
+        
+        state = pipeline.oci_client.wait_until_reclaimed(instance["id"], self._stop_event)
+        if state:
+            self._record_reclaim(pipeline, instance)
+            if self.on_reclaimed:
+                self.on_reclaimed(self, pipeline, instance, state, round(time.monotonic() - started))
+        
+        with self._cond:
+            self._watching.discard(instance["id"])
+            self._cond.notify_all()
+    
+    def _record_reclaim(self, pipeline: RegionPipeline, instance: dict):
+        """Forget a reclaimed instance and reschedule the pipelines its quota allows again."""
+        account = pipeline.account
+        # Let every deployment launch again
+        if account.coordinator and self.config.stop_policy == "first_success":
+            account.coordinator.release(pipeline.config)
+        
+        with self._cond:
+            self.instances = [created for created in self.instances if created["id"] != instance["id"]]
+            account.claimed_ocpus -= instance["ocpus"]
+            account.claimed_memory_gb -= instance["memory_gb"]
+            account.state["claimed_ocpus"] = account.claimed_ocpus
+            account.state["claimed_memory_gb"] = account.claimed_memory_gb
+            if (pipeline.state["instance_info"] or {}).get("id") == instance["id"]:
+                pipeline.state["instance_info"] = None
+            
+            remaining_ocpus = self.config.quota_ocpus - account.claimed_ocpus
+            remaining_memory = self.config.quota_memory_gb - account.claimed_memory_gb
+            now = time.monotonic()
+            for other in account.pipelines:
+                if not other.retired or self._stop_event.is_set():
+                    continue
+                if self.config.stop_policy == "quota" and (
+                        other.config.ocpus > remaining_ocpus or other.config.memory_gb > remaining_memory):
+                    continue
+                other.retired = False
+                other.state["status"] = "running"
+                if other in self._in_flight:
+                    continue  # rescheduled when its attempt finishes
+                # Relaunch at once with the pipeline's warm client (dropping a stale queue entry)
+                self._heap = [entry for entry in self._heap if entry[2] is not other]
+                heapq.heapify(self._heap)
+                self._schedule(other, now)
+            
+            if not account.retired:
+                account.state["status"] = "running"
+                account.state["claimed_by"] = None
+            self._cond.notify_all()
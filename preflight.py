@@ -0,0 +1,298 @@
+"""
+Preflight validation for the auto-register loop.
+Runs every configuration and account check concurrently with a timeout, so
+misconfigurations show up before the first launch attempt instead of after
+hours of "retrying". Passing results are cached on disk for reuse at startup.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import oci
+import oci.core
+import oci.identity
+from config import Config
+from oci_client import OCIClient
+
+
+class CheckResult:
+    """Outcome of a single preflight check."""
+    
+    # Possible statuses, in increasing order of severity
+    PASS = "pass"
+    WARN = "warn"
+    FAIL = "fail"
+    
+    ICONS = {PASS: "✅", WARN: "⚠️", FAIL: "❌"}
+    
+    def __init__(self, name: str, status: str, message: str, duration: float = 0.0, cached: bool = False):
+        self.name = name
+        self.status = status
+        self.message = message
+        self.duration = duration
+        self.cached = cached
+    
+    def to_dict(self) -> dict:
+        """Serializable form used by the cache and /api/status."""
+        return {
+            "name": self.name,
+            "status": self.status,
+            "message": self.message,
+            "duration": round(self.duration, 3),
+            "cached": self.cached,
+        }
+
+
+class PreflightReport:
+    """Collection of check results with a summary."""
+    
+    def __init__(self, results: list, duration: float):
+        self.results = results
+        self.duration = duration
+    
+    @property
+    def passed(self) -> bool:
+        """True unless a check failed (warnings and timeouts don't block startup)."""
+        return all(result.status != CheckResult.FAIL for result in self.results)
+    
+    def print_report(self, title: str = "Preflight report"):
+        """Print a timed report of every check."""
+        print(f"\n🔍 {title} ({self.duration:.2f}s total)", flush=True)
+        for result in self.results:
+            timing = "cached" if result.cached else f"{result.duration:.2f}s"
+            print(f"   {CheckResult.ICONS[result.status]} {result.name:<12} {timing:>7}  {result.message}", flush=True)
+    
+    def to_dict(self) -> dict:
+        """Serializable form for /api/status."""
+        return {
+            "passed": self.passed,
+            "duration": round(self.duration, 3),
+            "checks": [result.to_dict() for result in self.results],
+        }
+
+
+class PreflightEngine:
+    """Run the preflight checks for one configuration concurrently."""
+    
+    SHAPE = "VM.Standard.A1.Flex"
+    
+    # Checks whose passing result may be reused from the cache; quota changes
+    # as instances are created, so it is always checked live.
+    CACHEABLE_CHECKS = ["credentials", "image", "subnet"]
+    
+    # Serializes cache file access between engines in the same process
+    _cache_lock = threading.Lock()
+    
+    def __init__(self, config: Config, oci_client: OCIClient = None):
+        self.config = config
+        self.oci_client = oci_client or OCIClient(config)
+        self.timeout = config.preflight_timeout
+        self.cache_path = config.preflight_cache_path
+        self.cache_ttl = config.preflight_cache_ttl_hours * 3600
+    
+    @property
+    def cache_key(self) -> str:
+        """Fingerprint of every setting the cached checks depend on."""
+        fields = [
+            self.config.oci_user_ocid,
+            self.config.oci_tenancy_ocid,
+            self.config.oci_fingerprint,
+            self.config.oci_region,
+            self.config.compartment_ocid,
+            self.config.subnet_ocid,
+            self.config.image_ocid,
+            ",".join(self.config.availability_domains),
+        ]
+        return hashlib.sha256("|".join(str(field) for field in fields).encode()).hexdigest()
+    
+    def run(self, use_cache: bool = True) -> PreflightReport:
+        """
+        Run all checks and store the passing ones in the cache.
+        
+        Args:
+            use_cache: Reuse passing results from a previous run when still fresh
+        
+        Returns:
+            PreflightReport with one result per check
+        """
+        started = time.monotonic()
+        
+        # The config format check is local and cheap; remote checks are pointless without it
+        config_result = self._timed("config", self._check_config)
+        if config_result.status == CheckResult.FAIL:
+            return PreflightReport([config_result], time.monotonic() - started)
+        
+        checks = {
+            "credentials": self._check_credentials,
+            "image": self._check_image,
+            "subnet": self._check_subnet,
+            "quota": self._check_quota,
+        }
+        
+        cached = self._load_cached() if use_cache else {}
+        results = {"config": config_result}
+        for name in list(checks):
+            if name in cached:
+                results[name] = CheckResult(name, CheckResult.PASS, cached[name]["message"], cached=True)
+                del checks[name]
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, len(checks)), thread_name_prefix="preflight")
+        futures = {executor.submit(self._timed, name, check): name for name, check in checks.items()}
+        done, not_done = wait(futures, timeout=self.timeout)
+        
+        for future in done:
+            result = future.result()
+            results[result.name] = result
+        for future in not_done:
+            name = futures[future]
+            results[name] = CheckResult(
+                name, CheckResult.WARN, f"Timed out after {self.timeout}s", duration=self.timeout
+            )
+        
+        # Don't wait for hung calls; they finish (or time out) in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+        
+        ordered = [results[name] for name in ["config", "credentials", "image", "subnet", "quota"] if name in results]
+        self._store_cached(ordered)
+        return PreflightReport(ordered, time.monotonic() - started)
+    
+    def _timed(self, name: str, check) -> CheckResult:
+        """Run a check, converting exceptions into failures and recording its duration."""
+        started = time.monotonic()
+        try:
+            status, message = check()
+        except oci.exceptions.ServiceError as e:
+            status, message = CheckResult.FAIL, f"{e.code}: {e.message}"
+        except Exception as e:
+            status, message = CheckResult.FAIL, str(e)
+        return CheckResult(name, status, message, time.monotonic() - started)
+    
+    def _client_kwargs(self) -> dict:
+        """SDK client options so a hung call can't outlive the preflight timeout."""
+        return {"timeout": (min(5, self.timeout), self.timeout)}
+    
+    def _check_config(self) -> tuple:
+        """Validate OCID formats and the private key."""
+        if not self.config.validate():
+            return CheckResult.FAIL, "Configuration validation failed"
+        return CheckResult.PASS, "Configuration format OK"
+    
+    def _check_credentials(self) -> tuple:
+        """Authenticate and confirm the configured availability domain exists."""
+        identity_client = oci.identity.IdentityClient(self.config.get_oci_config(), **self._client_kwargs())
+        domains = [domain.name for domain in identity_client.list_availability_domains(self.config.oci_tenancy_ocid).data]
+        
+        missing = [domain for domain in self.config.availability_domains if domain not in domains]
+        if missing:
+            return CheckResult.FAIL, f"Availability domain {', '.join(missing)} not found (have: {', '.join(domains)})"
+        return CheckResult.PASS, f"Authenticated, {len(domains)} availability domains visible"
+    
+    def _check_image(self) -> tuple:
+        """Confirm the image is available and supports the A1 shape."""
+        compute_client = oci.core.ComputeClient(self.config.get_oci_config(), **self._client_kwargs())
+        image = compute_client.get_image(self.config.image_ocid).data
+        if image.lifecycle_state != "AVAILABLE":
+            return CheckResult.FAIL, f"Image is {image.lifecycle_state}"
+        
+        entries = oci.pagination.list_call_get_all_results(
+            compute_client.list_image_shape_compatibility_entries,
+            self.config.image_ocid
+        ).data
+        if not any(entry.shape == self.SHAPE for entry in entries):
+            return CheckResult.FAIL, f"Image '{image.display_name}' does not support {self.SHAPE}"
+        return CheckResult.PASS, f"{image.display_name} supports {self.SHAPE}"
+    
+    def _check_subnet(self) -> tuple:
+        """Confirm the subnet exists, is available and allows public IPs."""
+        network_client = oci.core.VirtualNetworkClient(self.config.get_oci_config(), **self._client_kwargs())
+        subnet = network_client.get_subnet(self.config.subnet_ocid).data
+        
+        if subnet.lifecycle_state != "AVAILABLE":
+            return CheckResult.FAIL, f"Subnet is {subnet.lifecycle_state}"
+        if subnet.prohibit_public_ip_on_vnic:
+            return CheckResult.FAIL, f"Subnet '{subnet.display_name}' is private (public IPs prohibited)"
+        # An AD-bound subnet only serves launches in its own AD, so it can't serve several
+        if subnet.availability_domain:
+            others = [domain for domain in self.config.availability_domains if domain != subnet.availability_domain]
+            if others:
+                return CheckResult.FAIL, (
+                    f"Subnet is bound to {subnet.availability_domain}, not {', '.join(others)} "
+                    f"(use a regional subnet to launch in several ADs)"
+                )
+        return CheckResult.PASS, f"Public subnet '{subnet.display_name}'"
+    
+    def _check_quota(self) -> tuple:
+        """Confirm the compartment has enough A1 OCPUs and memory left (for the smallest rung with FILL_QUOTA)."""
+        try:
+            available = self.oci_client.get_a1_availability()
+        except oci.exceptions.ServiceError as e:
+            if e.status in (401, 403, 404):
+                # Reading limits needs extra IAM permissions; don't block on it
+                return CheckResult.WARN, f"Could not read A1 limits ({e.code})"
+            raise
+        
+        # A partly filled quota still fits the smaller rungs of the ladder
+        ocpus, memory_gb = self.config.ocpus, self.config.memory_gb
+        if self.config.fill_quota:
+            ocpus, memory_gb = min(self.config.shape_ladder)
+        
+        # An instance only needs room in the AD it launches in
+        fitting = [
+            name for name, domain in available["availability_domains"].items()
+            if domain["ocpus"] >= ocpus and domain["memory_gb"] >= memory_gb
+        ]
+        if not fitting:
+            return CheckResult.FAIL, (
+                f"Only {available['ocpus']} OCPUs / {available['memory_gb']} GB A1 left in any AD "
+                f"(need {ocpus} / {memory_gb})"
+            )
+        return CheckResult.PASS, (
+            f"{available['ocpus']} OCPUs / {available['memory_gb']} GB A1 available "
+            f"(room in {len(fitting)} of {len(available['availability_domains'])} ADs)"
+        )
+    
+    def _load_cached(self) -> dict:
+        """Return still-fresh cached passing results for this configuration."""
+        with self._cache_lock:
+            try:
+                with open(self.cache_path, "r") as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                return {}
+        
+        entry = cache.get(self.cache_key, {})
+        now = time.time()
+        return {
+            name: result for name, result in entry.items()
+            if name in self.CACHEABLE_CHECKS and result.get("expires_at", 0) > now
+        }
+    
+    def _store_cached(self, results: list):
+        """Cache the passing results of cacheable checks."""
+        passing = {
+            result.name: {"message": result.message, "expires_at": time.time() + self.cache_ttl}
+            for result in results
+            if result.name in self.CACHEABLE_CHECKS and result.status == CheckResult.PASS and not result.cached
+        }
+        if not passing:
+            return
+        
+        with self._cache_lock:
+            try:
+                with open(self.cache_path, "r") as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                cache = {}
+            
+            cache.setdefault(self.cache_key, {}).update(passing)
+            tmp_path = f"{self.cache_path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(cache, f, indent=2)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                print(f"⚠️ Could not write preflight cache {self.cache_path}: {e}", flush=True)
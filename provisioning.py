@@ -0,0 +1,288 @@
+"""
+Post-launch provisioning for a newly created instance.
+Runs the checks users would otherwise do in the console - wait for RUNNING,
+confirm the boot volume, resolve the public IP, attach a block volume and
+probe SSH - concurrently, timing each step and reporting it as it completes.
+"""
+
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import oci
+import oci.core
+from breakers import CircuitOpenError, is_transient_error
+from config import Config
+from oci_client import OCIClient
+
+
+class ProvisioningStep:
+    """Outcome of a single provisioning step."""
+    
+    __slots__ = ("name", "label", "status", "detail", "duration")
+    
+    # Possible statuses
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+    
+    ICONS = {PENDING: "⏸️", RUNNING: "⏳", DONE: "✅", FAILED: "❌", SKIPPED: "⏭️"}
+    
+    def __init__(self, name: str, label: str):
+        self.name = name
+        self.label = label
+        self.status = self.PENDING
+        self.detail = None
+        self.duration = None
+    
+    def to_dict(self) -> dict:
+        """Serializable form for events, the dashboard and the journal."""
+        return {
+            "name": self.name,
+            "label": self.label,
+            "status": self.status,
+            "detail": self.detail,
+            "duration": round(self.duration, 1) if self.duration is not None else None,
+        }
+
+
+class ProvisioningPipeline:
+    """
+    Provision one new instance.
+    
+    RUNNING, boot volume and public IP are awaited in parallel; the block volume
+    attach and the SSH probe start as soon as the steps they depend on are done.
+    """
+    
+    STEPS = [
+        ("running", "Instance RUNNING"),
+        ("boot_volume", "Boot volume"),
+        ("public_ip", "Public IP"),
+        ("block_volume", "Block volume"),
+        ("ssh", "SSH reachable"),
+    ]
+    
+    SSH_PORT = 22
+    POLL_SECONDS = 5
+    
+    def __init__(self, config: Config, oci_client: OCIClient, instance: dict, on_step=None):
+        """
+        Args:
+            config: Configuration of the account and region the instance was created in
+            oci_client: Client that created the instance
+            instance: Instance dict from create_instance(); public_ip is filled in once known
+            on_step: Called as on_step(pipeline, step) whenever a step starts or completes
+        """
+        self.config = config
+        self.oci_client = oci_client
+        self.instance = instance
+        self.on_step = on_step
+        self.timeout = config.provision_timeout
+        self.steps = {name: ProvisioningStep(name, label) for name, label in self.STEPS}
+        self.duration = None
+        self._stop_event = threading.Event()
+    
+    @property
+    def succeeded(self) -> bool:
+        """True unless a step failed."""
+        return all(step.status != ProvisioningStep.FAILED for step in self.steps.values())
+    
+    def run(self) -> bool:
+        """
+        Run every step and wait for all of them.
+        
+        Returns:
+            True if no step failed
+        """
+        started = time.monotonic()
+        
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="provisioning") as executor:
+            running = executor.submit(self._run_step, "running", self._wait_running)
+            boot_volume = executor.submit(self._run_step, "boot_volume", self._check_boot_volume)
+            public_ip = executor.submit(self._run_step, "public_ip", self._resolve_public_ip)
+            
+            is_running = running.result()
+            if not self.config.provision_block_volume_ocid:
+                self._skip("block_volume", "PROVISION_BLOCK_VOLUME_OCID not set")
+                block_volume = None
+            elif is_running:
+                block_volume = executor.submit(self._run_step, "block_volume", self._attach_block_volume)
+            else:
+                self._skip("block_volume", "Instance is not running")
+                block_volume = None
+            
+            if is_running and public_ip.result():
+                self._run_step("ssh", self._probe_ssh)
+            else:
+                self._skip("ssh", "Instance is not running" if not is_running else "No public IP")
+            
+            boot_volume.result()
+            if block_volume:
+                block_volume.result()
+        
+        self.duration = time.monotonic() - started
+        return self.succeeded
+    
+    def stop(self):
+        """Abort the polling steps early."""
+        self._stop_event.set()
+    
+    def to_dict(self) -> dict:
+        """Serializable progress for the dashboard."""
+        return {
+            "instance_id": self.instance["id"],
+            "name": self.instance.get("name"),
+            "steps": [step.to_dict() for step in self.steps.values()],
+            "duration": round(self.duration, 1) if self.duration is not None else None,
+        }
+    
+    def _run_step(self, name: str, action) -> bool:
+        """Run one step, timing it and reporting its start and outcome."""
+        step = self.steps[name]
+        step.status = ProvisioningStep.RUNNING
+        self._report(step)
+        
+        started = time.monotonic()
+        try:
+            step.detail = action()
+            step.status = ProvisioningStep.DONE
+        except oci.exceptions.ServiceError as e:
+            step.detail = f"{e.code}: {e.message}"
+            step.status = ProvisioningStep.FAILED
+        except Exception as e:
+            step.detail = str(e) or type(e).__name__
+            step.status = ProvisioningStep.FAILED
+        step.duration = time.monotonic() - started
+        
+        self._report(step)
+        return step.status == ProvisioningStep.DONE
+    
+    def _skip(self, name: str, reason: str):
+        """Mark a step as skipped."""
+        step = self.steps[name]
+        step.status = ProvisioningStep.SKIPPED
+        step.detail = reason
+        self._report(step)
+    
+    def _report(self, step: ProvisioningStep):
+        """Pass a step update to the callback."""
+        if self.on_step:
+            self.on_step(self, step)
+    
+    def _poll(self, check, what: str, timeout: float = None):
+        """Call check() every POLL_SECONDS until it returns a value (transient errors are retried)."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        while True:
+            try:
+                value = check()
+            except Exception as e:
+                if not (is_transient_error(e) or isinstance(e, CircuitOpenError)):
+                    raise
+                value = None
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out after {int(timeout or self.timeout)}s waiting for {what}")
+            if self._stop_event.wait(self.POLL_SECONDS):
+                raise RuntimeError("Provisioning stopped")
+    
+    def _wait_running(self) -> str:
+        """Wait for the instance to reach RUNNING (SDK waiter)."""
+        compute_client = self.oci_client.compute_client
+        breaker = self.oci_client.compute_breaker
+        response = breaker.call(compute_client.get_instance, self.instance["id"])
+        final = breaker.call(
+            oci.wait_until,
+            compute_client,
+            response,
+            evaluate_response=lambda r: r.data.lifecycle_state in ("RUNNING", "TERMINATING", "TERMINATED"),
+            max_interval_seconds=10,
+            max_wait_seconds=self.timeout
+        )
+        
+        state = final.data.lifecycle_state
+        self.instance["lifecycle_state"] = state
+        if state != "RUNNING":
+            raise RuntimeError(f"Instance is {state}")
+        return state
+    
+    def _check_boot_volume(self) -> str:
+        """Wait for the boot volume to be attached and confirm it is available."""
+        compute_client = self.oci_client.compute_client
+        
+        def attached():
+            attachments = self.oci_client.compute_breaker.call(
+                compute_client.list_boot_volume_attachments,
+                self.instance["availability_domain"],
+                self.config.compartment_ocid,
+                instance_id=self.instance["id"]
+            ).data
+            return next((a for a in attachments if a.lifecycle_state == "ATTACHED"), None)
+        
+        attachment = self._poll(attached, "the boot volume attachment")
+        blockstorage_client = oci.core.BlockstorageClient(
+            self.config.get_oci_config(), timeout=self.config.oci_compute_timeout
+        )
+        volume = self.oci_client.compute_breaker.call(
+            blockstorage_client.get_boot_volume, attachment.boot_volume_id
+        ).data
+        if volume.lifecycle_state != "AVAILABLE":
+            raise RuntimeError(f"Boot volume is {volume.lifecycle_state}")
+        return f"{volume.size_in_gbs} GB, {volume.lifecycle_state}"
+    
+    def _resolve_public_ip(self) -> str:
+        """Wait for the primary VNIC and its public IP."""
+        compute_client = self.oci_client.compute_client
+        network_client = self.oci_client.virtual_network_client
+        
+        def public_ip():
+            attachments = self.oci_client.compute_breaker.call(
+                compute_client.list_vnic_attachments,
+                compartment_id=self.config.compartment_ocid,
+                instance_id=self.instance["id"]
+            ).data
+            attachment = next((a for a in attachments if a.lifecycle_state == "ATTACHED"), None)
+            if not attachment:
+                return None
+            return self.oci_client.network_breaker.call(network_client.get_vnic, attachment.vnic_id).data.public_ip
+        
+        ip = self._poll(public_ip, "the public IP")
+        self.instance["public_ip"] = ip
+        return ip
+    
+    def _attach_block_volume(self) -> str:
+        """Attach PROVISION_BLOCK_VOLUME_OCID and wait for the attachment (SDK waiter)."""
+        compute_client = self.oci_client.compute_client
+        breaker = self.oci_client.compute_breaker
+        details = oci.core.models.AttachParavirtualizedVolumeDetails(
+            instance_id=self.instance["id"],
+            volume_id=self.config.provision_block_volume_ocid,
+            display_name=f"{self.instance.get('name') or 'instance'}-data"
+        )
+        attachment = breaker.call(compute_client.attach_volume, details).data
+        final = breaker.call(
+            oci.wait_until,
+            compute_client,
+            breaker.call(compute_client.get_volume_attachment, attachment.id),
+            "lifecycle_state",
+            "ATTACHED",
+            max_interval_seconds=10,
+            max_wait_seconds=self.timeout
+        )
+        return f"Attached ({final.data.attachment_type})"
+    
+    def _probe_ssh(self) -> str:
+        """Wait until TCP port 22 accepts connections."""
+        ip = self.instance["public_ip"]
+        
+        def reachable():
+            try:
+                with socket.create_connection((ip, self.SSH_PORT), timeout=self.POLL_SECONDS):
+                    return f"{ip}:{self.SSH_PORT} accepts connections"
+            except OSError:
+                return None
+        
+        return self._poll(reachable, f"SSH on {ip}", timeout=self.config.provision_ssh_timeout)
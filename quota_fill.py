@@ -0,0 +1,311 @@
+"""
+Quota-aware fill of the free-tier A1 capacity.
+Instead of waiting for one fixed shape, tries a ladder of shapes concurrently
+and keeps launching until the free A1 OCPUs and memory are fully used.
+Smaller shapes hit capacity far more often, so more capacity is claimed per hour.
+"""
+
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import Config
+from control import LoopControl
+from coordination import get_coordinator
+from oci_client import OCIClient
+
+
+def get_timestamp() -> str:
+    """Get current timestamp for logging."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class QuotaFiller:
+    """
+    Launch instances from SHAPE_LADDER until the free A1 quota is used up.
+    
+    With RECLAIM_WATCH_ENABLED every created instance is watched (on_watch), and
+    the fill resumes as soon as one of them is reclaimed (on_reclaimed).
+    """
+    
+    def __init__(self, config: Config, oci_client: OCIClient, on_update=None, control: LoopControl = None,
+                 on_heartbeat=None, on_watch=None, on_reclaimed=None):
+        self.config = config
+        self.oci_client = oci_client
+        self.on_update = on_update
+        self.on_watch = on_watch
+        self.on_reclaimed = on_reclaimed
+        self.control = control
+        self.on_heartbeat = on_heartbeat
+        self.instances = []
+        self.attempt = 0
+        self.remaining = None
+        self.domain_room = {}  # AD -> A1 room left in it, from the limits API
+        
+        # Rate limit shared with redundant deployments (COORDINATION_URL); the
+        # live limits already account for instances they create
+        coordinator = get_coordinator(config)
+        self.limiter = coordinator.limiter(config) if coordinator else None
+        
+        self.state = {
+            "ladder": [f"{ocpus}/{memory_gb}GB" for ocpus, memory_gb in config.shape_ladder],
+            "remaining_ocpus": None,
+            "remaining_memory_gb": None,
+            "quota_source": None,  # limits (live limits API) or config (A1_QUOTA_* fallback)
+            "claimed_ocpus": 0,
+            "claimed_memory_gb": 0,
+            "instances": [],
+        }
+        
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watching = set()  # ids of the created instances being watched for reclaim
+        self._reclaimed = threading.Event()  # set when a watched instance is reclaimed (or on stop)
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(config.shape_ladder),
+            thread_name_prefix="quota-fill"
+        )
+    
+    def refresh_remaining(self) -> dict:
+        """
+        Compute the free A1 capacity still available.
+        
+        Uses the limits API (room in the AD with the most of it, usage summed
+        over every configured AD; rounds launch in the ADs with room) and caps it
+        at A1_QUOTA_OCPUS / A1_QUOTA_MEMORY_GB so paid accounts with higher
+        limits never leave the free tier. Falls back to the configured quota
+        minus what this process has claimed.
+        """
+        claimed_ocpus = sum(instance["ocpus"] for instance in self.instances)
+        claimed_memory = sum(instance["memory_gb"] for instance in self.instances)
+        
+        try:
+            limits = self.oci_client.get_a1_availability()
+            remaining = {
+                "ocpus": min(limits["ocpus"], self.config.quota_ocpus - limits["used_ocpus"]),
+                "memory_gb": min(limits["memory_gb"], self.config.quota_memory_gb - limits["used_memory_gb"]),
+            }
+            self.domain_room = limits["availability_domains"]
+            source = "limits"
+        except Exception as e:
+            print(f"[{get_timestamp()}] ⚠️ Could not read A1 limits, using configured quota: {e}", flush=True)
+            remaining = {
+                "ocpus": self.config.quota_ocpus - claimed_ocpus,
+                "memory_gb": self.config.quota_memory_gb - claimed_memory,
+            }
+            self.domain_room = {}
+            source = "config"
+        
+        self.remaining = remaining
+        self.state["remaining_ocpus"] = remaining["ocpus"]
+        self.state["remaining_memory_gb"] = remaining["memory_gb"]
+        self.state["quota_source"] = source
+        return remaining
+    
+    def fitting_shapes(self) -> list:
+        """Ladder steps that still fit into the remaining quota."""
+        return [
+            (ocpus, memory_gb) for ocpus, memory_gb in self.config.shape_ladder
+            if ocpus <= self.remaining["ocpus"] and memory_gb <= self.remaining["memory_gb"]
+        ]
+    
+    def round_shapes(self) -> list:
+        """
+        Ladder steps to launch together in the next round.
+        
+        Every launch of a round may succeed, so their combined size must fit
+        the remaining quota: a step plus the smaller ones that still fit
+        alongside it. Rounds rotate between these sets (e.g. 4/24, then
+        2/12 + 1/6), so the smaller shapes - which hit capacity more often -
+        keep being tried without ever leaving the free tier.
+        """
+        fitting = self.fitting_shapes()
+        candidates = []
+        for start, shape in enumerate(fitting):
+            combined, ocpus, memory_gb = [shape], shape[0], shape[1]
+            for smaller in fitting[start + 1:]:
+                if ocpus + smaller[0] <= self.remaining["ocpus"] and memory_gb + smaller[1] <= self.remaining["memory_gb"]:
+                    combined.append(smaller)
+                    ocpus += smaller[0]
+                    memory_gb += smaller[1]
+            candidates.append(combined)
+        
+        # A set contained in another one only tries fewer shapes
+        candidates = [
+            combined for combined in candidates
+            if not any(other is not combined and set(combined) < set(other) for other in candidates)
+        ]
+        if not candidates:
+            return []
+        return candidates[self.attempt % len(candidates)]
+    
+    def assign_domains(self, shapes: list) -> list:
+        """
+        AD for each shape of a round: the one whose own limits have the most
+        room left for it, largest shapes first, each taking its room from its
+        AD. None leaves the choice to the client (a single AD, no per-AD
+        limits, or no AD with room).
+        """
+        if len(self.domain_room) < 2:
+            return [None] * len(shapes)
+        
+        room = {name: dict(domain) for name, domain in self.domain_room.items()}
+        assigned = [None] * len(shapes)
+        for index in sorted(range(len(shapes)), key=lambda i: shapes[i], reverse=True):
+            ocpus, memory_gb = shapes[index]
+            fitting = [name for name, left in room.items() if left["ocpus"] >= ocpus and left["memory_gb"] >= memory_gb]
+            if not fitting:
+                continue
+            name = max(fitting, key=lambda domain: (room[domain]["ocpus"], room[domain]["memory_gb"]))
+            room[name]["ocpus"] -= ocpus
+            room[name]["memory_gb"] -= memory_gb
+            assigned[index] = name
+        return assigned
+    
+    def run(self) -> bool:
+        """
+        Launch rounds of concurrent attempts until the quota is used up or stop() is called.
+        
+        Returns:
+            True if at least one instance was created
+        """
+        self._beat("quota")
+        self.refresh_remaining()
+        reclaimed = False  # a watched instance was reclaimed and its capacity is not back yet
+        
+        try:
+            while not self._stop_event.is_set():
+                shapes = self.round_shapes()
+                if not shapes:
+                    if not reclaimed:
+                        print(f"[{get_timestamp()}] ✅ Free A1 quota fully claimed "
+                              f"({self.state['claimed_ocpus']} OCPUs / {self.state['claimed_memory_gb']} GB)", flush=True)
+                    with self._lock:
+                        watching = bool(self._watching)
+                    if not watching and not reclaimed:
+                        break
+                    
+                    # Fill again once a watched instance is reclaimed; the limits
+                    # may count a terminating instance for a while, so re-read them
+                    # every retry interval until its capacity shows up
+                    self._beat("watching", watched=False)
+                    reclaimed = self._reclaimed.wait(self.config.retry_interval if reclaimed else None) or reclaimed
+                    self._reclaimed.clear()
+                    if not self._stop_event.is_set():
+                        self._beat("quota", cycle=True)
+                        self.refresh_remaining()
+                    continue
+                reclaimed = False
+                
+                self.attempt += 1
+                print(f"[{get_timestamp()}] Attempt #{self.attempt} - Trying shapes "
+                      f"{', '.join(f'{o}/{m}GB' for o, m in shapes)} "
+                      f"({self.remaining['ocpus']} OCPUs / {self.remaining['memory_gb']} GB left)...", flush=True)
+                
+                # One token of the shared rate limit per launch in the round
+                if self.limiter:
+                    self._beat("throttled", watched=False)
+                    if not all(self.limiter.wait(self._stop_event) for _ in shapes):
+                        break
+                
+                self._beat("round")
+                futures = [
+                    self._executor.submit(self._launch, ocpus, memory_gb, availability_domain)
+                    for (ocpus, memory_gb), availability_domain in zip(shapes, self.assign_domains(shapes))
+                ]
+                results = [future.result() for future in futures]
+                
+                if any(result["success"] for result in results):
+                    # Re-read the limits so concurrent successes are accounted for exactly
+                    self._beat("quota", cycle=True)
+                    self.refresh_remaining()
+                    continue
+                
+                self._beat("waiting", watched=False, cycle=True)
+                if self.control:
+                    # Wakes early on attempt-now, honours pause and picks up a retuned interval
+                    if self.control.wait(self._retry_interval, self._stop_event) == "stop":
+                        break
+                else:
+                    self._stop_event.wait(self._retry_interval())
+        finally:
+            self._executor.shutdown(wait=True)
+        
+        return bool(self.instances)
+    
+    def stop(self):
+        """Stop launching new rounds."""
+        self._stop_event.set()
+        self._reclaimed.set()
+        if self.control:
+            self.control.wake()
+    
+    def _retry_interval(self) -> float:
+        """Seconds to wait after a failed round (0 when the shared rate limit paces the rounds)."""
+        if self.limiter and self.limiter.rate_per_minute > 0:
+            return 0
+        return self.config.retry_interval
+    
+    def _beat(self, phase: str, watched: bool = True, cycle: bool = False):
+        """Report liveness to the watchdog, if any."""
+        if self.on_heartbeat:
+            self.on_heartbeat(phase, watched=watched, cycle=cycle)
+    
+    def _launch(self, ocpus: int, memory_gb: int, availability_domain: str = None) -> dict:
+        """Attempt one shape from the ladder (in the given AD, if any)."""
+        # Each round tries every shape once, so number + shape keeps names unique
+        display_name = f"{self.config.instance_name}-{len(self.instances) + 1}-{ocpus}ocpu"
+        try:
+            result = self.oci_client.create_instance(ocpus=ocpus, memory_gb=memory_gb, display_name=display_name,
+                                                     availability_domain=availability_domain)
+        except Exception as e:
+            print(f"[{get_timestamp()}] ❌ Exception in create_instance: {e}", flush=True)
+            print(traceback.format_exc(), flush=True)
+            result = {
+                "success": False,
+                "message": f"Exception: {e}",
+                "instance": None,
+                "is_capacity_error": False
+            }
+        
+        result["shape"] = f"{ocpus}/{memory_gb}GB"
+        if result["success"]:
+            self._record_success(result["instance"])
+        
+        # Outcomes are logged and notified by the engine's observers
+        if self.on_update:
+            self.on_update(self, result)
+        if result["success"] and self.config.reclaim_watch_enabled:
+            threading.Thread(target=self._watch, args=(result["instance"],), name="reclaim-watch", daemon=True).start()
+        return result
+    
+    def _record_success(self, instance: dict):
+        """Track a created instance."""
+        with self._lock:
+            self.instances.append(instance)
+            self.state["instances"].append(instance)
+            self.state["claimed_ocpus"] += instance["ocpus"]
+            self.state["claimed_memory_gb"] += instance["memory_gb"]
+            if self.config.reclaim_watch_enabled:
+                self._watching.add(instance["id"])  # watched once the success is published
+    
+    def _watch(self, instance: dict):
+        """Poll a created instance and resume the fill once it is reclaimed."""
+        started = time.monotonic()
+        if self.on_watch:
+            self.on_watch(self, instance)
+        
+        state = self.oci_client.wait_until_reclaimed(instance["id"], self._stop_event)
+        with self._lock:
+            self._watching.discard(instance["id"])
+            if state:
+                self.instances = [created for created in self.instances if created["id"] != instance["id"]]
+                self.state["instances"] = [created for created in self.state["instances"] if created["id"] != instance["id"]]
+                self.state["claimed_ocpus"] -= instance["ocpus"]
+                self.state["claimed_memory_gb"] -= instance["memory_gb"]
+        
+        if state and self.on_reclaimed:
+            self.on_reclaimed(self, instance, state, round(time.monotonic() - started))
+        self._reclaimed.set()
@@ -0,0 +1,314 @@
+"""
+Auto-discovery of image, subnet and availability domains.
+Looks up the values users would otherwise copy from the OCI console, caches
+them on disk with a TTL and refreshes them in the background.
+"""
+
+import json
+import os
+import threading
+import time
+import weakref
+from datetime import datetime
+
+import oci
+import oci.core
+import oci.identity
+from config import Config
+
+
+def get_timestamp() -> str:
+    """Get current timestamp for logging."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ResourceResolver:
+    """Discover and cache the launch resources for one account and region."""
+    
+    SHAPE = "VM.Standard.A1.Flex"
+    
+    # Config attributes the resolver may fill in
+    DISCOVERABLE_FIELDS = ["image_ocid", "subnet_ocid", "availability_domain"]
+    
+    # Serializes cache file access between resolvers in the same process
+    _cache_lock = threading.Lock()
+    
+    def __init__(self, config: Config):
+        self.config = config  # discovery inputs and credentials
+        self.cache_path = config.discovery_cache_path
+        self.ttl_seconds = config.discovery_ttl_hours * 3600
+        self.resources = None  # last applied discovery results
+        self._refresh_thread = None
+        self._stop_event = threading.Event()
+        
+        # Every config using the results -> the fields it left unset (only
+        # those are managed by the resolver); dropped with their engines
+        self.attached = weakref.WeakKeyDictionary()
+        self._attached_lock = threading.Lock()
+    
+    @property
+    def cache_key(self) -> str:
+        """Cache entry key; changes whenever the discovery inputs change."""
+        return "|".join([
+            self.config.oci_tenancy_ocid,
+            self.config.oci_region,
+            self.config.compartment_ocid,
+            self.config.image_os,
+            self.config.image_os_version or "",
+        ])
+    
+    def apply(self) -> dict:
+        """
+        Fill the config's unset fields from the cache or the OCI APIs.
+        
+        Returns:
+            dict with the discovered values
+        """
+        return self.attach(self.config, announce=True)
+    
+    def attach(self, config: Config, announce: bool = False) -> dict:
+        """
+        Fill the unset fields of a config with the same discovery inputs (e.g.
+        another pipeline's, or the copy of a watchdog-restarted engine) from
+        the known results, the cache or the OCI APIs. Fields the config sets
+        itself are left alone; background refreshes update every attached config.
+        
+        Returns:
+            dict with the discovered values ({} if the config sets them all)
+        """
+        with self._attached_lock:
+            fields = self.attached.get(config)
+            if fields is None:
+                fields = [field for field in self.DISCOVERABLE_FIELDS if not getattr(config, field)]
+                self.attached[config] = fields
+        if not fields:
+            return {}
+        
+        resources = self.resources
+        if resources is None:
+            resources = self._load_cached()
+            if resources is None:
+                resources = self.refresh()
+            else:
+                print(f"✅ Using cached discovery results for {self.config.oci_region} "
+                      f"(resolved {resources['resolved_at']})", flush=True)
+        
+        self._apply_resources(resources, announce)
+        return resources
+    
+    def refresh(self) -> dict:
+        """Discover fresh values through the OCI APIs and write them to the cache."""
+        started = time.monotonic()
+        oci_config = self.config.get_oci_config()
+        
+        availability_domains = self._discover_availability_domains(oci_config)
+        resources = {
+            "availability_domains": availability_domains,
+            "image_ocid": self._discover_image(oci_config),
+            "subnet_ocid": self._discover_subnet(oci_config, availability_domains),
+            "resolved_at": datetime.now().isoformat(timespec="seconds"),
+            "expires_at": time.time() + self.ttl_seconds,
+        }
+        
+        self._store_cached(resources)
+        print(f"✅ Discovered launch resources for {self.config.oci_region} "
+              f"in {time.monotonic() - started:.1f}s", flush=True)
+        return resources
+    
+    def start_background_refresh(self):
+        """Refresh the cached values in a daemon thread whenever they expire (once anything was discovered)."""
+        if not self.resources or self._refresh_thread:
+            return
+        
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop,
+            name=f"resolver-{self.config.oci_region}",
+            daemon=True
+        )
+        self._refresh_thread.start()
+    
+    def stop(self):
+        """Stop the background refresh thread."""
+        self._stop_event.set()
+    
+    def _refresh_loop(self):
+        """Sleep until the applied results expire, then refresh and re-apply them."""
+        while not self._stop_event.is_set():
+            # The in-memory expiry, so an unwritable cache file doesn't cause a refresh every minute
+            delay = self.resources["expires_at"] - time.time() if self.resources else 0
+            if self._stop_event.wait(max(delay, 60)):
+                return
+            
+            try:
+                resources = self.refresh()
+                self._apply_resources(resources)
+            except Exception as e:
+                print(f"[{get_timestamp()}] ⚠️ Background discovery refresh failed: {e}", flush=True)
+                self._stop_event.wait(300)
+    
+    def _apply_resources(self, resources: dict, announce: bool = True):
+        """Copy discovered values onto every attached config, leaving the fields each one sets alone."""
+        self.resources = resources
+        values = {
+            "image_ocid": resources["image_ocid"],
+            "subnet_ocid": resources["subnet_ocid"],
+            "availability_domain": resources["availability_domains"][0],
+        }
+        with self._attached_lock:
+            attached = list(self.attached.items())
+        
+        announced = set()
+        for config, fields in attached:
+            for field in fields:
+                if getattr(config, field) != values[field]:
+                    if announce and field not in announced:
+                        print(f"[{get_timestamp()}] 🔎 {field} for {self.config.oci_region}: {values[field]}", flush=True)
+                        announced.add(field)
+                    setattr(config, field, values[field])
+            
+            # Every discovered AD becomes a launch target, primary first
+            if "availability_domain" in fields:
+                config.set_availability_domains(resources["availability_domains"])
+    
+    def _discover_availability_domains(self, oci_config: dict) -> list:
+        """List availability domain names in the region."""
+        identity_client = oci.identity.IdentityClient(oci_config, timeout=self.config.oci_identity_timeout)
+        domains = identity_client.list_availability_domains(self.config.oci_tenancy_ocid).data
+        names = sorted(domain.name for domain in domains)
+        if not names:
+            raise ValueError(f"No availability domains found in {self.config.oci_region}")
+        return names
+    
+    def _discover_image(self, oci_config: dict) -> str:
+        """Find the newest platform image for the configured OS that supports the A1 shape."""
+        compute_client = oci.core.ComputeClient(oci_config, timeout=self.config.oci_compute_timeout)
+        
+        # Sorted server-side, so the first record of the first page is the newest
+        # image; no need to page through the whole catalogue.
+        kwargs = {
+            "operating_system": self.config.image_os,
+            "shape": self.SHAPE,
+            "lifecycle_state": "AVAILABLE",
+            "sort_by": "TIMECREATED",
+            "sort_order": "DESC",
+            "limit": 1,
+        }
+        if self.config.image_os_version:
+            kwargs["operating_system_version"] = self.config.image_os_version
+        
+        images = compute_client.list_images(self.config.compartment_ocid, **kwargs).data
+        if not images:
+            raise ValueError(
+                f"No {self.SHAPE} image found for {self.config.image_os} "
+                f"{self.config.image_os_version or ''}".strip()
+            )
+        return images[0].id
+    
+    def _discover_subnet(self, oci_config: dict, availability_domains: list) -> str:
+        """Find an available subnet that allows public IPs."""
+        network_client = oci.core.VirtualNetworkClient(oci_config, timeout=self.config.oci_network_timeout)
+        
+        # The generator fetches pages lazily, so we stop at the first usable subnet
+        subnets = oci.pagination.list_call_get_all_results_generator(
+            network_client.list_subnets,
+            "record",
+            self.config.compartment_ocid,
+            lifecycle_state="AVAILABLE"
+        )
+        for subnet in subnets:
+            if subnet.prohibit_public_ip_on_vnic:
+                continue
+            # Regional subnets have no AD; AD-specific ones must match a known AD
+            if subnet.availability_domain and subnet.availability_domain not in availability_domains:
+                continue
+            return subnet.id
+        
+        raise ValueError(
+            f"No public subnet found in compartment {self.config.compartment_ocid} "
+            f"({self.config.oci_region}). Create a VCN with a public subnet first."
+        )
+    
+    def _load_cached(self, allow_expired: bool = False) -> dict:
+        """Return the cache entry for this resolver, or None if missing or expired."""
+        with self._cache_lock:
+            try:
+                with open(self.cache_path, "r") as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                return None
+        
+        entry = cache.get(self.cache_key)
+        if not entry:
+            return None
+        if not allow_expired and entry.get("expires_at", 0) <= time.time():
+            return None
+        return entry
+    
+    def _store_cached(self, resources: dict):
+        """Write this resolver's entry to the cache file atomically."""
+        with self._cache_lock:
+            try:
+                with open(self.cache_path, "r") as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                cache = {}
+            
+            cache[self.cache_key] = resources
+            tmp_path = f"{self.cache_path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(cache, f, indent=2)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                print(f"⚠️ Could not write discovery cache {self.cache_path}: {e}", flush=True)
+
+
+# One resolver (and refresh thread) per account, region and discovery inputs
+# for the whole process, shared by watchdog-restarted engines
+_resolvers = {}
+_registry_lock = threading.Lock()
+
+
+def resolve_config(config: Config) -> ResourceResolver:
+    """
+    Apply auto-discovery to a config when OCI_AUTO_DISCOVER is enabled.
+    
+    The first call for an account and region discovers the resources and
+    starts the background refresh; later calls with the same discovery inputs
+    reuse its results for the fields their config leaves unset, and its
+    refreshes update every such config.
+    
+    Returns:
+        The running resolver, or None when auto-discovery is disabled
+    """
+    if not config.auto_discover:
+        return None
+    
+    key = ResourceResolver(config).cache_key
+    with _registry_lock:
+        resolver = _resolvers.get(key)
+    if resolver:
+        resolver.attach(config)
+        resolver.start_background_refresh()
+        return resolver
+    
+    resolver = ResourceResolver(config)
+    resolver.apply()
+    with _registry_lock:
+        # Another engine may have resolved the same key meanwhile
+        if key in _resolvers:
+            _resolvers[key].attach(config)
+            resolver = _resolvers[key]
+        else:
+            _resolvers[key] = resolver
+    resolver.start_background_refresh()
+    return resolver
+
+
+def stop_resolvers():
+    """Stop every background refresh (on shutdown)."""
+    with _registry_lock:
+        resolvers = list(_resolvers.values())
+        _resolvers.clear()
+    for resolver in resolvers:
+        resolver.stop()
@@ -0,0 +1,498 @@
+"""
+Offline retry strategy simulator.
+
+Replays a capacity trace - recorded from the launch journal (JOURNAL_PATH) or
+generated synthetically - through the retry loop on a virtual clock: the
+account pacing of the orchestrator (AccountGroup's backoff and RateLimiter) and
+the CircuitBreaker the app uses, one attempt per RETRY_INTERVAL_SECONDS. Reports time-to-claim, API calls and throttle events
+per strategy, so settings can be chosen from data instead of waiting days.
+
+Each run starts at a random point of the trace (wrapping around at its end)
+and lasts until an instance is claimed or the horizon is reached. Once the loop
+repeats itself inside a stretch of out-of-capacity answers, the remaining
+repetitions are skipped, so thousands of simulated days take seconds.
+
+Usage:
+    python simulator.py --journal launch_journal.ndjson
+    python simulator.py --synthetic --mean-gap-hours 36 --window-minutes 4
+    python simulator.py --synthetic --intervals 15,30,60,120 --rate-limit 3 --runs 2000
+"""
+
+import argparse
+import bisect
+import contextlib
+import json
+import os
+import random
+import statistics
+from collections import deque
+from datetime import datetime
+
+from breakers import CircuitBreaker, CircuitOpenError
+from fast_launch import LaunchRejected
+from orchestrator import AccountGroup
+
+
+class VirtualClock:
+    """Monotonic clock that only moves when the simulation advances it."""
+    
+    def __init__(self, now: float = 0.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+    
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class CapacityTrace:
+    """
+    What a launch request gets back over time, as contiguous segments.
+    
+    Times are seconds from the start of the trace; the trace repeats after
+    its duration.
+    """
+    
+    # Outcomes
+    SUCCESS = "success"      # capacity available; the launch succeeds
+    CAPACITY = "capacity"    # out of host capacity
+    THROTTLED = "throttled"  # 429 TooManyRequests
+    ERROR = "error"          # any other rejection
+    
+    # Journal gaps longer than this (between runs of the app) are closed up
+    MAX_GAP_SECONDS = 3600
+    
+    def __init__(self, name: str, segments: list):
+        """
+        Args:
+            name: Description for the report
+            segments: (start, end, outcome) tuples covering [0, duration)
+        """
+        self.name = name
+        self.segments = self._merge(segments)
+        self.starts = [segment[0] for segment in self.segments]
+        self.duration = self.segments[-1][1]
+        self.windows = sum(1 for segment in self.segments if segment[2] == self.SUCCESS)
+    
+    def at(self, t: float) -> tuple:
+        """
+        Outcome at time t.
+        
+        Returns:
+            (outcome, seconds until the outcome may change)
+        """
+        offset = t % self.duration
+        start, end, outcome = self.segments[bisect.bisect_right(self.starts, offset) - 1]
+        return outcome, end - offset
+    
+    @staticmethod
+    def _merge(segments: list) -> list:
+        """Join neighbouring segments with the same outcome."""
+        merged = []
+        for start, end, outcome in segments:
+            if merged and merged[-1][2] == outcome:
+                merged[-1] = (merged[-1][0], end, outcome)
+            else:
+                merged.append((start, end, outcome))
+        return merged
+    
+    @classmethod
+    def from_journal(cls, paths: list, target: str = None) -> "CapacityTrace":
+        """
+        Build a trace from the attempts recorded in launch journals.
+        
+        Each recorded answer is assumed to hold until halfway to the next
+        recorded attempt. Idle time between runs of the app is closed up.
+        
+        Args:
+            paths: NDJSON journal files
+            target: Only use attempts of this pipeline or shape (default: all)
+        """
+        observations = []
+        for path in paths:
+            with open(path, encoding="utf-8") as journal:
+                for line in journal:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    # A line cut short by a crash (or still being written) is skipped
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if not isinstance(event, dict) or event.get("type") != "attempt":
+                        continue
+                    if target is not None and event.get("target") != target:
+                        continue
+                    outcome = cls._classify(event)
+                    if not outcome:
+                        continue
+                    try:
+                        timestamp = datetime.fromisoformat(str(event.get("timestamp"))).timestamp()
+                    except ValueError:
+                        continue
+                    observations.append((timestamp, outcome))
+        
+        if not observations:
+            raise ValueError(f"No launch attempts found in {', '.join(paths)}")
+        observations.sort()
+        
+        # Spacing of the recorded attempts, used for the ends and for closed-up gaps
+        gaps = [b[0] - a[0] for a, b in zip(observations, observations[1:]) if b[0] > a[0]]
+        spacing = statistics.median(gaps) if gaps else 60.0
+        
+        times, shift = [], observations[0][0]
+        for index, (timestamp, _) in enumerate(observations):
+            if index and timestamp - observations[index - 1][0] > cls.MAX_GAP_SECONDS:
+                shift += timestamp - observations[index - 1][0] - spacing
+            times.append(timestamp - shift)
+        
+        segments = []
+        for index, (_, outcome) in enumerate(observations):
+            start = 0.0 if index == 0 else (times[index - 1] + times[index]) / 2
+            end = times[-1] + spacing / 2 if index == len(times) - 1 else (times[index] + times[index + 1]) / 2
+            if end > start:
+                segments.append((start, end, outcome))
+        
+        name = f"journal ({len(observations)} attempts over {times[-1] / 86400:.1f} days)"
+        return cls(name, segments)
+    
+    @classmethod
+    def _classify(cls, event: dict) -> str:
+        """Outcome of a journaled attempt; None if it never reached the API."""
+        message = str(event.get("message") or "")
+        if event.get("success"):
+            return cls.SUCCESS
+        if message.startswith("Circuit open"):
+            return None
+        if event.get("is_capacity_error"):
+            return cls.CAPACITY
+        if "TooManyRequests" in message or "429" in message:
+            return cls.THROTTLED
+        return cls.ERROR
+    
+    @classmethod
+    def synthetic(cls, days: float, mean_gap_hours: float, window_minutes: float, seed: int = None) -> "CapacityTrace":
+        """
+        Random capacity windows: exponentially distributed gaps between windows
+        and window lengths.
+        
+        Args:
+            days: Length of the trace
+            mean_gap_hours: Mean time without capacity between windows
+            window_minutes: Mean length of a capacity window
+            seed: Random seed for a reproducible trace
+        """
+        rng = random.Random(seed)
+        duration = days * 86400
+        segments, t = [], 0.0
+        while t < duration:
+            gap = rng.expovariate(1.0 / (mean_gap_hours * 3600))
+            window = rng.expovariate(1.0 / (window_minutes * 60))
+            segments.append((t, t + gap, cls.CAPACITY))
+            segments.append((t + gap, t + gap + window, cls.SUCCESS))
+            t += gap + window
+        
+        name = f"synthetic ({days:g} days, a {window_minutes:g} min window every {mean_gap_hours:g} h on average)"
+        return cls(name, segments)
+
+
+class Strategy:
+    """Retry settings under test, also the account config of the simulated AccountGroup."""
+    
+    account_name = "simulation"
+    coordination_url = None  # the rate limit is the account's own
+    
+    def __init__(self, retry_interval: float, rate_limit_per_minute: float = 0):
+        self.retry_interval = retry_interval
+        self.rate_limit_per_minute = rate_limit_per_minute
+    
+    @property
+    def name(self) -> str:
+        name = f"every {self.retry_interval:g}s"
+        if self.rate_limit_per_minute:
+            name += f", ≤{self.rate_limit_per_minute:g}/min"
+        return name
+
+
+class Simulator:
+    """Replay a capacity trace through the retry loop on a virtual clock."""
+    
+    def __init__(self, trace: CapacityTrace, latency: float = 1.0, throttle_limit: int = 0,
+                 breaker_threshold: int = 5, breaker_recovery: float = 60.0, horizon_days: float = 30.0,
+                 fast_forward: bool = True):
+        """
+        Args:
+            trace: Capacity trace to replay
+            latency: Seconds each launch request takes
+            throttle_limit: Accepted launch requests per rolling minute before
+                the API answers 429 (0 only replays throttling from the trace)
+            breaker_threshold: BREAKER_FAILURE_THRESHOLD
+            breaker_recovery: BREAKER_RECOVERY_SECONDS
+            horizon_days: Give up a run after this long
+            fast_forward: Skip repeating cycles inside out-of-capacity stretches
+        """
+        self.trace = trace
+        self.latency = latency
+        self.throttle_limit = throttle_limit
+        self.breaker_threshold = breaker_threshold
+        self.breaker_recovery = breaker_recovery
+        self.horizon = horizon_days * 86400
+        self.fast_forward = fast_forward
+    
+    def run(self, strategy: Strategy, start: float) -> dict:
+        """
+        Simulate one run of the retry loop from a point in the trace.
+        
+        Args:
+            strategy: Retry settings
+            start: Trace time the run starts at
+        
+        Returns:
+            dict with claimed, time_to_claim (seconds or None), calls,
+            capacity_errors, throttled, errors, breaker_opens, short_circuited
+        """
+        clock = VirtualClock(start)
+        breaker = CircuitBreaker("simulation", self.breaker_threshold, self.breaker_recovery, clock=clock)
+        account = AccountGroup(strategy, clock=clock)
+        accepted = deque()  # times of the requests the API accepted in the last minute
+        stats = {"calls": 0, "capacity_errors": 0, "throttled": 0, "errors": 0}
+        
+        def launch():
+            now = clock()
+            stats["calls"] += 1
+            if self.throttle_limit:
+                while accepted and accepted[0] <= now - 60:
+                    accepted.popleft()
+                if len(accepted) >= self.throttle_limit:
+                    raise LaunchRejected(429, "TooManyRequests", "Too many requests for the user")
+                accepted.append(now)
+            
+            outcome, _ = self.trace.at(now)
+            if outcome == CapacityTrace.SUCCESS:
+                return True
+            if outcome == CapacityTrace.CAPACITY:
+                raise LaunchRejected(500, "InternalError", "Out of host capacity.")
+            if outcome == CapacityTrace.THROTTLED:
+                raise LaunchRejected(429, "TooManyRequests", "Too many requests for the user")
+            raise LaunchRejected(400, "InvalidParameter", "Rejected")
+        
+        deadline = start + self.horizon
+        time_to_claim = None
+        # Loop states seen in the current out-of-capacity stretch: signature -> (time, counters)
+        seen, stretch_end = {}, None
+        
+        while clock() < deadline:
+            if self.fast_forward:
+                outcome, remaining = self.trace.at(clock())
+                if outcome != CapacityTrace.CAPACITY:
+                    seen, stretch_end = {}, None
+                else:
+                    if round(clock() + remaining, 3) != stretch_end:
+                        seen, stretch_end = {}, round(clock() + remaining, 3)
+                    signature = self._signature(clock, breaker, account, accepted)
+                    if signature in seen:
+                        self._skip_cycles(seen.pop(signature), min(stretch_end, deadline), clock, breaker, account, accepted, stats)
+                        seen = {}
+                    else:
+                        seen[signature] = (clock(), self._counters(breaker, stats))
+            
+            # Wait for the account's backoff and rate limit, like the orchestrator before each attempt
+            wait = account.reserve()
+            if wait > 0:
+                # At least a millisecond, so float rounding can't stall the clock
+                clock.advance(max(wait, 0.001))
+                continue
+            
+            try:
+                breaker.call(launch)
+                clock.advance(self.latency)
+                time_to_claim = clock() - start
+                break
+            except CircuitOpenError:
+                # Short-circuited: no request was sent, and the attempt counts as an error
+                account.record_attempt({"success": False, "is_capacity_error": False})
+            except LaunchRejected as e:
+                clock.advance(self.latency)
+                if e.status == 429:
+                    stats["throttled"] += 1
+                elif e.status == 500:
+                    stats["capacity_errors"] += 1
+                else:
+                    stats["errors"] += 1
+                account.record_attempt({"success": False, "is_capacity_error": e.status == 500})
+            
+            clock.advance(strategy.retry_interval)
+        
+        return dict(
+            stats,
+            claimed=time_to_claim is not None,
+            time_to_claim=time_to_claim,
+            breaker_opens=breaker.times_opened,
+            short_circuited=breaker.short_circuited,
+        )
+    
+    @staticmethod
+    def _signature(clock: VirtualClock, breaker: CircuitBreaker, account: AccountGroup, accepted: deque) -> tuple:
+        """Everything the next steps depend on, relative to the current time."""
+        now = clock()
+        limiter = account.limiter
+        return (
+            breaker.state,
+            breaker.consecutive_failures,
+            round(now - breaker.opened_at, 6) if breaker.state != CircuitBreaker.CLOSED else None,
+            (round(limiter.tokens, 6), round(now - limiter.updated, 6)) if limiter.rate_per_minute > 0 else None,
+            # Past the largest backoff, further failures don't change the pacing
+            min(account.consecutive_failures, AccountGroup.FAILURE_THRESHOLD + 16),
+            round(max(account.backoff_until - now, 0), 6),
+            tuple(round(now - call, 6) for call in accepted if call > now - 60),
+        )
+    
+    @staticmethod
+    def _counters(breaker: CircuitBreaker, stats: dict) -> dict:
+        """Counters that grow by the same amount in every repetition of a cycle."""
+        return dict(stats, times_opened=breaker.times_opened, short_circuited=breaker.short_circuited)
+    
+    def _skip_cycles(self, previous: tuple, end: float, clock: VirtualClock, breaker: CircuitBreaker,
+                     account: AccountGroup, accepted: deque, stats: dict):
+        """
+        The loop is back in a state it was in earlier in the same
+        out-of-capacity stretch, so it repeats until the stretch ends: jump
+        over whole repetitions that finish before end, leaving the loop in
+        the state stepping through them would.
+        """
+        then, counters = previous
+        cycle = clock() - then
+        if cycle <= 0:
+            return
+        repeats = int((end - clock()) // cycle) - 1
+        if repeats < 1:
+            return
+        
+        jump = repeats * cycle
+        clock.advance(jump)
+        for call in range(len(accepted)):
+            accepted[call] += jump
+        account.limiter.updated += jump
+        if account.backoff_until > 0:
+            account.backoff_until += jump
+        breaker.opened_at += jump
+        
+        current = self._counters(breaker, stats)
+        for key in stats:
+            stats[key] += repeats * (current[key] - counters[key])
+        breaker.times_opened += repeats * (current["times_opened"] - counters["times_opened"])
+        breaker.short_circuited += repeats * (current["short_circuited"] - counters["short_circuited"])
+    
+    def evaluate(self, strategy: Strategy, runs: int, seed: int = None) -> dict:
+        """
+        Simulate runs starting at random points of the trace.
+        
+        Returns:
+            dict with the strategy, claim rate, time-to-claim percentiles
+            (hours) and mean API calls, throttle events and breaker opens per run
+        """
+        rng = random.Random(seed)
+        results = [self.run(strategy, rng.uniform(0, self.trace.duration)) for _ in range(runs)]
+        
+        claim_hours = sorted(result["time_to_claim"] / 3600 for result in results if result["claimed"])
+        
+        def percentile(values: list, p: float):
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))], 2)
+        
+        def mean(key: str) -> float:
+            return round(sum(result[key] for result in results) / runs, 1)
+        
+        return {
+            "strategy": strategy.name,
+            "retry_interval": strategy.retry_interval,
+            "rate_limit_per_minute": strategy.rate_limit_per_minute,
+            "runs": runs,
+            "simulated_days": round(sum(
+                result["time_to_claim"] if result["claimed"] else self.horizon for result in results
+            ) / 86400, 1),
+            "claim_rate": round(len(claim_hours) / runs, 3),
+            "time_to_claim_p50_hours": percentile(claim_hours, 50),
+            "time_to_claim_p90_hours": percentile(claim_hours, 90),
+            "calls_per_run": mean("calls"),
+            "throttled_per_run": mean("throttled"),
+            "breaker_opens_per_run": mean("breaker_opens"),
+        }
+
+
+def print_report(trace: CapacityTrace, summaries: list, elapsed: float):
+    """Print the comparison table."""
+    print(f"\n📈 Strategy comparison over {trace.name}, {trace.windows} capacity windows\n")
+    print(f"   {'Strategy':<22}{'Claimed':>9}{'p50 claim':>12}{'p90 claim':>12}{'API calls':>12}{'Throttled':>11}{'Breaker':>9}")
+    for summary in summaries:
+        p50 = summary["time_to_claim_p50_hours"]
+        p90 = summary["time_to_claim_p90_hours"]
+        print(
+            f"   {summary['strategy']:<22}"
+            f"{summary['claim_rate'] * 100:>8.0f}%"
+            f"{(f'{p50:.1f} h' if p50 is not None else '-'):>12}"
+            f"{(f'{p90:.1f} h' if p90 is not None else '-'):>12}"
+            f"{summary['calls_per_run']:>12.0f}"
+            f"{summary['throttled_per_run']:>11.1f}"
+            f"{summary['breaker_opens_per_run']:>9.1f}"
+        )
+    
+    simulated_days = sum(summary["simulated_days"] for summary in summaries)
+    print("\n   Per run: API calls, throttle events and breaker opens until the claim or the horizon")
+    print(f"   Simulated {simulated_days:,.0f} days in {elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay capacity traces through retry strategies")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--journal", nargs="+", metavar="PATH", help="Launch journal(s) to replay (JOURNAL_PATH)")
+    source.add_argument("--synthetic", action="store_true", help="Generate a random capacity trace")
+    parser.add_argument("--target", default=None, help="Only replay attempts of this pipeline or shape")
+    parser.add_argument("--days", type=float, default=365, help="Synthetic trace length in days (default: 365)")
+    parser.add_argument("--mean-gap-hours", type=float, default=24, help="Synthetic mean time between capacity windows (default: 24)")
+    parser.add_argument("--window-minutes", type=float, default=5, help="Synthetic mean capacity window length (default: 5)")
+    parser.add_argument("--intervals", default="15,30,60,120,300", help="Retry intervals to compare, in seconds (default: 15,30,60,120,300)")
+    parser.add_argument("--rate-limit", type=float, default=0, help="ACCOUNT_RATE_LIMIT_PER_MINUTE for every strategy (default: 0)")
+    parser.add_argument("--throttle-limit", type=int, default=0,
+                        help="Assumed API limit of launch requests per minute before 429s (default: 0, only replay recorded 429s)")
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds per launch request (default: 1)")
+    parser.add_argument("--breaker-threshold", type=int, default=5, help="BREAKER_FAILURE_THRESHOLD (default: 5)")
+    parser.add_argument("--breaker-recovery", type=float, default=60, help="BREAKER_RECOVERY_SECONDS (default: 60)")
+    parser.add_argument("--horizon-days", type=float, default=30, help="Give up a run after this many days (default: 30)")
+    parser.add_argument("--runs", type=int, default=1000, help="Runs per strategy (default: 1000)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible results")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+    
+    if args.journal:
+        trace = CapacityTrace.from_journal(args.journal, target=args.target)
+    else:
+        trace = CapacityTrace.synthetic(args.days, args.mean_gap_hours, args.window_minutes, seed=args.seed)
+    
+    simulator = Simulator(
+        trace,
+        latency=args.latency,
+        throttle_limit=args.throttle_limit,
+        breaker_threshold=args.breaker_threshold,
+        breaker_recovery=args.breaker_recovery,
+        horizon_days=args.horizon_days,
+    )
+    strategies = [Strategy(float(interval), args.rate_limit) for interval in args.intervals.split(",") if interval.strip()]
+    
+    started = datetime.now()
+    # The breakers log every open and close; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        summaries = [simulator.evaluate(strategy, args.runs, seed=args.seed) for strategy in strategies]
+    elapsed = (datetime.now() - started).total_seconds()
+    
+    if args.json:
+        print(json.dumps({"trace": trace.name, "strategies": summaries}, indent=2))
+    else:
+        print_report(trace, summaries, elapsed)
+
+
+if __name__ == "__main__":
+    main()
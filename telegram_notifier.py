@@ -1,24 +1,33 @@
 """
-Telegram notification module for sending alerts.
-Uses simple HTTP requests to Telegram Bot API.
+Telegram notification channel.
+Uses simple HTTP requests to Telegram Bot API; notifications.py fans messages
+out to it and the other configured channels.
 """
 
 import requests
+from breakers import CircuitOpenError, get_breaker
 from config import Config
 
 
 class TelegramNotifier:
     """Send notifications via Telegram Bot API."""
     
-    API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+    name = "telegram"
+    API_PATH = "/bot{token}/sendMessage"
     
     def __init__(self, config: Config = None):
         if config is None:
             config = Config()
         self.bot_token = config.telegram_bot_token
         self.chat_id = config.telegram_chat_id
+        self.api_url = config.telegram_api_url.rstrip("/")
+        self.timeout = config.telegram_timeout
+        # One breaker per bot and chat, so a revoked token only stops its own
+        # account; the name shows the bot id, never the token's secret part
+        self.breaker = get_breaker(f"telegram/{(self.bot_token or '').split(':')[0]}/{self.chat_id}", config)
+        self.destination = (self.api_url, self.bot_token, self.chat_id)
     
-    def send_message(self, message: str, parse_mode: str = "HTML") -> bool:
+    def deliver(self, message: str, parse_mode: str = "HTML"):
         """
         Send a message via Telegram.
         
@@ -26,84 +35,50 @@ class TelegramNotifier:
             message: The message text to send
             parse_mode: Message format (HTML or Markdown)
         
-        Returns:
-            True if message sent successfully, False otherwise
-        """
-        try:
-            url = self.API_URL.format(token=self.bot_token)
-            payload = {
-                "chat_id": self.chat_id,
-                "text": message,
-                "parse_mode": parse_mode
-            }
-            
-            response = requests.post(url, json=payload, timeout=30)
-            
-            if response.status_code == 200:
-                print("✅ Telegram notification sent successfully")
-                return True
-            else:
-                print(f"❌ Telegram API error: {response.status_code} - {response.text}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Failed to send Telegram notification: {e}")
-            return False
-    
-    def send_success_message(self, instance_details: dict) -> bool:
-        """
-        Send a success notification with instance details.
-        
-        Args:
-            instance_details: Dictionary containing instance information
+        Raises:
+            CircuitOpenError, requests.exceptions.RequestException: if the
+            message was not delivered
         """
-        message = f"""
-🎉 <b>Oracle Cloud Instance Created Successfully!</b>
-
-<b>Instance Details:</b>
-• <b>Name:</b> {instance_details.get('name', 'N/A')}
-• <b>Shape:</b> {instance_details.get('shape', 'N/A')}
-• <b>Region:</b> {instance_details.get('region', 'N/A')}
-• <b>Availability Domain:</b> {instance_details.get('availability_domain', 'N/A')}
-• <b>Public IP:</b> {instance_details.get('public_ip', 'Not yet assigned')}
-• <b>State:</b> {instance_details.get('lifecycle_state', 'N/A')}
-
-<b>Instance ID:</b>
-<code>{instance_details.get('id', 'N/A')}</code>
-
-🚀 Your free ARM instance is now running!
-        """.strip()
+        url = self.api_url + self.API_PATH.format(token=self.bot_token)
+        payload = {
+            "chat_id": self.chat_id,
+            "text": message,
+            "parse_mode": parse_mode
+        }
         
-        return self.send_message(message)
+        response = self.breaker.call(self._post, url, payload)
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(f"Telegram API error: {response.status_code} - {response.text}",
+                                                response=response)
     
-    def send_error_message(self, error_message: str) -> bool:
+    def send_message(self, message: str, parse_mode: str = "HTML") -> bool:
         """
-        Send an error notification (for critical errors only).
+        Send a message via Telegram only (e.g. to test the configuration).
         
         Args:
-            error_message: The error description
-        """
-        message = f"""
-⚠️ <b>Oracle Cloud Auto-Register Error</b>
-
-<b>Error:</b> {error_message}
-
-The script will continue retrying...
-        """.strip()
+            message: The message text to send
+            parse_mode: Message format (HTML or Markdown)
         
-        return self.send_message(message)
+        Returns:
+            True if message sent successfully, False otherwise
+        """
+        try:
+            self.deliver(message, parse_mode)
+            print("✅ Telegram notification sent successfully")
+            return True
+        except CircuitOpenError as e:
+            print(f"❌ Telegram notification skipped: {e}")
+            return False
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Failed to send Telegram notification: {e}")
+            return False
     
-    def send_startup_message(self) -> bool:
-        """Send a notification that the script has started."""
-        message = """
-🚀 <b>Oracle Cloud Auto-Register Started</b>
-
-The script is now running and will attempt to create your VM.Standard.A1.Flex instance.
-
-You will be notified when the instance is created successfully!
-        """.strip()
-        
-        return self.send_message(message)
+    def _post(self, url: str, payload: dict) -> requests.Response:
+        """POST to the Bot API, raising on server-side failures so the breaker counts them."""
+        response = requests.post(url, json=payload, timeout=self.timeout)
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+        return response
 
 
 if __name__ == "__main__":
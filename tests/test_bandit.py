@@ -0,0 +1,124 @@
+"""TargetBandit statistics, decay and the handoff export/restore."""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import bandit
+from bandit import TargetArm, TargetBandit
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty bandit registry for the test."""
+    monkeypatch.setattr(bandit, "_bandits", {})
+    return bandit._bandits
+
+
+def test_decay_halves_evidence_per_half_life():
+    arm = TargetArm("AD-1", "4/24GB")
+    arm.successes, arm.failures, arm.updated = 8.0, 4.0, 0.0
+    
+    arm.decay(60.0, 60.0)
+    assert arm.successes == pytest.approx(4.0)
+    assert arm.failures == pytest.approx(2.0)
+    assert arm.updated == 60.0
+    
+    arm.decay(180.0, 60.0)
+    assert arm.successes == pytest.approx(1.0)
+    assert arm.failures == pytest.approx(0.5)
+
+
+def test_decay_moves_mean_towards_prior():
+    arm = TargetArm("AD-1", "4/24GB")
+    arm.failures, arm.updated = 20.0, 0.0
+    before = arm.mean
+    arm.decay(3600.0, 60.0)
+    assert before < arm.mean < 0.5 + 1e-6
+
+
+def test_record_outcomes():
+    target = TargetBandit("test", half_life_minutes=30)
+    target.record("AD-1", "4/24GB", TargetBandit.SUCCESS, latency=1.0)
+    target.record("AD-2", "4/24GB", TargetBandit.MISS, latency=3.0)
+    target.record("AD-2", "4/24GB", TargetBandit.ERROR)
+    
+    won, missed = target.arms[("AD-1", "4/24GB")], target.arms[("AD-2", "4/24GB")]
+    assert (won.attempts, won.wins, won.latency) == (1, 1, 1.0)
+    assert won.successes == pytest.approx(1.0, abs=1e-3)
+    assert (missed.attempts, missed.errors) == (2, 1)
+    assert missed.failures == pytest.approx(1.0, abs=1e-3)
+    # Errors say nothing about capacity
+    assert missed.successes == 0
+    assert missed.latency == pytest.approx(3.0)
+
+
+def test_success_credits_other_shapes_of_the_ad():
+    target = TargetBandit("test", half_life_minutes=30)
+    target.record("AD-1", "1/6GB", TargetBandit.MISS)
+    target.record("AD-1", "4/24GB", TargetBandit.SUCCESS)
+    
+    near = target.arms[("AD-1", "1/6GB")]
+    assert near.near_misses == 1
+    assert near.successes == pytest.approx(TargetBandit.NEAR_MISS_REWARD, abs=1e-3)
+
+
+def test_choose_prefers_target_with_capacity():
+    target = TargetBandit("test", half_life_minutes=30)
+    for _ in range(30):
+        target.record("AD-1", "4/24GB", TargetBandit.MISS)
+        target.record("AD-2", "4/24GB", TargetBandit.SUCCESS)
+    
+    picks = [target.choose(["AD-1", "AD-2"], "4/24GB") for _ in range(50)]
+    assert picks.count("AD-2") > 45
+    
+    weights = target.weights()
+    assert weights[("AD-2", "4/24GB")] > weights[("AD-1", "4/24GB")]
+
+
+def test_export_restore_round_trip():
+    source = TargetBandit("test", half_life_minutes=30)
+    source.record("AD-1", "4/24GB", TargetBandit.SUCCESS, latency=2.0)
+    source.record("AD-2", "4/24GB", TargetBandit.MISS)
+    source.record("AD-2", "4/24GB", TargetBandit.ERROR)
+    
+    restored = TargetBandit("test", half_life_minutes=30)
+    restored.restore(source.export())
+    
+    assert set(restored.arms) == set(source.arms)
+    for key, arm in source.arms.items():
+        copy = restored.arms[key]
+        assert copy.successes == pytest.approx(arm.successes)
+        assert copy.failures == pytest.approx(arm.failures)
+        assert (copy.attempts, copy.wins, copy.near_misses, copy.errors) == \
+            (arm.attempts, arm.wins, arm.near_misses, arm.errors)
+        assert copy.latency == arm.latency
+
+
+def test_restore_keeps_evidence_age():
+    saved = {
+        "availability_domain": "AD-1", "shape": "4/24GB", "successes": 4.0, "failures": 2.0,
+        "age": 60.0, "attempts": 6, "wins": 4, "near_misses": 0, "errors": 0, "latency": None,
+    }
+    restored = TargetBandit("test", half_life_minutes=1)
+    restored.restore([saved])
+    
+    # Saved one half-life before the handover, so it decays as if never interrupted
+    arm = restored.arms[("AD-1", "4/24GB")]
+    arm.decay(time.monotonic(), restored.half_life)
+    assert arm.successes == pytest.approx(2.0, rel=1e-2)
+    assert arm.failures == pytest.approx(1.0, rel=1e-2)
+
+
+def test_export_import_bandits_through_registry(registry):
+    config = SimpleNamespace(bandit_half_life_minutes=30)
+    bandit.get_bandit("default/eu-1", config).record("AD-1", "4/24GB", TargetBandit.SUCCESS)
+    state = bandit.export_bandits()
+    assert list(state) == ["default/eu-1"]
+    
+    registry.clear()
+    bandit.import_bandits(state, config)
+    arm = bandit.get_bandit("default/eu-1", config).arms[("AD-1", "4/24GB")]
+    assert arm.wins == 1
+    assert "default/eu-1" in bandit.bandit_states()
@@ -0,0 +1,148 @@
+"""CircuitBreaker state changes and the transient-error classification."""
+
+import oci
+import pytest
+import requests
+
+from breakers import CircuitBreaker, CircuitOpenError, is_transient_error
+from fast_launch import LaunchRejected
+
+
+def service_error(status: int, message: str = "error", code: str = "Error") -> oci.exceptions.ServiceError:
+    return oci.exceptions.ServiceError(status, code, {}, message)
+
+
+def http_error(status: int) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(response=response)
+
+
+@pytest.mark.parametrize("error", [
+    service_error(429, code="TooManyRequests"),
+    service_error(500, "Internal server error"),
+    service_error(503, "Service unavailable"),
+    LaunchRejected(429, "TooManyRequests", "Too many requests for the user"),
+    LaunchRejected(502, "BadGateway", "Bad gateway"),
+    http_error(429),
+    http_error(503),
+    ConnectionError("reset"),
+    TimeoutError("timed out"),
+    requests.exceptions.ConnectTimeout("timed out"),
+    requests.exceptions.ConnectionError("refused"),
+])
+def test_transient_errors(error):
+    assert is_transient_error(error)
+
+
+@pytest.mark.parametrize("error", [
+    service_error(500, "Out of host capacity.", code="InternalError"),
+    LaunchRejected(500, "InternalError", "Out of host capacity."),
+    service_error(400, "Invalid parameter"),
+    service_error(404, "Not found"),
+    LaunchRejected(401, "NotAuthenticated", "Bad signature"),
+    http_error(400),
+    ValueError("bad value"),
+])
+def test_non_transient_errors(error):
+    assert not is_transient_error(error)
+
+
+def fail(error: Exception):
+    raise error
+
+
+def trip(breaker: CircuitBreaker):
+    """Fail calls until the breaker opens."""
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail, ConnectionError("down"))
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=60, clock=clock)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail, ConnectionError("down"))
+    assert breaker.state == CircuitBreaker.CLOSED
+    
+    with pytest.raises(ConnectionError):
+        breaker.call(fail, ConnectionError("down"))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 1
+    assert breaker.last_error == "down"
+
+
+def test_open_breaker_short_circuits(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60, clock=clock)
+    trip(breaker)
+    
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(calls.append, 1)
+    assert calls == []
+    assert breaker.short_circuited == 1
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60, clock=clock)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail, ConnectionError("down"))
+    assert breaker.call(lambda: "ok") == "ok"
+    with pytest.raises(ConnectionError):
+        breaker.call(fail, ConnectionError("down"))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_non_transient_error_counts_as_healthy(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=60, clock=clock)
+    for _ in range(3):
+        with pytest.raises(LaunchRejected):
+            breaker.call(fail, LaunchRejected(500, "InternalError", "Out of host capacity."))
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_half_open_probe_closes_on_success(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60, clock=clock)
+    trip(breaker)
+    
+    clock.advance(59)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+    
+    clock.advance(1)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_half_open_probe_reopens_on_failure(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60, clock=clock)
+    trip(breaker)
+    
+    clock.advance(60)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail, ConnectionError("still down"))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened_at == clock()
+    assert breaker.times_opened == 2
+    
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60, clock=clock)
+    trip(breaker)
+    clock.advance(60)
+    
+    def probe():
+        # A second call while the probe is in flight is short-circuited
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "second")
+        return "probe"
+    
+    assert breaker.call(probe) == "probe"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.short_circuited == 1
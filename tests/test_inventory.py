@@ -0,0 +1,165 @@
+"""Inventory refreshes: full syncs, incremental merges and VNIC lookups."""
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from breakers import CircuitBreaker
+from inventory import A1_SHAPE, Inventory
+
+
+def page_of(items: list, limit: int, page: str) -> SimpleNamespace:
+    """One page of a list call, shaped like an oci Response."""
+    start = int(page or 0)
+    next_page = str(start + limit) if start + limit < len(items) else None
+    return SimpleNamespace(data=items[start:start + limit], has_next_page=next_page is not None,
+                           next_page=next_page, headers={}, status=200, request=None)
+
+
+class FakeCompartment:
+    """Compute and network clients serving an in-memory compartment."""
+    
+    def __init__(self):
+        self.instances = {}
+        self.calls = Counter()
+    
+    def add(self, number: int, state: str = "RUNNING", name: str = None, shape: str = A1_SHAPE):
+        self.instances[f"ocid.i{number}"] = SimpleNamespace(
+            id=f"ocid.i{number}", display_name=name or f"vm{number}", shape=shape,
+            shape_config=SimpleNamespace(ocpus=1.0, memory_in_gbs=6.0), lifecycle_state=state,
+            availability_domain="AD-1", fault_domain="FAULT-DOMAIN-1",
+            time_created=datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=number))
+    
+    def set_state(self, instance_id: str, state: str):
+        """Change an instance's state the way OCI does: later listings return a new model."""
+        self.instances[instance_id] = SimpleNamespace(**{**vars(self.instances[instance_id]), "lifecycle_state": state})
+    
+    def list_instances(self, compartment_id, sort_by=None, sort_order=None, limit=None, page=None):
+        self.calls["list_instances"] += 1
+        assert (sort_by, sort_order) == ("TIMECREATED", "DESC")
+        newest_first = sorted(self.instances.values(), key=lambda instance: instance.time_created, reverse=True)
+        return page_of(newest_first, limit, page)
+    
+    def list_vnic_attachments(self, compartment_id, limit=None, page=None):
+        self.calls["list_vnic_attachments"] += 1
+        attachments = [
+            SimpleNamespace(instance_id=instance.id, vnic_id=f"vnic-{instance.id}", lifecycle_state="ATTACHED")
+            for instance in self.instances.values()
+            if instance.lifecycle_state not in ("PROVISIONING", "TERMINATED")
+        ]
+        return page_of(attachments, limit, page)
+    
+    def get_vnic(self, vnic_id):
+        self.calls["get_vnic"] += 1
+        return SimpleNamespace(data=SimpleNamespace(is_primary=True, private_ip="10.0.0.2",
+                                                    public_ip=f"203.0.113.{len(vnic_id)}", subnet_id="ocid.subnet"))
+    
+    def delta(self, before: Counter) -> dict:
+        return {call: self.calls[call] - before[call] for call in self.calls}
+
+
+@pytest.fixture
+def compartment():
+    compartment = FakeCompartment()
+    for number in range(250):
+        compartment.add(number, name="dup" if number < 2 else None,
+                        shape=A1_SHAPE if number < 3 else "VM.Standard.E2.1.Micro")
+    return compartment
+
+
+@pytest.fixture
+def inventory(compartment):
+    config = SimpleNamespace(compartment_ocid="ocid.compartment", account_name="default",
+                             oci_region="eu-frankfurt-1", inventory_refresh_seconds=60)
+    client = SimpleNamespace(config=config, compute_client=compartment, virtual_network_client=compartment,
+                             compute_breaker=CircuitBreaker("compute", 5, 60),
+                             network_breaker=CircuitBreaker("network", 5, 60))
+    return Inventory(client, config.inventory_refresh_seconds)
+
+
+def states(inventory: Inventory) -> dict:
+    return {instance["id"]: instance["state"] for instance in inventory.to_dict(True)["items"]}
+
+
+def test_first_refresh_lists_every_page(inventory, compartment):
+    assert inventory.refresh() == 250
+    assert compartment.calls["list_instances"] == 3
+    assert compartment.calls["get_vnic"] == 250
+    
+    items = inventory.to_dict(True)["items"]
+    assert len(items) == 250
+    assert items[0]["id"] == "ocid.i249"
+    assert items[0]["public_ip"].startswith("203.0.113.")
+
+
+def test_steady_refresh_costs_one_list_call(inventory, compartment):
+    inventory.refresh()
+    before = Counter(compartment.calls)
+    
+    assert inventory.refresh() == 0
+    assert compartment.delta(before) == {"list_instances": 1, "list_vnic_attachments": 0, "get_vnic": 0}
+    assert len(states(inventory)) == 250
+
+
+def test_new_instance_is_merged_with_cached_tail(inventory, compartment):
+    inventory.refresh()
+    compartment.add(300, state="PROVISIONING", name="new")
+    before = Counter(compartment.calls)
+    
+    inventory.refresh()
+    assert compartment.delta(before)["list_instances"] == 1
+    assert compartment.delta(before)["get_vnic"] == 0
+    listed = states(inventory)
+    assert len(listed) == 251
+    assert listed["ocid.i300"] == "PROVISIONING"
+    assert "ocid.i0" in listed
+    
+    # Provisioned: its VNIC is looked up now, the others are left alone
+    compartment.set_state("ocid.i300", "RUNNING")
+    before = Counter(compartment.calls)
+    assert inventory.refresh() == 1
+    assert compartment.delta(before)["get_vnic"] == 1
+    new = next(item for item in inventory.to_dict(True)["items"] if item["id"] == "ocid.i300")
+    assert new["state"] == "RUNNING" and new["private_ip"] == "10.0.0.2"
+
+
+def test_state_change_on_first_page_is_looked_up(inventory, compartment):
+    inventory.refresh()
+    compartment.set_state("ocid.i240", "TERMINATED")
+    
+    assert inventory.refresh() == 1
+    assert states(inventory)["ocid.i240"] == "TERMINATED"
+    assert inventory.to_dict()["instances"] == 249
+
+
+def test_full_sync_catches_the_tail_and_drops_vanished(inventory, compartment):
+    inventory.refresh()
+    compartment.set_state("ocid.i7", "TERMINATED")
+    del compartment.instances["ocid.i8"]
+    
+    inventory.refresh()
+    assert states(inventory)["ocid.i7"] == "RUNNING"
+    
+    inventory.refresh_soon(full_sync=True)
+    before = Counter(compartment.calls)
+    inventory.refresh()
+    assert compartment.delta(before)["list_instances"] == 3
+    listed = states(inventory)
+    assert listed["ocid.i7"] == "TERMINATED"
+    assert "ocid.i8" not in listed
+    assert len(listed) == 249
+
+
+def test_to_dict_summary(inventory):
+    inventory.refresh()
+    summary = inventory.to_dict()
+    assert summary["account"] == "default"
+    assert summary["instances"] == 250
+    assert summary["by_state"] == {"RUNNING": 250}
+    assert summary["a1_instances"] == 3
+    assert summary["a1_ocpus"] == 3.0
+    assert summary["a1_memory_gb"] == 18.0
+    assert summary["duplicates"] == ["dup"]
+    assert "items" not in summary
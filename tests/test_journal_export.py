@@ -0,0 +1,113 @@
+"""Journal export: time bounds, filtering and NDJSON/CSV/gzip chunking."""
+
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import journal_export
+from journal_export import COLUMNS, csv_chunks, export_chunks, iter_events, ndjson_chunks, parse_time
+
+
+def event(minute: int, event_type: str = "attempt", **fields) -> dict:
+    timestamp = datetime(2026, 1, 31, 12, minute).isoformat(timespec="milliseconds")
+    return {"timestamp": timestamp, "type": event_type, "target": "A1.Flex", **fields}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    path = tmp_path / "journal.ndjson"
+    with open(path, "w", encoding="utf-8") as lines:
+        for minute in range(6):
+            lines.write(json.dumps(event(minute, attempt=minute + 1, success=False)) + "\n")
+        lines.write(json.dumps(event(6, "success", instance_id="ocid1.instance")) + "\n")
+        lines.write('{"timestamp": "2026-01-31T12:07:00.000", "type": "attempt", "tar')
+    return str(path)
+
+
+def test_parse_time_iso_date():
+    assert parse_time("2026-01-31") == datetime(2026, 1, 31)
+    assert parse_time(" 2026-01-31T12:30:00 ") == datetime(2026, 1, 31, 12, 30)
+
+
+def test_parse_time_relative_age():
+    before = datetime.now()
+    parsed = parse_time("30m")
+    assert before - timedelta(minutes=30, seconds=5) <= parsed <= datetime.now() - timedelta(minutes=30)
+    assert abs(parse_time("1.5h") - (datetime.now() - timedelta(hours=1.5))) < timedelta(seconds=5)
+
+
+def test_parse_time_converts_aware_values_to_local():
+    aware = datetime(2026, 1, 31, 12, 0, tzinfo=timezone.utc)
+    parsed = parse_time(aware.isoformat())
+    assert parsed.tzinfo is None
+    assert parsed == aware.astimezone().replace(tzinfo=None)
+
+
+@pytest.mark.parametrize("value", ["", "yesterday", "7w", "-5m", "2026-13-01"])
+def test_parse_time_rejects_garbage(value):
+    with pytest.raises(ValueError):
+        parse_time(value)
+
+
+def test_iter_events_filters_type_and_range(journal):
+    assert len(list(iter_events([journal]))) == 6
+    assert len(list(iter_events([journal], event_type=None))) == 7
+    assert [found["type"] for found in iter_events([journal], event_type="success")] == ["success"]
+    
+    bounded = list(iter_events([journal], since=datetime(2026, 1, 31, 12, 2), until=datetime(2026, 1, 31, 12, 4)))
+    assert [found["attempt"] for found in bounded] == [3, 4]
+
+
+def test_ndjson_chunks_split_on_chunk_size(monkeypatch):
+    events = [event(minute, message="x" * 40) for minute in range(10)]
+    line_size = len(json.dumps(events[0]) + "\n")
+    monkeypatch.setattr(journal_export, "CHUNK_SIZE", line_size * 3)
+    
+    chunks = list(ndjson_chunks(iter(events)))
+    assert [chunk.count("\n") for chunk in chunks] == [3, 3, 3, 1]
+    assert [json.loads(line) for line in "".join(chunks).splitlines()] == events
+
+
+def test_ndjson_chunks_empty():
+    assert list(ndjson_chunks(iter([]))) == []
+
+
+def test_csv_chunks_header_columns_and_details(monkeypatch):
+    monkeypatch.setattr(journal_export, "CHUNK_SIZE", 200)
+    events = [event(minute, attempt=minute, success=False, message="Out of capacity",
+                    error={"status": 500}, shape_config={"ocpus": 4}) for minute in range(8)]
+    
+    chunks = list(csv_chunks(iter(events)))
+    assert len(chunks) > 1
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert list(rows[0]) == COLUMNS + ["details"]
+    assert len(rows) == 8
+    assert rows[3]["attempt"] == "3"
+    assert rows[3]["account"] == ""
+    assert json.loads(rows[3]["details"]) == {"error": {"status": 500}, "shape_config": {"ocpus": 4}}
+
+
+def test_csv_chunks_header_only_without_events():
+    assert list(csv_chunks(iter([]))) == [",".join(COLUMNS + ["details"]) + "\r\n"]
+
+
+def test_export_chunks_gzip_round_trip(journal):
+    plain = "".join(export_chunks([journal], fmt="ndjson"))
+    compressed = b"".join(export_chunks([journal], fmt="ndjson", compress=True))
+    assert gzip.decompress(compressed).decode("utf-8") == plain
+    assert len(plain.splitlines()) == 6
+
+
+def test_export_chunks_csv_applies_filters(journal):
+    text = "".join(export_chunks([journal], fmt="csv", since=datetime(2026, 1, 31, 12, 4), event_type=None))
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert [row["type"] for row in rows] == ["attempt", "attempt", "success"]
+
+
+def test_export_chunks_unknown_format(journal):
+    with pytest.raises(ValueError):
+        export_chunks([journal], fmt="xml")
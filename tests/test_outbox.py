@@ -0,0 +1,99 @@
+"""The notification outbox: durable writes, reloads and the retry rewrite cycle."""
+
+import json
+import time
+
+from notifications import Outbox
+
+
+class FakeNotifier:
+    """Redelivers through a channel that fails until told otherwise."""
+    
+    def __init__(self, up: bool = True):
+        self.up = up
+        self.delivered = []
+    
+    def redeliver(self, channel: str, message: str) -> bool:
+        if self.up:
+            self.delivered.append((channel, message))
+        return self.up
+
+
+def read_entries(path) -> list:
+    with open(path, encoding="utf-8") as queued:
+        return [json.loads(line) for line in queued]
+
+
+def test_add_writes_ndjson(tmp_path):
+    path = tmp_path / "outbox.ndjson"
+    outbox = Outbox(str(path), retry_seconds=60)
+    outbox.add("default", "telegram", "Instance created")
+    outbox.add("default", "email", "Instance created")
+    
+    entries = read_entries(path)
+    assert [(entry["channel"], entry["message"], entry["attempts"]) for entry in entries] == [
+        ("telegram", "Instance created", 1),
+        ("email", "Instance created", 1),
+    ]
+    assert not (tmp_path / "outbox.ndjson.tmp").exists()
+    assert outbox.pending("default", "telegram") == 1
+    assert outbox.pending("other", "telegram") == 0
+
+
+def test_restart_reloads_entries_and_skips_torn_lines(tmp_path):
+    path = tmp_path / "outbox.ndjson"
+    Outbox(str(path), retry_seconds=60).add("default", "telegram", "Instance created")
+    with open(path, "a", encoding="utf-8") as queued:
+        queued.write('{"id": "cut short by a cra')
+    
+    reloaded = Outbox(str(path), retry_seconds=60)
+    assert len(reloaded.entries) == 1
+    assert reloaded.entries[0]["message"] == "Instance created"
+
+
+def test_retry_removes_delivered_and_rewrites_file(tmp_path):
+    path = tmp_path / "outbox.ndjson"
+    outbox = Outbox(str(path), retry_seconds=3600)
+    outbox.add("default", "telegram", "first")
+    outbox.add("default", "telegram", "second")
+    
+    notifier = FakeNotifier(up=False)
+    outbox.senders["default"] = notifier
+    outbox.retry()
+    assert [entry["attempts"] for entry in read_entries(path)] == [2, 2]
+    
+    notifier.up = True
+    outbox.retry()
+    assert notifier.delivered == [("telegram", "first"), ("telegram", "second")]
+    assert read_entries(path) == []
+    assert outbox.entries == []
+
+
+def test_retry_skips_accounts_without_sender(tmp_path):
+    path = tmp_path / "outbox.ndjson"
+    outbox = Outbox(str(path), retry_seconds=3600)
+    outbox.add("second", "telegram", "queued")
+    outbox.senders["default"] = FakeNotifier()
+    
+    outbox.retry()
+    assert [entry["attempts"] for entry in read_entries(path)] == [1]
+
+
+def test_retry_drops_expired_entries(tmp_path):
+    path = tmp_path / "outbox.ndjson"
+    outbox = Outbox(str(path), retry_seconds=3600)
+    outbox.add("default", "telegram", "stale")
+    outbox.entries[0]["created"] = time.time() - Outbox.MAX_AGE - 1
+    notifier = FakeNotifier()
+    outbox.senders["default"] = notifier
+    
+    outbox.retry()
+    assert notifier.delivered == []
+    assert read_entries(path) == []
+
+
+def test_empty_path_keeps_entries_in_memory(tmp_path):
+    outbox = Outbox("", retry_seconds=3600)
+    outbox.add("default", "telegram", "queued")
+    assert outbox.pending("default", "telegram") == 1
+    assert list(tmp_path.iterdir()) == []
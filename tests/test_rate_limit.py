@@ -0,0 +1,125 @@
+"""Token bucket math, the local RateLimiter and the account backoff."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from coordination import LocalBackend, take_token
+from orchestrator import AccountGroup, RateLimiter
+
+
+def account_config(retry_interval: float = 30, rate_limit_per_minute: float = 0) -> SimpleNamespace:
+    """The Config attributes AccountGroup reads."""
+    return SimpleNamespace(account_name="test", retry_interval=retry_interval,
+                           rate_limit_per_minute=rate_limit_per_minute, coordination_url=None)
+
+
+def test_new_bucket_starts_full():
+    tokens, wait = take_token(None, 0.0, 0.0, 6)
+    assert wait == 0
+    assert tokens == 5
+
+
+def test_empty_bucket_reports_wait_until_next_token():
+    tokens, wait = take_token(0.5, 0.0, 0.0, 6)
+    assert tokens == 0.5
+    assert wait == pytest.approx(5.0)  # half a token at one token per 10s
+
+
+def test_refill_is_capped_at_capacity():
+    tokens, wait = take_token(0.0, 0.0, 3600.0, 6)
+    assert wait == 0
+    assert tokens == 5
+
+
+def test_clock_going_backwards_does_not_drain_bucket():
+    tokens, wait = take_token(2.0, 100.0, 50.0, 6)
+    assert wait == 0
+    assert tokens == 1
+
+
+def test_fractional_rate_keeps_one_token_capacity():
+    tokens, wait = take_token(None, 0.0, 0.0, 0.2)
+    assert wait == 0
+    assert tokens == 0
+    
+    tokens, wait = take_token(tokens, 0.0, 0.0, 0.2)
+    assert wait == pytest.approx(300.0)  # one attempt per 300s retry interval
+    
+    tokens, wait = take_token(tokens, 0.0, 300.0, 0.2)
+    assert wait == 0
+
+
+def test_rate_limiter_allows_burst_then_paces(clock):
+    limiter = RateLimiter(3, clock=clock)
+    assert [limiter.reserve() for _ in range(3)] == [0, 0, 0]
+    assert limiter.reserve() == pytest.approx(20.0)
+    
+    clock.advance(20)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(20.0)
+
+
+def test_rate_limiter_zero_rate_is_unlimited(clock):
+    limiter = RateLimiter(0, clock=clock)
+    assert all(limiter.reserve() == 0 for _ in range(100))
+
+
+def test_rate_limiter_below_one_per_minute(clock):
+    limiter = RateLimiter(0.5, clock=clock)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(120.0)
+    
+    clock.advance(119)
+    assert limiter.reserve() == pytest.approx(1.0)
+    clock.advance(1)
+    assert limiter.reserve() == 0
+
+
+def test_local_backend_shares_bucket_by_name():
+    backend = LocalBackend()
+    assert backend.reserve("launch:a", 1) == 0
+    assert backend.reserve("launch:a", 1) > 0
+    assert backend.reserve("launch:b", 1) == 0
+
+
+def test_account_backs_off_after_repeated_errors(clock):
+    account = AccountGroup(account_config(retry_interval=30), clock=clock)
+    error = {"success": False, "is_capacity_error": False}
+    
+    for _ in range(AccountGroup.FAILURE_THRESHOLD - 1):
+        account.record_attempt(error)
+    assert account.reserve() == 0
+    
+    account.record_attempt(error)
+    assert account.state["status"] == "backoff"
+    assert account.reserve() == pytest.approx(30.0)
+    
+    # Each further error doubles the backoff
+    account.record_attempt(error)
+    assert account.reserve() == pytest.approx(60.0)
+
+
+def test_account_backoff_is_capped(clock):
+    account = AccountGroup(account_config(retry_interval=300), clock=clock)
+    for _ in range(AccountGroup.FAILURE_THRESHOLD + 20):
+        account.record_attempt({"success": False, "is_capacity_error": False})
+    assert account.reserve() == pytest.approx(AccountGroup.MAX_BACKOFF_SECONDS)
+
+
+def test_capacity_error_resets_backoff(clock):
+    account = AccountGroup(account_config(), clock=clock)
+    for _ in range(AccountGroup.FAILURE_THRESHOLD):
+        account.record_attempt({"success": False, "is_capacity_error": False})
+    assert account.reserve() > 0
+    
+    account.record_attempt({"success": False, "is_capacity_error": True})
+    assert account.consecutive_failures == 0
+    assert account.state["status"] == "running"
+    assert account.reserve() == 0
+
+
+def test_account_applies_rate_limit_after_backoff(clock):
+    account = AccountGroup(account_config(rate_limit_per_minute=1), clock=clock)
+    assert account.reserve() == 0
+    assert account.reserve() == pytest.approx(60.0)
@@ -7,16 +7,31 @@ while exposing a web UI to monitor the status.
 For use with Render.com's free Web Service tier.
 """
 
+import functools
+import hmac
 import os
+import signal
 import sys
 import time
-import threading
 from datetime import datetime
-from flask import Flask, render_template_string, jsonify
+from flask import Flask, Response, render_template_string, jsonify, request, stream_with_context
 
+from bandit import bandit_states
+from breakers import breaker_states
 from config import Config
+from control import LoopControl
+from coordination import coordination_states
+from engine import LaunchEngine, LaunchEvent, Observer, default_observers
+from handoff import get_handoff
+from inventory import get_inventory, inventory_states
+from journal_export import FORMATS, export_chunks, export_filename, parse_time
+from liveness import Watchdog, Worker
+from memory import after_startup, memory_report, start_tracing
+from notifications import Notifier, notification_states
 from oci_client import OCIClient
-from telegram_notifier import TelegramNotifier
+from preflight import CheckResult, PreflightEngine
+from provisioning import ProvisioningStep
+from resolver import resolve_config, stop_resolvers
 
 
 # ============================================================================
@@ -24,7 +39,7 @@ from telegram_notifier import TelegramNotifier
 # ============================================================================
 
 app_state = {
-    "status": "initializing",  # initializing, running, success, error
+    "status": "initializing",  # initializing, standby, running, paused, success, watching, claimed, error
     "attempt": 0,
     "last_attempt_time": None,
     "last_result": None,
@@ -33,8 +48,31 @@ app_state = {
     "instance_info": None,
     "error_message": None,
     "config_summary": None,
+    "regions": None,  # per-pipeline state when several regions or accounts are configured
+    "accounts": None,  # per-account state when several accounts are configured
+    "preflight": None,  # last preflight report
+    "quota": None,  # quota fill progress when FILL_QUOTA is enabled
+    "hedging": None,  # launch request hedging metrics
+    "provisioning": None,  # post-launch provisioning steps per created instance
 }
 
+# Runtime control shared by the background loop and the control endpoints
+loop_control = LoopControl()
+control_api_token = None  # CONTROL_API_TOKEN; the control API is disabled while unset
+
+# Liveness watchdog of the background loop (set by start_background_worker)
+watchdog = None
+
+# Configuration of the running service (set by start_background_worker)
+service_config = None
+
+# Attempt lease handed over between redeploys (HANDOFF_ENABLED; set by start_background_worker)
+handoff = None
+
+# Cached instance inventories behind /api/instances, one per account and region
+# (INVENTORY_REFRESH_SECONDS; set by start_background_worker)
+inventories = []
+
 
 # ============================================================================
 # HTML Template
@@ -131,6 +169,29 @@ HTML_TEMPLATE = """
             box-shadow: 0 0 20px rgba(255, 170, 0, 0.5);
         }
         
+        .status-dot.standby {
+            background: #888;
+            box-shadow: 0 0 20px rgba(136, 136, 136, 0.5);
+        }
+        
+        .status-dot.watching {
+            background: #00ff88;
+            box-shadow: 0 0 20px rgba(0, 255, 136, 0.5);
+        }
+        
+        .status-dot.claimed {
+            background: #00ff88;
+            box-shadow: 0 0 20px rgba(0, 255, 136, 0.5);
+            animation: none;
+            opacity: 0.6;
+        }
+        
+        .status-dot.paused {
+            background: #888;
+            box-shadow: 0 0 20px rgba(136, 136, 136, 0.5);
+            animation: none;
+        }
+        
         @keyframes pulse {
             0%, 100% { opacity: 1; transform: scale(1); }
             50% { opacity: 0.7; transform: scale(0.95); }
@@ -291,6 +352,12 @@ HTML_TEMPLATE = """
                     <span class="info-label">Last Attempt</span>
                     <span class="info-value">{{ last_attempt }}</span>
                 </div>
+                {% if hedging and hedging.enabled %}
+                <div class="info-row">
+                    <span class="info-label">Hedges Fired / Won</span>
+                    <span class="info-value">{{ hedging.hedges_fired }} / {{ hedging.hedges_won }} of {{ hedging.launches }} launches</span>
+                </div>
+                {% endif %}
             </div>
             
             {% if last_result %}
@@ -300,6 +367,174 @@ HTML_TEMPLATE = """
             {% endif %}
         </div>
         
+        {% if quota %}
+        <div class="status-card">
+            <h3>📦 Free A1 Quota</h3>
+            <div class="info-section">
+                <div class="info-row">
+                    <span class="info-label">Remaining</span>
+                    <span class="info-value">{{ quota.remaining_ocpus }} OCPUs / {{ quota.remaining_memory_gb }} GB ({{ quota.quota_source }})</span>
+                </div>
+                <div class="info-row">
+                    <span class="info-label">Claimed</span>
+                    <span class="info-value">{{ quota.claimed_ocpus }} OCPUs / {{ quota.claimed_memory_gb }} GB</span>
+                </div>
+                <div class="info-row">
+                    <span class="info-label">Shape Ladder</span>
+                    <span class="info-value">{{ quota.ladder | join(", ") }}</span>
+                </div>
+                {% for instance in quota.instances %}
+                <div class="info-row">
+                    <span class="info-label">{{ instance.name }}</span>
+                    <span class="info-value">{{ instance.ocpus }}/{{ instance.memory_gb }}GB · {{ instance.public_ip }}</span>
+                </div>
+                {% endfor %}
+            </div>
+        </div>
+        {% endif %}
+        
+        {% if accounts %}
+        <div class="status-card">
+            <h3>👥 Accounts</h3>
+            <div class="info-section">
+                {% for name, account in accounts.items() %}
+                <div class="info-row">
+                    <span class="info-label">{{ name }}</span>
+                    <span class="info-value">{{ account.status }} · {{ account.claimed_ocpus }} OCPUs / {{ account.claimed_memory_gb }} GB claimed</span>
+                </div>
+                {% if account.error_message %}
+                <div class="last-result">
+                    ❌ {{ account.error_message }}
+                </div>
+                {% endif %}
+                {% endfor %}
+            </div>
+        </div>
+        {% endif %}
+        
+        {% if provisioning %}
+        <div class="status-card">
+            <h3>🛠️ Provisioning</h3>
+            {% for instance_id, pipeline in provisioning.items() %}
+            <div class="info-section">
+                <div class="info-row">
+                    <span class="info-label">{{ pipeline.name or instance_id[:30] }}</span>
+                    <span class="info-value">{% if pipeline.duration is not none %}Finished in {{ pipeline.duration }}s{% else %}In progress{% endif %}</span>
+                </div>
+                {% for step in pipeline.steps %}
+                <div class="info-row">
+                    <span class="info-label">{{ step_icons[step.status] }} {{ step.label }}</span>
+                    <span class="info-value">{{ step.detail or "" }}{% if step.duration is not none %} ({{ step.duration }}s){% endif %}</span>
+                </div>
+                {% endfor %}
+            </div>
+            {% endfor %}
+        </div>
+        {% endif %}
+        
+        {% if bandits %}
+        <div class="status-card">
+            <h3>🎯 Target Allocation</h3>
+            {% for name, bandit in bandits.items() %}
+            <div class="info-section">
+                <div class="info-row">
+                    <span class="info-label">{{ name }}</span>
+                    <span class="info-value">half-life {{ bandit.half_life_minutes }} min</span>
+                </div>
+                {% for arm in bandit.arms %}
+                <div class="info-row">
+                    <span class="info-label">{{ arm.availability_domain.split(":")[-1] }} · {{ arm.shape }}</span>
+                    <span class="info-value">{{ (arm.weight * 100) | round | int }}% · {{ arm.attempts }} attempts · {{ arm.successes }} won · {{ arm.near_misses }} near{% if arm.latency is not none %} · {{ arm.latency }}s{% endif %}</span>
+                </div>
+                {% endfor %}
+            </div>
+            {% endfor %}
+        </div>
+        {% endif %}
+        
+        {% if inventories %}
+        <div class="status-card">
+            <h3>🖥️ Instances</h3>
+            {% for name, inventory in inventories.items() %}
+            <div class="info-section">
+                <div class="info-row">
+                    <span class="info-label">{% if inventories | length > 1 %}{{ name }} · {% endif %}A1 in use</span>
+                    <span class="info-value">{{ inventory.a1_instances }} instances · {{ inventory.a1_ocpus }} OCPUs / {{ inventory.a1_memory_gb }} GB</span>
+                </div>
+                {% for instance in inventory["items"] if instance.state not in ("TERMINATING", "TERMINATED") %}
+                <div class="info-row">
+                    <span class="info-label">{{ instance.name }}</span>
+                    <span class="info-value">{{ instance.state }} · {{ instance.shape.replace("VM.Standard.", "") }}{% if instance.ocpus %} {{ instance.ocpus }}/{{ instance.memory_gb }}GB{% endif %}{% if instance.public_ip %} · {{ instance.public_ip }}{% endif %}</span>
+                </div>
+                {% endfor %}
+                {% if inventory.duplicates %}
+                <div class="last-result">
+                    ⚠️ Duplicate A1 instances: {{ inventory.duplicates | join(", ") }}
+                </div>
+                {% endif %}
+                {% if inventory.error %}
+                <div class="last-result">
+                    ❌ {{ inventory.error }}
+                </div>
+                {% endif %}
+                <div class="info-row">
+                    <span class="info-label">Refreshed</span>
+                    <span class="info-value">{{ inventory.refreshed_at or "Not yet" }}</span>
+                </div>
+            </div>
+            {% endfor %}
+        </div>
+        {% endif %}
+        
+        {% if notifications %}
+        <div class="status-card">
+            <h3>📣 Notifications</h3>
+            {% for account, channels in notifications.items() %}
+            <div class="info-section">
+                {% for channel, state in channels.items() %}
+                <div class="info-row">
+                    <span class="info-label">{% if notifications | length > 1 %}{{ account }} · {% endif %}{{ channel }}</span>
+                    <span class="info-value">{{ state.sent }} sent · {{ state.failed }} failed{% if state.pending %} · {{ state.pending }} queued{% endif %}{% if state.latency_p95_ms is not none %} · p95 {{ state.latency_p95_ms }} ms{% endif %}</span>
+                </div>
+                {% endfor %}
+            </div>
+            {% endfor %}
+        </div>
+        {% endif %}
+        
+        {% if regions %}
+        <div class="status-card">
+            <h3>🌏 Regions</h3>
+            {% for name, region in regions.items() %}
+            <div class="info-section">
+                <div class="info-row">
+                    <span class="info-label">{{ name }}</span>
+                    <span class="info-value">{{ region.status }} · {{ region.attempt }} attempts</span>
+                </div>
+                <div class="info-row">
+                    <span class="info-label">OCPUs / Memory</span>
+                    <span class="info-value">{{ region.ocpus }} / {{ region.memory_gb }} GB</span>
+                </div>
+                <div class="info-row">
+                    <span class="info-label">Last Attempt</span>
+                    <span class="info-value">{{ region.last_attempt_time or "Never" }}</span>
+                </div>
+                {% if region.instance_info %}
+                <div class="info-row">
+                    <span class="info-label">Public IP</span>
+                    <span class="info-value">{{ region.instance_info.public_ip }}</span>
+                </div>
+                {% endif %}
+                {% if region.last_result %}
+                <div class="last-result">
+                    {{ region.last_result }}
+                </div>
+                {% endif %}
+            </div>
+            {% endfor %}
+        </div>
+        {% endif %}
+        
         <div class="footer">
             <span class="auto-refresh">🔄 Auto-refresh every 30 seconds</span>
         </div>
@@ -340,8 +575,12 @@ def index():
     """Main status page."""
     status_text_map = {
         "initializing": "Initializing...",
+        "standby": "Warmed up, waiting for the previous deployment to hand over",
         "running": "Searching for capacity...",
+        "paused": "Paused",
+        "claimed": "Claimed by another deployment",
         "success": "Instance Created!",
+        "watching": "Instance Created! Watching for reclaim",
         "error": "Error occurred",
     }
     
@@ -358,24 +597,202 @@ def index():
         last_attempt=app_state["last_attempt_time"] or "Never",
         last_result=app_state["last_result"],
         instance_info=app_state["instance_info"],
+        regions=app_state["regions"],
+        accounts=app_state["accounts"],
+        quota=app_state["quota"],
+        hedging=app_state["hedging"],
+        provisioning=app_state["provisioning"],
+        step_icons=ProvisioningStep.ICONS,
+        bandits=bandit_states(),
+        notifications=notification_states(),
+        inventories=inventory_states(include_instances=True),
     )
 
 
 @app.route("/health")
 def health():
-    """Health check endpoint for Render."""
-    return jsonify({
+    """Health check endpoint for Render (503 when the background loop lost liveness, or while warming up for a handoff)."""
+    body = {
         "status": "healthy",
         "app_status": app_state["status"],
         "attempt": app_state["attempt"],
         "uptime_seconds": (datetime.now() - app_state["start_time"]).total_seconds() if app_state["start_time"] else 0,
-    })
+    }
+    # Not ready until warmed up, so a redeploy keeps the old process attempting meanwhile
+    if service_config and service_config.handoff_enabled and app_state["status"] == "initializing":
+        body["status"] = "warming_up"
+        return jsonify(body), 503
+    if watchdog is None:
+        return jsonify(body)
+    
+    body["watchdog"] = watchdog.to_dict()
+    if body["watchdog"]["problem"]:
+        body["status"] = "unhealthy"
+        return jsonify(body), 503
+    return jsonify(body)
 
 
 @app.route("/api/status")
 def api_status():
     """API endpoint for current status."""
-    return jsonify(app_state)
+    return jsonify(dict(
+        app_state,
+        breakers=breaker_states(),
+        bandits=bandit_states(),
+        coordination=coordination_states(),
+        notifications=notification_states(),
+        inventory=inventory_states(),
+        control=loop_control.to_dict(),
+        watchdog=watchdog.to_dict() if watchdog else None,
+    ))
+
+
+@app.route("/api/instances")
+def api_instances():
+    """Instances in the compartment from the cached inventory (?state=RUNNING&shape=...); never calls OCI."""
+    if not inventories:
+        return jsonify({"error": "Inventory disabled or service not started (INVENTORY_REFRESH_SECONDS)"}), 404
+    
+    state_filter = request.args.get("state", "").upper()
+    shape_filter = request.args.get("shape", "")
+    summaries = inventory_states(include_instances=True)
+    instances = [
+        dict(instance, account=summary["account"], region=summary["region"])
+        for summary in summaries.values()
+        for instance in summary.pop("items")
+        if (not state_filter or instance["state"] == state_filter) and (not shape_filter or instance["shape"] == shape_filter)
+    ]
+    return jsonify({"instances": instances, "inventories": summaries})
+
+
+# ============================================================================
+# Runtime Control API
+# ============================================================================
+
+def require_control_token(view):
+    """Allow a control endpoint only with the CONTROL_API_TOKEN bearer token."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not control_api_token:
+            return jsonify({"error": "Control API disabled (set CONTROL_API_TOKEN)"}), 403
+        
+        expected = f"Bearer {control_api_token}".encode()
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route("/debug/memory")
+@require_control_token
+def debug_memory():
+    """Resident memory against MEMORY_BUDGET_MB and the top allocation sites (?limit=N); needs the control token."""
+    if service_config is None:
+        return jsonify({"error": "Service not started"}), 503
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+    return jsonify(memory_report(service_config, limit=limit))
+
+
+def control_status() -> dict:
+    """Control state plus the settings it can change."""
+    return dict(
+        loop_control.to_dict(),
+        status=app_state["status"],
+        retry_interval=app_state.get("retry_interval"),
+        ocpus=app_state.get("ocpus"),
+        memory_gb=app_state.get("memory_gb"),
+    )
+
+
+@app.route("/api/control/pause", methods=["POST"])
+@require_control_token
+def control_pause():
+    """Stop starting new attempts (an attempt in flight still finishes)."""
+    loop_control.pause()
+    if app_state["status"] == "running":
+        app_state["status"] = "paused"
+    print(f"[{get_timestamp()}] ⏸️ Paused via control API", flush=True)
+    return jsonify(control_status())
+
+
+@app.route("/api/control/resume", methods=["POST"])
+@require_control_token
+def control_resume():
+    """Resume attempts after a pause."""
+    loop_control.resume()
+    if app_state["status"] == "paused":
+        app_state["status"] = "running"
+    print(f"[{get_timestamp()}] ▶️ Resumed via control API", flush=True)
+    return jsonify(control_status())
+
+
+@app.route("/api/control/retune", methods=["POST"])
+@require_control_token
+def control_retune():
+    """Change retry_interval, ocpus and/or memory_gb of the running loop."""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not payload:
+        return jsonify({"error": "Expected a JSON object with retry_interval, ocpus and/or memory_gb"}), 400
+    
+    try:
+        applied = loop_control.retune(**payload)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    app_state.update(applied)
+    print(f"[{get_timestamp()}] 🎛️ Retuned via control API: "
+          f"{', '.join(f'{key}={value}' for key, value in applied.items())}", flush=True)
+    return jsonify(control_status())
+
+
+@app.route("/api/control/attempt-now", methods=["POST"])
+@require_control_token
+def control_attempt_now():
+    """Skip the rest of the current wait and attempt immediately (also while paused)."""
+    loop_control.attempt_now()
+    print(f"[{get_timestamp()}] ⚡ Immediate attempt requested via control API", flush=True)
+    return jsonify(control_status())
+
+
+# ============================================================================
+# Journal Export
+# ============================================================================
+
+@app.route("/api/export")
+@require_control_token
+def api_export():
+    """
+    Stream the journal (JOURNAL_PATH) as a chunked download.
+    
+    Query: format=ndjson|csv, since/until (ISO time or age like 24h),
+    type (default: attempt; "all" for every event), gzip=1.
+    """
+    if service_config is None:
+        return jsonify({"error": "Service not started"}), 503
+    path = service_config.journal_path
+    if not path or not os.path.exists(path):
+        return jsonify({"error": "No journal (set JOURNAL_PATH)"}), 404
+    
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+    try:
+        since = parse_time(request.args["since"]) if request.args.get("since") else None
+        until = parse_time(request.args["until"]) if request.args.get("until") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    event_type = request.args.get("type", "attempt")
+    event_type = None if event_type == "all" else event_type
+    compress = request.args.get("gzip", "").lower() in ("1", "true", "yes")
+    
+    chunks = export_chunks([path], fmt, since=since, until=until, event_type=event_type, compress=compress)
+    filename = export_filename(fmt, compress, event_type)
+    print(f"[{get_timestamp()}] 📤 Exporting journal as {filename}", flush=True)
+    return Response(
+        stream_with_context(chunks),
+        mimetype="application/gzip" if compress else FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
 
 
 # ============================================================================
@@ -387,73 +804,115 @@ def get_timestamp() -> str:
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
-def background_loop(config: Config, oci_client: OCIClient, notifier: TelegramNotifier):
-    """Background loop that attempts to create the instance."""
+class WebStateObserver(Observer):
+    """Mirror engine events into app_state for the dashboard and /api/status."""
+    
+    name = "web"
+    
+    def handle(self, event: LaunchEvent):
+        data = event.data
+        prefix = f"[{data['target']}] " if data.get("target") else ""
+        
+        if event.type == LaunchEvent.STANDBY:
+            app_state["status"] = "standby"
+            app_state["last_result"] = f"⏸️ Standing by until {data['holder']['node_id']} yields the attempt lease"
+        
+        elif event.type == LaunchEvent.STARTED:
+            # With a handoff the loop only starts once the lease is ours
+            if handoff:
+                app_state["status"] = "paused" if loop_control.paused else "running"
+            if data["resumed"]:
+                app_state["attempt"] = data["resumed"]["total_attempts"]
+                app_state["last_result"] = f"🤝 Took over from {data['resumed']['node_id']}"
+        
+        elif event.type == LaunchEvent.ATTEMPT:
+            app_state["attempt"] = data["total_attempts"]
+            app_state["last_attempt_time"] = event.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            if data["success"]:
+                app_state["last_result"] = f"{prefix}✅ Instance created successfully!"
+            elif data["is_capacity_error"]:
+                app_state["last_result"] = f"{prefix}⏳ Out of capacity. Retrying in {data['retry_interval']}s..."
+            else:
+                app_state["last_result"] = f"{prefix}❌ {data['message']}"
+        
+        elif event.type == LaunchEvent.SUCCESS:
+            app_state["instance_created"] = True
+            app_state["instance_info"] = data["instance"]
+            for inventory in inventories:
+                inventory.refresh_soon()
+        
+        elif event.type == LaunchEvent.CLAIMED:
+            claim = data["claim"]
+            app_state["last_result"] = f"{prefix}🤝 Instance already claimed by {claim['node_id']} ({claim['name'] or claim['instance_id']})"
+            if not data.get("target"):
+                app_state["status"] = "claimed"
+        
+        elif event.type == LaunchEvent.WATCHING:
+            # Pipelines and quota fill rounds keep running beside their watched instances
+            if not data.get("target"):
+                app_state["status"] = "watching"
+        
+        elif event.type == LaunchEvent.RECLAIMED:
+            app_state["status"] = "paused" if loop_control.paused else "running"
+            if (app_state["instance_info"] or {}).get("id") == data["instance"]["id"]:
+                app_state["instance_created"] = False
+                app_state["instance_info"] = None
+            # The reclaimed instance may be older than the pages an incremental refresh lists
+            for inventory in inventories:
+                inventory.refresh_soon(full_sync=True)
+            app_state["last_result"] = f"♻️ {data['instance'].get('name') or data['instance']['id']} was {data['state']}, relaunching"
+            provisioning = dict(app_state["provisioning"] or {})
+            provisioning.pop(data["instance"]["id"], None)
+            app_state["provisioning"] = provisioning or None
+        
+        elif event.type in (LaunchEvent.PROVISION_STEP, LaunchEvent.PROVISIONED):
+            provisioning = dict(app_state["provisioning"] or {})
+            provisioning[data["instance_id"]] = data["provisioning"]
+            app_state["provisioning"] = provisioning
+
+
+def engine_loop(config: Config, oci_client: OCIClient, notifier: Notifier, worker: Worker):
+    """Background loop: run the launch engine and mirror its events into app_state."""
     import traceback
     global app_state
     
+    engine = None
     try:
-        app_state["status"] = "running"
-        app_state["start_time"] = datetime.now()
-        app_state["retry_interval"] = config.retry_interval
-        app_state["region"] = config.oci_region
-        app_state["ocpus"] = config.ocpus
-        app_state["memory_gb"] = config.memory_gb
+        engine = LaunchEngine(
+            config,
+            oci_client,
+            observers=default_observers(config, notifier) + [WebStateObserver()],
+            control=loop_control,
+            on_heartbeat=worker.beat,
+            # Only the first worker sends the startup notification
+            announce=worker.generation == 1,
+            handoff=handoff
+        )
+        worker.on_stop(engine.stop)
         
-        print(f"[{get_timestamp()}] 🚀 Background loop started", flush=True)
-        print(f"   • Target: VM.Standard.A1.Flex in {config.oci_region}", flush=True)
-        print(f"   • Retry interval: {config.retry_interval} seconds", flush=True)
+        app_state["quota"] = engine.quota_state
+        app_state["regions"] = engine.region_states
+        if config.account_profiles:
+            app_state["accounts"] = engine.account_states
         
-        # Send startup notification (non-blocking)
-        try:
-            notifier.send_startup_message()
-        except Exception as e:
-            print(f"[{get_timestamp()}] ⚠️ Failed to send startup notification: {e}", flush=True)
+        if not handoff:
+            app_state["status"] = "paused" if loop_control.paused else "running"
+        if worker.generation == 1:
+            app_state["start_time"] = datetime.now()
+        else:
+            print(f"[{get_timestamp()}] 🐕 Background worker #{worker.generation} took over", flush=True)
         
-        while True:
-            app_state["attempt"] += 1
-            app_state["last_attempt_time"] = get_timestamp()
-            
-            print(f"[{get_timestamp()}] Attempt #{app_state['attempt']} - Trying to create instance...", flush=True)
-            
-            try:
-                result = oci_client.create_instance()
-                
-                if result["success"]:
-                    # SUCCESS!
-                    app_state["status"] = "success"
-                    app_state["instance_created"] = True
-                    app_state["instance_info"] = result["instance"]
-                    app_state["last_result"] = f"✅ Instance created successfully!"
-                    
-                    print(f"\n🎉 SUCCESS! Instance created on attempt #{app_state['attempt']}", flush=True)
-                    print(f"   Instance ID: {result['instance']['id']}", flush=True)
-                    print(f"   Public IP: {result['instance']['public_ip']}", flush=True)
-                    
-                    # Send Telegram notification
-                    try:
-                        notifier.send_success_message(result["instance"])
-                    except Exception as e:
-                        print(f"[{get_timestamp()}] ⚠️ Failed to send success notification: {e}", flush=True)
-                    
-                    # Don't exit - keep web server running to show success
-                    print("✅ Instance created! Web server will keep running to display status.", flush=True)
-                    break
-                
-                elif result["is_capacity_error"]:
-                    app_state["last_result"] = f"⏳ Out of capacity. Retrying in {config.retry_interval}s..."
-                    print(f"[{get_timestamp()}] ⏳ Out of capacity. Retrying in {config.retry_interval}s...", flush=True)
-                
-                else:
-                    app_state["last_result"] = f"❌ {result['message']}"
-                    print(f"[{get_timestamp()}] ❌ Error: {result['message']}", flush=True)
-            
-            except Exception as e:
-                app_state["last_result"] = f"❌ Exception: {str(e)}"
-                print(f"[{get_timestamp()}] ❌ Exception in create_instance: {e}", flush=True)
-                print(traceback.format_exc(), flush=True)
-            
-            time.sleep(config.retry_interval)
+        engine.run()
+        
+        # A replaced worker's run only counts when its in-flight attempt created the instance
+        if worker.stopped and not (engine.instances and engine.mode == LaunchEngine.SINGLE):
+            return
+        
+        if engine.instances:
+            app_state["status"] = "success"
+            # Don't exit - keep web server running to show success
+            print("✅ Instance created! Web server will keep running to display status.", flush=True)
+        worker.finish()
     
     except Exception as e:
         app_state["status"] = "error"
@@ -461,55 +920,160 @@ def background_loop(config: Config, oci_client: OCIClient, notifier: TelegramNot
         app_state["last_result"] = f"❌ FATAL: {str(e)}"
         print(f"[{get_timestamp()}] ❌ FATAL ERROR in background loop: {e}", flush=True)
         print(traceback.format_exc(), flush=True)
+    
+    finally:
+        if engine:
+            engine.close()
+
+
+def start_inventories(config: Config, oci_client: OCIClient) -> list:
+    """
+    Start the inventory of every account and region pipeline, or rebind them to fresh clients.
+    
+    Args:
+        config: Service configuration
+        oci_client: Client of the single target (multi-pipeline setups get one client per pipeline)
+    """
+    if config.inventory_refresh_seconds <= 0:
+        return []
+    if not config.is_multi_pipeline:
+        return [get_inventory(oci_client)]
+    
+    started = []
+    for pipeline_config in config.pipeline_configs():
+        try:
+            started.append(get_inventory(OCIClient(pipeline_config)))
+        except Exception as e:
+            # A broken account must not hide the others
+            print(f"[{get_timestamp()}] ⚠️ No inventory for {pipeline_config.account_name}/{pipeline_config.oci_region}: {e}", flush=True)
+    return started
+
+
+def preflight_pipelines(config: Config) -> tuple:
+    """
+    Run the preflight checks of every account and region pipeline.
+    
+    Args:
+        config: Service configuration (multi-pipeline)
+    
+    Returns:
+        (reports, failed): preflight state for /api/status with one report per
+        pipeline, and the names of the pipelines that failed
+    """
+    pipelines, failed, started = {}, [], time.monotonic()
+    for pipeline_config in config.pipeline_configs():
+        name = f"{pipeline_config.account_name}/{pipeline_config.oci_region}"
+        try:
+            resolve_config(pipeline_config)
+            report = PreflightEngine(pipeline_config, OCIClient(pipeline_config)).run(use_cache=True)
+        except Exception as e:
+            # A broken account (bad key, bad region) must not hide the others
+            print(f"[{get_timestamp()}] ❌ Preflight for {name} failed: {e}", flush=True)
+            pipelines[name] = {"passed": False, "error": str(e)}
+            failed.append(name)
+            continue
+        report.print_report(f"Preflight report for {name}")
+        pipelines[name] = report.to_dict()
+        if not report.passed:
+            failed.append(name)
+    
+    reports = {
+        "passed": not failed,
+        "duration": round(time.monotonic() - started, 3),
+        "pipelines": pipelines,
+    }
+    return reports, failed
 
 
 def start_background_worker():
     """Initialize and start the background worker thread."""
     import traceback
-    global app_state
+    global app_state, control_api_token, watchdog, service_config, handoff, inventories
     
     try:
         print("Loading configuration...", flush=True)
         config = Config()
+        control_api_token = config.control_api_token
+        service_config = config
+        start_tracing(config)
         
-        # Validate configuration first
-        if not config.validate():
-            app_state["status"] = "error"
-            app_state["error_message"] = "Configuration validation failed"
-            print("❌ Configuration validation failed", flush=True)
-            return
-        
-        print("✅ Configuration validated successfully", flush=True)
+        # Discover image, subnet and AD if they were left unset (multi-pipeline
+        # setups resolve each pipeline separately)
+        if not config.is_multi_pipeline:
+            resolve_config(config)
         
         # Initialize clients
         oci_client = OCIClient(config)
-        notifier = TelegramNotifier(config)
-        
-        # Validate OCI credentials
-        print("Validating OCI credentials...", flush=True)
-        if not oci_client.validate_credentials():
-            app_state["status"] = "error"
-            app_state["error_message"] = "OCI credential validation failed"
-            print("❌ OCI credential validation failed", flush=True)
-            return
+        notifier = Notifier(config)
         
-        print("✅ OCI credentials validated successfully", flush=True)
+        if config.is_multi_pipeline:
+            if not config.validate():
+                app_state["status"] = "error"
+                app_state["error_message"] = "Configuration validation failed"
+                print("❌ Configuration validation failed", flush=True)
+                return
+            
+            # Preflight every pipeline; each isolates its own failures, so only
+            # stop when none of them can launch
+            report, failed = preflight_pipelines(config)
+            app_state["preflight"] = report
+            if len(failed) == len(report["pipelines"]):
+                app_state["status"] = "error"
+                app_state["error_message"] = f"Preflight validation failed for every pipeline: {', '.join(failed)}"
+                print("❌ Preflight validation failed", flush=True)
+                return
+            if failed:
+                print(f"⚠️ Preflight failed for {', '.join(failed)}; the other pipelines start", flush=True)
+        else:
+            # Run preflight checks, reusing passing results cached by --dry-run or a previous boot
+            report = PreflightEngine(config, oci_client).run(use_cache=True)
+            report.print_report()
+            app_state["preflight"] = report.to_dict()
+            
+            if not report.passed:
+                failed = [result.name for result in report.results if result.status == CheckResult.FAIL]
+                app_state["status"] = "error"
+                app_state["error_message"] = f"Preflight validation failed: {', '.join(failed)}"
+                print("❌ Preflight validation failed", flush=True)
+                return
+        
+        print("✅ Validation passed", flush=True)
+        handoff = get_handoff(config)
+        after_startup(config)
+        inventories = start_inventories(config, oci_client)
         
         # Set initial state with config values
         app_state["retry_interval"] = config.retry_interval
         app_state["region"] = config.oci_region
         app_state["ocpus"] = config.ocpus
         app_state["memory_gb"] = config.memory_gb
+        app_state["hedging"] = oci_client.hedge_stats
+        loop_control.attach(config)
+        
+        def run_worker(worker: Worker):
+            # A restarted worker gets fresh clients so it never reuses a hung connection
+            worker_client, worker_notifier = oci_client, notifier
+            if worker.generation > 1:
+                worker_client, worker_notifier = OCIClient(config), Notifier(config)
+                app_state["hedging"] = worker_client.hedge_stats
+                start_inventories(config, worker_client)
+            
+            engine_loop(config, worker_client, worker_notifier, worker)
+        
+        def on_restart(reason: str):
+            notifier.send_error_message(f"Background loop restarted by the watchdog: {reason}")
         
-        # Start background thread
-        thread = threading.Thread(
-            target=background_loop,
-            args=(config, oci_client, notifier),
-            daemon=True
+        # Start background thread under the liveness watchdog
+        watchdog = Watchdog(
+            run_worker,
+            stall_seconds=config.watchdog_stall_seconds,
+            max_restarts=config.watchdog_max_restarts,
+            enabled=config.watchdog_enabled,
+            on_restart=on_restart
         )
-        thread.start()
+        watchdog.start()
         print("✅ Background worker thread started", flush=True)
-        
+    
     except ValueError as e:
         app_state["status"] = "error"
         app_state["error_message"] = f"Configuration error: {str(e)}"
@@ -523,6 +1087,13 @@ def start_background_worker():
         print(traceback.format_exc(), flush=True)
 
 
+def shutdown():
+    """On SIGTERM: yield the attempt lease to the next deployment (HANDOFF_ENABLED) and stop background refreshes."""
+    if handoff:
+        handoff.hand_over()
+    stop_resolvers()
+
+
 # ============================================================================
 # Entry Point
 # ============================================================================
@@ -536,6 +1107,12 @@ if __name__ == "__main__":
     # For local development, start the background worker here
     start_background_worker()
     
+    def on_sigterm(signum, frame):
+        shutdown()
+        sys.exit(0)
+    
+    signal.signal(signal.SIGTERM, on_sigterm)
+    
     port = int(os.environ.get("PORT", 5000))
     print(f"\n🌐 Starting web server on port {port}...")
     app.run(host="0.0.0.0", port=port, debug=False)